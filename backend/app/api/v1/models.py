@@ -2,23 +2,69 @@
 # API - MODELS ENDPOINTS
 # ========================================
 
-from fastapi import APIRouter, Request
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+
+from app.api.deps import get_current_active_superuser
+from app.models.user import User
 
 router = APIRouter()
 
 
+async def _serving_status(request: Request) -> tuple:
+    """
+    Model status reported by whoever serves inference
+    
+    The API process only holds the configuration in process and server
+    modes: residency and measured latencies come from the inference side
+    (one report per process worker). Returns (reports, errors).
+    """
+    executor = request.app.state.inference_executor()
+    results = await executor.broadcast_model("status")
+    reports = [r for r in results if isinstance(r, dict)]
+    errors = [str(r) for r in results if isinstance(r, Exception)]
+    return reports, errors
+
+
+def _merge_model_info(reports: List[dict], model_id: str) -> dict:
+    """A model's info across workers: loaded in any of them, memory summed"""
+    entries = [m for report in reports for m in report['models'] if m['id'] == model_id]
+    loaded = [m for m in entries if m['loaded']]
+    return {
+        **entries[0],
+        'loaded': bool(loaded),
+        'loaded_workers': len(loaded),
+        'memory_mb': round(sum(m['memory_mb'] or 0 for m in loaded), 2) if loaded else None
+    }
+
+
 @router.get("/list")
 async def list_models(request: Request):
     """
     Get list of available models with their info
     """
-    model_manager = request.app.state.model_manager()
-    models_info = model_manager.get_models_info()
+    reports, errors = await _serving_status(request)
+    if not reports:
+        return {
+            "success": False,
+            "error": errors[0] if errors else "No inference worker answered"
+        }
+    
+    models_info = [_merge_model_info(reports, m['id']) for m in reports[0]['models']]
     
     return {
         "success": True,
         "total_models": len(models_info),
-        "models": models_info
+        "models": models_info,
+        "default_model": reports[0]['default_model'],
+        "memory": {
+            "resident_mb": round(sum(r['resident_mb'] for r in reports), 2),
+            "budget_mb": reports[0]['budget_mb'],  # Per worker
+            "workers": [r['resident_mb'] for r in reports]
+        },
+        "errors": errors
     }
 
 
@@ -29,25 +75,33 @@ async def get_model_info(model_id: str, request: Request):
     """
     model_manager = request.app.state.model_manager()
     
-    if model_id not in model_manager.models:
+    if model_id not in model_manager.model_ids():
         return {
             "success": False,
             "error": f"Model {model_id} not found"
         }
     
-    model_info = model_manager.models[model_id]
+    reports, errors = await _serving_status(request)
+    if not reports:
+        return {
+            "success": False,
+            "error": errors[0] if errors else "No inference worker answered"
+        }
+    
+    model_info = _merge_model_info(reports, model_id)
     
     return {
         "success": True,
         "model": {
             "id": model_id,
-            "name": model_info['config']['name'],
-            "accuracy": model_info['config']['accuracy'],
-            "inference_time_ms": model_info['config'].get('inference_time_ms', 0),
-            "parameters": model_info['config'].get('parameters', 'N/A'),
-            "use_case": model_info['config'].get('use_case', ''),
-            "is_loaded": model_info.get('loaded', False),
-            "is_default": model_info['config'].get('is_default', False)
+            "name": model_info['name'],
+            "accuracy": model_info['accuracy'],
+            "inference_time_ms": model_info['inference_time_ms'],
+            "parameters": model_info['parameters'],
+            "use_case": model_info['use_case'],
+            "is_loaded": model_info['loaded'],
+            "is_default": model_info['is_default'],
+            "memory_mb": model_info['memory_mb']
         }
     }
 
@@ -56,6 +110,11 @@ async def get_model_info(model_id: str, request: Request):
 async def benchmark_models(request: Request):
     """
     Get benchmark comparison of all models
+    
+    Serves the latest measured run (`python -m app.ml.benchmark`): latency
+    percentiles, throughput, peak memory and accuracy per batch size and thread
+    setting, with its timestamp and hardware fingerprint. Recommendations are
+    derived from these numbers (`recommendation.basis` tells which were used).
     """
     model_manager = request.app.state.model_manager()
     benchmark = model_manager.benchmark_models()
@@ -66,22 +125,108 @@ async def benchmark_models(request: Request):
     }
 
 
+@router.get("/cache/stats")
+async def prediction_cache_stats(request: Request):
+    """
+    Get prediction cache hit/miss counters
+    """
+    prediction_cache = request.app.state.prediction_cache()
+    
+    if prediction_cache is None:
+        return {
+            "success": True,
+            "enabled": False
+        }
+    
+    return {
+        "success": True,
+        "enabled": True,
+        "cache": prediction_cache.stats()
+    }
+
+
+@router.get("/shadow/stats")
+async def shadow_stats(request: Request):
+    """
+    Get shadow scoring results of candidate models
+    
+    A fraction of each primary model's requests (its `shadow` block in
+    model_config.yaml) is replayed on the candidate in the background. Per
+    primary -> candidate pair: decision agreement, probability and confidence
+    differences, latencies and dropped work. One report per inference worker.
+    """
+    executor = request.app.state.inference_executor()
+    
+    results = await executor.broadcast_model("shadow_stats")
+    errors = [str(r) for r in results if isinstance(r, Exception)]
+    
+    return {
+        "success": not errors,
+        "reports": [r for r in results if isinstance(r, dict)],
+        "errors": errors
+    }
+
+
 @router.post("/set-default/{model_id}")
 async def set_default_model(model_id: str, request: Request):
     """
     Set the default model for predictions
     """
     model_manager = request.app.state.model_manager()
+    executor = request.app.state.inference_executor()
     
-    try:
-        model_manager.set_default_model(model_id)
+    if model_id not in model_manager.model_ids():
         return {
-            "success": True,
-            "message": f"Default model set to {model_id}",
-            "default_model": model_id
+            "success": False,
+            "error": f"Modèle {model_id} non trouvé"
         }
-    except ValueError as e:
+    
+    # The model is loaded and warmed by whoever serves inference before the switch
+    # (sticky: process workers restarted later switch too)
+    results = await executor.broadcast_model("set_default_model", model_id, sticky=True)
+    errors = [str(r) for r in results if isinstance(r, Exception)]
+    if errors:
         return {
             "success": False,
-            "error": str(e)
-        }
\ No newline at end of file
+            "error": errors[0]
+        }
+    
+    if executor.remote:
+        model_manager.set_default_model(model_id, warm=False)
+    
+    return {
+        "success": True,
+        "message": f"Default model set to {model_id}",
+        "default_model": model_id
+    }
+
+
+@router.post("/reload")
+async def reload_models(
+    request: Request,
+    model_id: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Re-read model_config.yaml and hot-swap changed models (admin only)
+    
+    - **model_id**: Models to reload even if unchanged (optional, repeatable)
+    
+    New versions are loaded and warmed in the background, then switched in
+    atomically; in-flight requests finish on the old version.
+    """
+    model_manager = request.app.state.model_manager()
+    executor = request.app.state.inference_executor()
+    
+    if executor.remote:
+        # The API process only needs the new configuration (models live elsewhere)
+        await asyncio.to_thread(model_manager.reload)
+    
+    results = await executor.broadcast_model("reload", model_id)
+    errors = [str(r) for r in results if isinstance(r, Exception)]
+    
+    return {
+        "success": not errors and not any(r['errors'] for r in results if isinstance(r, dict)),
+        "reports": [r for r in results if isinstance(r, dict)],
+        "errors": errors
+    }
\ No newline at end of file
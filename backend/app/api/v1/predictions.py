@@ -4,7 +4,9 @@
 
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
 from typing import List, Optional
+import asyncio
 import os
 import uuid
 import time
@@ -16,12 +18,26 @@ from app.api.deps import get_current_user
 from app.models.user import User
 from app.models.prediction import Prediction
 from app.services.ml_service import MLService
+from app.ml.inference_executor import InferenceQueueFull
 from app.schemas.prediction import PredictionResponse, PredictionDetail, BatchPredictionResponse
-from app.utils.image_processing import validate_image, save_upload_file
+from app.services.image_store import add_references, release_reference, ensure_blob, discard_unreferenced
+from app.utils.image_processing import (
+    UploadTooLarge, validate_image, read_upload_file, save_upload_file, store_upload_bytes, delete_file
+)
 
 router = APIRouter()
 
 
+async def _get_cache_key(request: Request, image_hash: str, model_id: str) -> Optional[tuple]:
+    """Prediction cache key for this image and model version (None if the cache is disabled)"""
+    if request.app.state.prediction_cache() is None:
+        return None
+    
+    # Versioned where the models live (no artifact download or hashing in API workers)
+    version = await request.app.state.inference_executor().artifact_version(model_id)
+    return (image_hash, model_id, version)
+
+
 @router.post("/predict", response_model=PredictionResponse)
 async def predict_single(
     file: UploadFile = File(...),
@@ -38,44 +54,69 @@ async def predict_single(
     Make a prediction on a single image
     
     - **file**: Image file (PNG, JPG, JPEG)
-    - **model_id**: Model to use (optional, default: model_3)
+    - **model_id**: Model to use (optional, default: model_3), or "cascade"
     - **patient_id**: Patient ID (optional)
     - **patient_name**: Patient name (optional)
     - **patient_age**: Patient age (optional)
     - **notes**: Additional notes (optional)
     """
     
-    # Validate image
+    # Validate image and read it (hashed and size-checked in the same pass)
     try:
         await validate_image(file)
+        contents, image_hash = await read_upload_file(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    # Get model manager
+    # Get model manager and inference executor
     model_manager = request.app.state.model_manager()
+    executor = request.app.state.inference_executor()
     
     # Use default model if not specified
     if model_id is None:
-        model_id = settings.DEFAULT_MODEL_ID
+        model_id = model_manager.current_model_id
     
     # Validate model_id
-    if model_id not in model_manager.models:
+    if model_id not in model_manager.available_model_ids():
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid model_id. Available: {list(model_manager.models.keys())}"
+            detail=f"Invalid model_id. Available: {model_manager.available_model_ids()}"
         )
     
+    file_path = None
+    
     try:
-        # Save uploaded file
-        file_path, filename = await save_upload_file(file)
+        # The original is stored while the image is decoded and predicted
+        persist = asyncio.create_task(store_upload_bytes(contents, image_hash))
         
-        # Preprocess image
-        ml_service = MLService()
-        processed_image = ml_service.preprocess_image(file_path)
+        try:
+            # Cache hits skip preprocessing and inference
+            prediction_cache = request.app.state.prediction_cache()
+            cache_key = await _get_cache_key(request, image_hash, model_id)
+            start_time = time.time()
+            result = (await prediction_cache.aget(*cache_key)) if cache_key else None
+            
+            if result is not None:
+                result = {**result, 'cached': True}
+            else:
+                # Preprocess image
+                ml_service = MLService()
+                processed_image = await executor.run(ml_service.preprocess_bytes, contents)
+                
+                # Make prediction
+                start_time = time.time()
+                result = await executor.run_model("predict", processed_image, model_id=model_id)
+                ml_service.release(processed_image)
+                
+                if cache_key:
+                    await prediction_cache.aset(*cache_key, result)
+        finally:
+            # The database row must not reference a file that was never written
+            file_path = await persist
+        filename = os.path.basename(file_path)
         
-        # Make prediction
-        start_time = time.time()
-        result = model_manager.predict(processed_image, model_id=model_id)
         inference_time = (time.time() - start_time) * 1000  # Convert to ms
         
         # Save prediction to database
@@ -83,7 +124,7 @@ async def predict_single(
             user_id=current_user.id,
             image_filename=filename,
             image_path=file_path,
-            image_size=os.path.getsize(file_path),
+            image_size=len(contents),
             model_id=result['model_id'],
             model_name=result['model_name'],
             prediction=result['prediction'],
@@ -100,6 +141,10 @@ async def predict_single(
         
         db.add(prediction)
         
+        # Count the reference to the (possibly shared) image
+        await add_references(db, {image_hash: (file_path, len(contents), 1)})
+        await asyncio.to_thread(ensure_blob, file_path, contents, image_hash)
+        
         # Update user stats
         current_user.total_predictions += 1
         current_user.last_login = datetime.utcnow()
@@ -119,8 +164,12 @@ async def predict_single(
         
         return response
         
+    except InferenceQueueFull:
+        await discard_unreferenced(db, [file_path] if file_path else [])
+        raise
     except Exception as e:
         await db.rollback()
+        await discard_unreferenced(db, [file_path] if file_path else [])
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
@@ -135,12 +184,15 @@ async def predict_batch(
     """
     Make predictions on multiple images
     
+    All readable images are stacked into one tensor and run through the model
+    in chunks of `MAX_INFERENCE_BATCH_SIZE`, then stored with one bulk insert.
+    
     - **files**: List of image files
     - **model_id**: Model to use (optional)
     """
     
     # Limit number of files
-    max_batch_size = 10
+    max_batch_size = settings.MAX_BATCH_FILES
     if len(files) > max_batch_size:
         raise HTTPException(
             status_code=400, 
@@ -149,72 +201,154 @@ async def predict_batch(
     
     # Get model manager
     model_manager = request.app.state.model_manager()
+    executor = request.app.state.inference_executor()
     ml_service = MLService()
     
     if model_id is None:
-        model_id = settings.DEFAULT_MODEL_ID
+        model_id = model_manager.current_model_id
     
-    results = []
+    if model_id not in model_manager.available_model_ids():
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid model_id. Available: {model_manager.available_model_ids()}"
+        )
+    
+    saved = []
     failed = []
+    copies = {}  # image_hash -> private copies of the upload (see ensure_blob)
     
+    # Validate and stream every file to disk
     for file in files:
         try:
-            # Validate and process
             await validate_image(file)
-            file_path, filename = await save_upload_file(file)
-            processed_image = ml_service.preprocess_image(file_path)
-            
-            # Predict
-            start_time = time.time()
-            result = model_manager.predict(processed_image, model_id=model_id)
-            inference_time = (time.time() - start_time) * 1000
-            
-            # Save to DB
-            prediction = Prediction(
-                user_id=current_user.id,
-                image_filename=filename,
-                image_path=file_path,
-                image_size=os.path.getsize(file_path),
-                model_id=result['model_id'],
-                model_name=result['model_name'],
-                prediction=result['prediction'],
-                is_parasitized=result['is_parasitized'],
-                confidence=result['confidence'],
-                probability_parasitized=result['probability_parasitized'],
-                probability_uninfected=result['probability_uninfected'],
-                inference_time_ms=inference_time
-            )
-            
-            db.add(prediction)
-            await db.flush()
-            
-            results.append({
-                "success": True,
-                "filename": filename,
-                "prediction_id": prediction.id,
-                "result": result,
-                "inference_time_ms": inference_time
-            })
-            
+            original_filename = file.filename
+            file_path, filename, image_hash, size, copy_path = await save_upload_file(file)
+            saved.append((original_filename, filename, file_path, size, image_hash))
+            copies.setdefault(image_hash, []).append(copy_path)
         except Exception as e:
             failed.append({
                 "filename": file.filename,
                 "error": str(e)
             })
     
-    # Update user stats
-    current_user.total_predictions += len(results)
-    
-    await db.commit()
-    
-    return BatchPredictionResponse(
-        success=True,
-        total_uploaded=len(files),
-        successful=len(results),
-        failed=len(failed),
-        results=results,
-        errors=failed if failed else None
-    )
+    try:
+        stored_paths = [file_path for _, _, file_path, _, _ in saved]
+        batch = None
+        inference = None
+        
+        try:
+            # Decode everything into one (N, 64, 64, 3) tensor
+            batch, decode_errors = await executor.run(ml_service.preprocess_batch, stored_paths)
+            
+            # One forward pass per chunk
+            start_time = time.time()
+            inference = executor.submit_model(
+                "predict_batch", batch, model_id=model_id,
+                max_chunk_size=settings.MAX_INFERENCE_BATCH_SIZE
+            )
+            predictions = await asyncio.wrap_future(inference)
+            inference_time = (time.time() - start_time) * 1000 / max(len(predictions), 1)
+        except InferenceQueueFull:
+            # No prediction will reference the stored uploads
+            await discard_unreferenced(db, stored_paths)
+            raise
+        except Exception as e:
+            await discard_unreferenced(db, stored_paths)
+            raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+        finally:
+            if inference is not None:
+                # Back to the pool only once the forward pass is really over: a
+                # cancelled request (client gone) must not hand the block to
+                # another request while the executor still reads it
+                inference.add_done_callback(lambda _: ml_service.release(batch))
+            elif batch is not None:
+                ml_service.release(batch)
+        
+        for index, error in decode_errors.items():
+            failed.append({
+                "filename": saved[index][0],
+                "error": error
+            })
+        
+        decoded = [item for index, item in enumerate(saved) if index not in decode_errors]
+        
+        # Undecodable uploads are not kept
+        await discard_unreferenced(db, {
+            file_path for _, _, file_path, _, _ in saved
+        } - {file_path for _, _, file_path, _, _ in decoded})
+        
+        results = []
+        
+        if predictions:
+            # Save all predictions with a single bulk INSERT
+            rows = [
+                {
+                    "user_id": current_user.id,
+                    "image_filename": filename,
+                    "image_path": file_path,
+                    "image_size": size,
+                    "model_id": result['model_id'],
+                    "model_name": result['model_name'],
+                    "prediction": result['prediction'],
+                    "is_parasitized": result['is_parasitized'],
+                    "confidence": result['confidence'],
+                    "probability_parasitized": result['probability_parasitized'],
+                    "probability_uninfected": result['probability_uninfected'],
+                    "inference_time_ms": inference_time
+                }
+                for (_, filename, file_path, size, _), result in zip(decoded, predictions)
+            ]
+            
+            # Identical images in the batch share one blob
+            blobs = {}
+            for _, _, file_path, size, image_hash in decoded:
+                _, _, count = blobs.get(image_hash, (file_path, size, 0))
+                blobs[image_hash] = (file_path, size, count + 1)
+            
+            try:
+                await add_references(db, blobs)
+                for image_hash, (file_path, _, _) in blobs.items():
+                    await asyncio.to_thread(
+                        ensure_blob, file_path, sha256=image_hash, copy_path=copies[image_hash][0]
+                    )
+                inserted = await db.execute(
+                    insert(Prediction).returning(Prediction.id, sort_by_parameter_order=True),
+                    rows
+                )
+                prediction_ids = inserted.scalars().all()
+            except Exception as e:
+                await db.rollback()
+                await discard_unreferenced(db, stored_paths)
+                raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+            
+            results = [
+                {
+                    "success": True,
+                    "filename": filename,
+                    "prediction_id": prediction_id,
+                    "result": result,
+                    "inference_time_ms": inference_time
+                }
+                for (_, filename, _, _, _), result, prediction_id in zip(decoded, predictions, prediction_ids)
+            ]
+        
+        # Update user stats
+        current_user.total_predictions += len(results)
+        
+        await db.commit()
+        
+        return BatchPredictionResponse(
+            success=True,
+            total_uploaded=len(files),
+            successful=len(results),
+            failed=len(failed),
+            results=results,
+            errors=failed if failed else None
+        )
+    finally:
+        for paths in copies.values():
+            for copy_path in paths:
+                await asyncio.to_thread(delete_file, copy_path)
 
 
 @router.post("/predict/compare", response_model=dict)
@@ -231,14 +365,38 @@ async def predict_compare_models(
     
     try:
         await validate_image(file)
-        file_path, filename = await save_upload_file(file)
-        
-        ml_service = MLService()
-        processed_image = ml_service.preprocess_image(file_path)
+        contents, image_hash = await read_upload_file(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    file_path = None
+    
+    try:
+        persist = asyncio.create_task(store_upload_bytes(contents, image_hash))
         
-        # Get model manager and compare
-        model_manager = request.app.state.model_manager()
-        comparison = model_manager.compare_models(processed_image)
+        try:
+            # Cache hits skip preprocessing and inference
+            prediction_cache = request.app.state.prediction_cache()
+            cache_key = await _get_cache_key(request, image_hash, "ensemble")
+            comparison = (await prediction_cache.aget(*cache_key)) if cache_key else None
+            
+            if comparison is None:
+                executor = request.app.state.inference_executor()
+                
+                ml_service = MLService()
+                processed_image = await executor.run(ml_service.preprocess_bytes, contents)
+                
+                # Compare all models
+                comparison = await executor.run_model("compare_models", processed_image)
+                ml_service.release(processed_image)
+                
+                if cache_key:
+                    await prediction_cache.aset(*cache_key, comparison)
+        finally:
+            file_path = await persist
+        filename = os.path.basename(file_path)
         
         # Save best prediction to DB (ensemble or best model)
         best_result = comparison['ensemble']
@@ -247,7 +405,7 @@ async def predict_compare_models(
             user_id=current_user.id,
             image_filename=filename,
             image_path=file_path,
-            image_size=os.path.getsize(file_path),
+            image_size=len(contents),
             model_id="ensemble",
             model_name="Ensemble Model",
             prediction=best_result['prediction'],
@@ -259,6 +417,8 @@ async def predict_compare_models(
         )
         
         db.add(prediction)
+        await add_references(db, {image_hash: (file_path, len(contents), 1)})
+        await asyncio.to_thread(ensure_blob, file_path, contents, image_hash)
         current_user.total_predictions += 1
         await db.commit()
         await db.refresh(prediction)
@@ -270,8 +430,12 @@ async def predict_compare_models(
             "image_filename": filename
         }
         
+    except InferenceQueueFull:
+        await discard_unreferenced(db, [file_path] if file_path else [])
+        raise
     except Exception as e:
         await db.rollback()
+        await discard_unreferenced(db, [file_path] if file_path else [])
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -362,10 +526,10 @@ async def delete_prediction(
     if not prediction:
         raise HTTPException(status_code=404, detail="Prediction not found")
     
-    # Delete image file
+    # Release the image (its file goes with the last prediction using it)
+    released = None
     try:
-        if os.path.exists(prediction.image_path):
-            os.remove(prediction.image_path)
+        released = await release_reference(db, prediction.image_path)
     except Exception as e:
         print(f"Error deleting file: {e}")
     
@@ -374,4 +538,12 @@ async def delete_prediction(
     current_user.total_predictions -= 1
     await db.commit()
     
+    # Only once the delete is committed, unless the image was uploaded again since
+    if released:
+        try:
+            await discard_unreferenced(db, [released])
+            await db.commit()
+        except Exception as e:
+            print(f"Error deleting file: {e}")
+    
     return {"success": True, "message": "Prediction deleted"}
\ No newline at end of file
@@ -37,12 +37,37 @@ class Settings(BaseSettings):
     # File Upload
     MAX_UPLOAD_SIZE: int = 16 * 1024 * 1024  # 16 MB
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read/written at a time when streaming uploads
     ALLOWED_EXTENSIONS: List[str] = ["png", "jpg", "jpeg"]
     
     # ML Models
     MODELS_DIR: str = "app/ml/models"
     MODEL_CONFIG_PATH: str = "app/ml/model_config.yaml"
     DEFAULT_MODEL_ID: str = "model_2"
+    MODEL_LOAD_POLICY: str = "eager-default"  # "lazy", "eager-default" or "eager-all"
+    MODEL_PRELOAD_WORKERS: int = 3  # Parallel downloads/loads at startup
+    MODEL_MEMORY_BUDGET_MB: int = 0  # Resident models budget, LRU eviction (0 = unlimited)
+    MODEL_RELOAD_INTERVAL_SECONDS: float = 0  # Watch config/artifacts for hot reload (0 = disabled)
+    MODEL_MIRROR: str | None = None  # Local directory or http(s) file server replacing model remotes
+    
+    # Inference executor
+    INFERENCE_EXECUTOR: str = "thread"  # "thread", "process" or "server"
+    INFERENCE_SERVER_SOCKET: str = "/tmp/malaria-inference.sock"  # Used when INFERENCE_EXECUTOR="server"
+    INFERENCE_WORKERS: int = 4  # Thread mode: also the most requests one micro-batch can gather
+    INFERENCE_INTRA_OP_THREADS: int = 0  # Threads per op (0 = usable CPUs / inference processes)
+    INFERENCE_INTER_OP_THREADS: int = 0  # Ops run in parallel (0 = auto)
+    INFERENCE_CPU_AFFINITY: str | None = None  # e.g. "0-7", or "per-worker" to split CPUs across process workers
+    INFERENCE_QUEUE_SIZE: int = 32  # Pending jobs beyond workers before 503
+    INFERENCE_RETRY_AFTER_SECONDS: int = 1
+    MAX_BATCH_FILES: int = 500  # Files per /predict/batch request
+    MAX_INFERENCE_BATCH_SIZE: int = 64  # Images per forward pass
+    
+    # Prediction cache (keyed by image hash + model artifact hash)
+    PREDICTION_CACHE_ENABLED: bool = True
+    PREDICTION_CACHE_MAX_ENTRIES: int = 10000
+    PREDICTION_CACHE_TTL_SECONDS: int = 24 * 3600
+    PREDICTION_CACHE_DISK_PATH: str | None = None  # e.g. "app/ml/cache/predictions.sqlite3"
+    PREDICTION_CACHE_DISK_MAX_ENTRIES: int = 100000  # Oldest disk entries dropped beyond this
 
     # Hugging Face
     HF_TOKEN: str | None = None
@@ -52,6 +77,7 @@ class Settings(BaseSettings):
     
     # Image Processing
     IMAGE_SIZE: int = 64
+    IMAGE_REDUCED_DECODE: bool = True  # Decode large JPEGs at 1/2, 1/4 or 1/8 scale when still >= IMAGE_SIZE
     
     # Email (for password reset, notifications)
     MAIL_USERNAME: str = ""
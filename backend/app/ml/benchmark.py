@@ -0,0 +1,349 @@
+# ========================================
+# BENCHMARK DES MODÈLES - Mesures réelles sur cell_images/
+# ========================================
+#
+# Exécute chaque modèle de model_config.yaml sur un échantillon held-out de
+# cell_images/, pour plusieurs tailles de batch et réglages de threads, et
+# enregistre latences (p50 / p90 / p99), débit, mémoire crête et accuracy
+# avec un horodatage et l'empreinte matérielle de la machine. Ces résultats
+# alimentent /api/v1/models/benchmark et les recommandations du ModelManager.
+#
+# Chaque couple (modèle, réglage de threads) tourne dans un sous-processus
+# neuf : TensorFlow ne fixe ses threads qu'une fois par processus, et la
+# mémoire crête mesurée est celle du seul modèle.
+#
+# Usage (depuis backend/):
+#   python -m app.ml.benchmark --samples 1000 --batch-sizes 1,8,32 --threads 0:0 --threads 1:1
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from app.ml.cpu_topology import effective_cpu_count, resolve_threads
+
+RESULTS_PATH = Path(__file__).parent / "cache" / "benchmarks.json"
+MAX_RUNS = 20  # Exécutions conservées dans le fichier de résultats
+ACCURACY_TOLERANCE = 0.005  # Écart d'accuracy jugé équivalent pour les recommandations
+
+_runs_cache = {'path': None, 'mtime': None, 'runs': []}
+
+
+@functools.lru_cache(maxsize=1)
+def hardware_fingerprint() -> Dict:
+    """Description de la machine et empreinte courte (sans importer de runtime ML)"""
+    cpu_model = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_model = next(
+                (line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu_model
+            )
+    except OSError:
+        pass
+
+    try:
+        memory_gb = round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3, 1)
+    except (ValueError, OSError, AttributeError):
+        memory_gb = None
+
+    hardware = {
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpu_model': cpu_model,
+        'cpu_count': os.cpu_count(),
+        'effective_cpus': effective_cpu_count(),
+        'memory_gb': memory_gb,
+    }
+    hardware['fingerprint'] = hashlib.sha256(
+        json.dumps(hardware, sort_keys=True).encode()
+    ).hexdigest()[:12]
+    return hardware
+
+
+def _peak_rss_mb() -> float:
+    """Mémoire résidente crête du processus (ru_maxrss : Ko sous Linux, octets sous macOS)"""
+    # Import local : `resource` n'existe que sous Unix et ce module est importé par l'API
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_model(model_config: Dict,
+                  images: np.ndarray,
+                  labels: np.ndarray,
+                  batch_sizes: List[int],
+                  intra_op: int,
+                  inter_op: int,
+                  repeats: int,
+                  batch_buckets,
+                  with_accuracy: bool) -> Dict:
+    """Charge un modèle avec un réglage de threads et mesure latences, débit, mémoire, accuracy"""
+    from app.ml.model_loader import load_model
+    from app.ml.runtimes import configure_threads
+
+    intra_op, inter_op = resolve_threads(intra_op, inter_op)
+    configure_threads(intra_op, inter_op)
+
+    baseline_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    runner = load_model(model_config, batch_buckets=batch_buckets)
+    result = {
+        'intra_op': intra_op,
+        'inter_op': inter_op,
+        'load_s': round(time.perf_counter() - start, 3),
+        'model_memory_mb': round(runner.memory_bytes / (1024 * 1024), 2),
+        'batches': []
+    }
+
+    if with_accuracy:
+        largest = max(batch_sizes)
+        probas = np.concatenate([
+            runner.predict(images[i:i + largest]) for i in range(0, len(images), largest)
+        ])
+        result['accuracy'] = round(float(np.mean((probas > 0.5) == labels)), 4)
+        result['samples'] = int(len(labels))
+
+    for batch_size in batch_sizes:
+        # Échantillon répété si le batch dépasse le nombre d'images disponibles
+        batch = np.resize(images, (batch_size,) + images.shape[1:])
+        runner.predict(batch)
+
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            runner.predict(batch)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        result['batches'].append({
+            'batch_size': batch_size,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p90_ms': round(float(np.percentile(latencies, 90)), 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'throughput': round(batch_size * len(latencies) / (sum(latencies) / 1000), 1),
+        })
+
+    result['peak_memory_mb'] = round(_peak_rss_mb() - baseline_mb, 1)
+    result['runtime'] = runner.format
+    return result
+
+
+def load_runs(path: Path = RESULTS_PATH) -> List[Dict]:
+    """Exécutions enregistrées, de la plus ancienne à la plus récente (relues si le fichier change)"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return []
+
+    if _runs_cache['path'] != str(path) or _runs_cache['mtime'] != mtime:
+        with open(path, "r") as f:
+            runs = json.load(f).get('runs', [])
+        _runs_cache.update(path=str(path), mtime=mtime, runs=runs)
+    return _runs_cache['runs']
+
+
+def save_run(run: Dict, path: Path = RESULTS_PATH):
+    """Ajoute une exécution au fichier de résultats (écriture atomique)"""
+    runs = (load_runs(path) + [run])[-MAX_RUNS:]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({'runs': runs}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def latest_run(path: Path = RESULTS_PATH, fingerprint: Optional[str] = None) -> Optional[Dict]:
+    """Dernière exécution, de préférence sur la même machine (`same_hardware` l'indique)"""
+    runs = load_runs(path)
+    if not runs:
+        return None
+
+    fingerprint = fingerprint or hardware_fingerprint()['fingerprint']
+    matching = [run for run in runs if run['hardware']['fingerprint'] == fingerprint]
+    run = (matching or runs)[-1]
+    return {**run, 'same_hardware': bool(matching)}
+
+
+def summarize(run: Dict) -> Dict[str, Dict]:
+    """
+    Chiffres clés par modèle : accuracy, meilleure latence au batch 1 (p50 / p99),
+    meilleur débit tous batchs confondus, mémoire crête
+    """
+    summary = {}
+    for model_id, measures in run['models'].items():
+        measures = [m for m in measures if 'error' not in m]
+        if not measures:
+            continue
+
+        batches = [(m, b) for m in measures for b in m['batches']]
+        singles = [(m, b) for m, b in batches if b['batch_size'] == 1] or batches
+        fastest_m, fastest = min(singles, key=lambda mb: mb[1]['p50_ms'])
+        busiest_m, busiest = max(batches, key=lambda mb: mb[1]['throughput'])
+        accuracy = next((m['accuracy'] for m in measures if 'accuracy' in m), None)
+
+        summary[model_id] = {
+            'accuracy': accuracy,
+            'p50_ms': fastest['p50_ms'],
+            'p99_ms': fastest['p99_ms'],
+            'latency_threads': f"{fastest_m['intra_op']}:{fastest_m['inter_op']}",
+            'throughput': busiest['throughput'],
+            'throughput_batch_size': busiest['batch_size'],
+            'throughput_threads': f"{busiest_m['intra_op']}:{busiest_m['inter_op']}",
+            'peak_memory_mb': max(m['peak_memory_mb'] for m in measures),
+            'load_s': min(m['load_s'] for m in measures),
+        }
+    return summary
+
+
+def recommend(models: Dict[str, Dict], tolerance: float = ACCURACY_TOLERANCE) -> Dict:
+    """
+    Recommandations à partir de {model_id: {'accuracy', 'p50_ms', 'throughput'}}
+
+    - speed : latence la plus faible
+    - accuracy : accuracy la plus élevée
+    - balanced : le plus rapide parmi ceux à `tolerance` près de la meilleure accuracy
+    - production : le meilleur débit parmi ces mêmes modèles
+    """
+    if not models:
+        return {}
+
+    best_accuracy = max(m['accuracy'] or 0 for m in models.values())
+    accurate = {
+        model_id: m for model_id, m in models.items() if (m['accuracy'] or 0) >= best_accuracy - tolerance
+    }
+    return {
+        'speed': min(models, key=lambda model_id: models[model_id]['p50_ms']),
+        'accuracy': max(models, key=lambda model_id: models[model_id]['accuracy'] or 0),
+        'balanced': min(accurate, key=lambda model_id: accurate[model_id]['p50_ms']),
+        'production': max(accurate, key=lambda model_id: accurate[model_id].get('throughput') or 0),
+        'ensemble': 'ensemble'
+    }
+
+
+def _run_worker(args, model_id: str, threads: str, data_path: str, with_accuracy: bool) -> Dict:
+    """Lance `measure_model` dans un sous-processus et retourne son résultat"""
+    command = [
+        sys.executable, "-m", "app.ml.benchmark", "--worker", threads,
+        "--model-id", model_id, "--data", data_path, "--config", args.config,
+        "--batch-sizes", args.batch_sizes, "--repeats", str(args.repeats)
+    ]
+    if with_accuracy:
+        command.append("--with-accuracy")
+
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode != 0:
+        lines = output.stderr.strip().splitlines()
+        return {'threads': threads, 'error': lines[-1] if lines else f"code {output.returncode}"}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure_thread_settings(args, model_id: str, thread_settings: List[str], data_path: str) -> List[Dict]:
+    """Mesure un modèle pour chaque réglage de threads (un sous-processus par réglage)"""
+    results = []
+    with_accuracy = True
+    for threads in thread_settings:
+        # L'accuracy ne dépend pas des threads : mesurée une seule fois,
+        # au premier réglage qui aboutit
+        result = _run_worker(args, model_id, threads, data_path, with_accuracy=with_accuracy)
+        results.append(result)
+        with_accuracy = with_accuracy and 'accuracy' not in result
+
+        if 'error' in result:
+            print(f"❌ {model_id} [{threads}] : {result['error']}")
+            continue
+        accuracy = f", accuracy {result['accuracy']:.4f}" if 'accuracy' in result else ""
+        print(f"✅ {model_id} [{result['intra_op']}:{result['inter_op']}] chargé en "
+              f"{result['load_s']:.2f}s, mémoire crête {result['peak_memory_mb']:.0f} MB{accuracy}")
+        for b in result['batches']:
+            print(f"   batch {b['batch_size']:>3} : p50 {b['p50_ms']:>8.2f} ms, "
+                  f"p99 {b['p99_ms']:>8.2f} ms, {b['throughput']:>9.1f} img/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mesuré des modèles sur cell_images/")
+    parser.add_argument("--model-id", action="append", help="Modèle(s) à mesurer (défaut : tous)")
+    parser.add_argument("--samples", type=int, default=1000, help="Images held-out (0 = toutes)")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--threads", action="append",
+                        help="intra_op:inter_op (0 = automatique), répétable (défaut : 0:0)")
+    parser.add_argument("--repeats", type=int, default=50, help="Mesures par taille de batch")
+    parser.add_argument("--config", default="app/ml/model_config.yaml")
+    parser.add_argument("--output", default=str(RESULTS_PATH))
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--data", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--with-accuracy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    batch_buckets = config.get('inference', {}).get('batch_buckets', batch_sizes)
+
+    if args.worker is not None:
+        # Sous-processus : un modèle, un réglage de threads, résultat JSON sur stdout
+        intra_op, inter_op = (int(v) for v in args.worker.split(":"))
+        model_config = next(m for m in config['models'] if m['id'] == args.model_id[0])
+        data = np.load(args.data)
+        result = measure_model(model_config, data['images'], data['labels'], batch_sizes,
+                               intra_op, inter_op, args.repeats, batch_buckets, args.with_accuracy)
+        print(json.dumps(result))
+        return
+
+    from app.ml import dataset
+    from app.services.ml_service import MLService
+
+    _, holdout = dataset.split(dataset.list_images())
+    items = dataset.sample(holdout, args.samples)
+    images, errors = MLService().preprocess_batch([path for path, _ in items])
+    labels = np.array([label for index, (_, label) in enumerate(items) if index not in errors])
+
+    models = [m for m in config['models'] if not args.model_id or m['id'] in args.model_id]
+    thread_settings = args.threads or ["0:0"]
+    hardware = hardware_fingerprint()
+
+    print(f"📊 {len(models)} modèle(s), {len(labels)} images held-out, batchs {batch_sizes}, "
+          f"threads {thread_settings}")
+    print(f"   Machine {hardware['fingerprint']} : {hardware['cpu_model']}, "
+          f"{hardware['effective_cpus']} CPU utilisables, {hardware['memory_gb']} GB\n")
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'hardware': hardware,
+        'settings': {
+            'samples': int(len(labels)),
+            'batch_sizes': batch_sizes,
+            'threads': thread_settings,
+            'repeats': args.repeats
+        },
+        'models': {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, "sample.npz")
+        np.savez(data_path, images=images, labels=labels)
+
+        for model_config in models:
+            model_id = model_config['id']
+            run['models'][model_id] = measure_thread_settings(args, model_id, thread_settings, data_path)
+
+    save_run(run, Path(args.output))
+    summary = summarize(run)
+    print(f"\n📝 Résultats enregistrés dans {args.output}")
+    print(f"   Recommandations : {recommend(summary)}")
+
+
+if __name__ == "__main__":
+    main()
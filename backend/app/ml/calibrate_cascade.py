@@ -0,0 +1,150 @@
+# ========================================
+# CALIBRATION DE LA CASCADE
+# ========================================
+#
+# Choisit la bande d'incertitude du mode cascade sur cell_images/ : la bande
+# retenue est la moins coûteuse (latence moyenne par image) dont l'accuracy
+# reste au niveau de l'ensemble complet, à `--tolerance` près.
+#
+# Usage (depuis backend/):
+#   python -m app.ml.calibrate_cascade --samples 2000 --write
+
+import argparse
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.ml import dataset
+from app.ml.model_manager import ModelManager, run_cascade
+from app.services.ml_service import MLService
+
+CHUNK_SIZE = 512
+
+
+def score_items(manager: ModelManager,
+                model_ids: List[str],
+                items: List[Tuple[str, int]]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Probabilités de chaque modèle sur `items`, par tranches pour limiter la mémoire"""
+    ml_service = MLService()
+    probas = {model_id: [] for model_id in model_ids}
+    labels = []
+
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = items[start:start + CHUNK_SIZE]
+        batch, errors = ml_service.preprocess_batch([path for path, _ in chunk])
+        labels.extend(label for index, (_, label) in enumerate(chunk) if index not in errors)
+
+        for model_id in model_ids:
+            results = manager.predict_batch(batch, model_id)
+            probas[model_id].extend(r['probability_parasitized'] / 100 for r in results)
+
+    return {m: np.array(p) for m, p in probas.items()}, np.array(labels)
+
+
+def evaluate_band(band, stages, weights, costs, probas, labels) -> Dict:
+    """Accuracy et coût moyen (ms/image) de la cascade pour une bande donnée"""
+    combined, stages_run = run_cascade(
+        len(labels), stages, weights, band,
+        lambda model_id, indices: probas[model_id][indices]
+    )
+    return {
+        'band': (round(float(band[0]), 3), round(float(band[1]), 3)),
+        'accuracy': float(np.mean((combined > 0.5) == labels)),
+        'avg_cost_ms': float(np.mean([sum(costs[m] for m in run) for run in stages_run])),
+        'avg_stages': float(np.mean([len(run) for run in stages_run]))
+    }
+
+
+def select_band(stages, weights, costs, probas, labels,
+                tolerance: float = 0.0, step: float = 0.025) -> Tuple[Dict, Dict]:
+    """
+    Bande la moins coûteuse dont l'accuracy reste à `tolerance` près de
+    celle de l'ensemble complet (à coût égal, la plus précise)
+
+    Returns:
+        Tuple (évaluation de l'ensemble complet, évaluation de la bande retenue)
+    """
+    # Ensemble complet : une bande [0, 1] fait toujours passer à l'étage suivant
+    ensemble = evaluate_band((0.0, 1.0), stages, weights, costs, probas, labels)
+    target = ensemble['accuracy'] - tolerance
+
+    candidates = []
+    for low in np.arange(0.0, 0.5 + 1e-9, step):
+        for high in np.arange(0.5, 1.0 + 1e-9, step):
+            candidates.append(evaluate_band((low, high), stages, weights, costs, probas, labels))
+
+    # L'ensemble complet reste éligible quel que soit le pas de la grille
+    eligible = [ensemble] + [c for c in candidates if c['accuracy'] >= target]
+    return ensemble, min(eligible, key=lambda c: (c['avg_cost_ms'], -c['accuracy']))
+
+
+def write_band(config_path: str, band: Tuple[float, float]):
+    """Met à jour `uncertainty_band` dans model_config.yaml en conservant les commentaires"""
+    with open(config_path, 'r') as f:
+        content = f.read()
+
+    content, count = re.subn(
+        r"(uncertainty_band:\s*)\[[^\]]*\]",
+        lambda m: f"{m.group(1)}[{band[0]}, {band[1]}]",
+        content
+    )
+    if count != 1:
+        raise ValueError("Clé cascade.uncertainty_band introuvable dans la configuration")
+
+    with open(config_path, 'w') as f:
+        f.write(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibration de la bande d'incertitude de la cascade")
+    parser.add_argument("--samples", type=int, default=2000, help="Images de calibration (0 = toutes)")
+    parser.add_argument("--holdout-samples", type=int, default=1000, help="Images held-out (0 = toutes)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Perte d'accuracy tolérée vs ensemble")
+    parser.add_argument("--step", type=float, default=0.025)
+    parser.add_argument("--write", action="store_true", help="Écrire la bande retenue dans model_config.yaml")
+    args = parser.parse_args()
+
+    manager = ModelManager()
+    cascade = manager.get_cascade_config()
+    stages = cascade['stages']
+    weights = {m: manager.models[m]['config']['accuracy'] for m in stages}
+
+    calibration, holdout = dataset.split(dataset.list_images())
+    calibration = dataset.sample(calibration, args.samples)
+    holdout = dataset.sample(holdout, args.holdout_samples)
+
+    print(f"📊 Scoring de {len(calibration)} images de calibration et {len(holdout)} held-out...")
+    calib_probas, calib_labels = score_items(manager, stages, calibration)
+    holdout_probas, holdout_labels = score_items(manager, stages, holdout)
+
+    # Latences mesurées au préchauffage des modèles (batch 1)
+    costs = {m: manager.get_inference_time_ms(m) for m in stages}
+
+    ensemble, best = select_band(
+        stages, weights, costs, calib_probas, calib_labels, args.tolerance, args.step
+    )
+
+    print(f"\nEnsemble complet : accuracy {ensemble['accuracy']:.4f}, "
+          f"coût {ensemble['avg_cost_ms']:.2f} ms/image")
+    print(f"Bande retenue    : {list(best['band'])}, accuracy {best['accuracy']:.4f}, "
+          f"coût {best['avg_cost_ms']:.2f} ms/image "
+          f"({best['avg_cost_ms'] / ensemble['avg_cost_ms'] * 100:.0f}% de l'ensemble), "
+          f"{best['avg_stages']:.2f} étages en moyenne")
+
+    if len(holdout_labels):
+        ens_holdout = evaluate_band((0.0, 1.0), stages, weights, costs, holdout_probas, holdout_labels)
+        best_holdout = evaluate_band(best['band'], stages, weights, costs, holdout_probas, holdout_labels)
+        print(f"Held-out         : ensemble {ens_holdout['accuracy']:.4f} / "
+              f"cascade {best_holdout['accuracy']:.4f}, "
+              f"coût {best_holdout['avg_cost_ms']:.2f} vs {ens_holdout['avg_cost_ms']:.2f} ms/image")
+
+    if args.write:
+        write_band(manager.config_path, best['band'])
+        print(f"\n✅ uncertainty_band mis à jour dans {manager.config_path}")
+
+    manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# ========================================
+# CONVERSION DES MODÈLES - TFLite / ONNX
+# ========================================
+#
+# Produit des artefacts TFLite ou ONNX à partir des fichiers .keras déclarés
+# dans model_config.yaml, et peut les enregistrer comme nouveaux modèles
+# (`model_2_tflite`, `model_2_onnx`...) servis par les runners de runtimes.py.
+#
+# Le format ONNX nécessite les paquets optionnels `tf2onnx` (conversion) et
+# `onnxruntime` (exécution) ; TFLite peut être servi par `tflite-runtime` seul.
+#
+# Usage (depuis backend/):
+#   python -m app.ml.convert_models --format tflite --register
+#   python -m app.ml.convert_models --format onnx --model-id model_2
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from app.ml.model_loader import download_model_if_needed, append_model_config, CONFIG_PATH
+from app.ml.runtimes import get_backend, PIXEL_TO_FLOAT
+
+EXTENSIONS = {"tflite": ".tflite", "onnx": ".onnx"}
+
+
+def convert_to_tflite(model, output_path: Path, representative_dataset=None):
+    """
+    Convertit en TFLite ; avec `representative_dataset` (générateur de lots de
+    calibration), le modèle est entièrement int8, entrée et sortie comprises :
+    TFLiteRunner quantifie les pixels par table et déquantifie la sortie
+    d'après leurs (scale, zero_point)
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if representative_dataset is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    output_path.write_bytes(converter.convert())
+
+
+def convert_to_onnx(model, output_path: Path, input_shape, opset: int = 13):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(input_shape), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(output_path))
+
+
+def converted_entry(model_config: dict, fmt: str, output_path: Path, suffix: str) -> dict:
+    """Entrée model_config.yaml pour un artefact converti"""
+    entry = {
+        "id": f"{model_config['id']}_{suffix}",
+        "name": f"{model_config['name']} ({suffix.upper()})",
+        "format": fmt,
+        "remote": "local",
+        "local_path": str(output_path),
+        "accuracy": model_config["accuracy"],
+        "parameters": model_config.get("parameters", "N/A"),
+        "use_case": model_config.get("use_case", ""),
+        "source_model": model_config["id"],
+    }
+    if "batching" in model_config:
+        entry["batching"] = model_config["batching"]
+    return entry
+
+
+def check_conversion(model, runner, input_shape, n: int = 16) -> float:
+    """Écart maximal de probabilité entre le modèle Keras et l'artefact converti"""
+    pixels = np.random.default_rng(0).integers(0, 256, (n,) + tuple(input_shape), dtype=np.uint8)
+    reference = np.asarray(model(PIXEL_TO_FLOAT[pixels], training=False)).reshape(-1)
+    return float(np.max(np.abs(runner.predict(pixels) - reference)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion des modèles .keras en TFLite / ONNX")
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), required=True)
+    parser.add_argument("--model-id", action="append", help="Modèle(s) à convertir (défaut : tous les .keras)")
+    parser.add_argument("--output-dir", default=None, help="Défaut : à côté de l'artefact source")
+    parser.add_argument("--register", action="store_true", help="Ajouter les artefacts à model_config.yaml")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    models = [
+        m for m in config["models"]
+        if m["format"] == "keras" and (not args.model_id or m["id"] in args.model_id)
+    ]
+
+    for model_config in models:
+        source_path = Path(download_model_if_needed(model_config))
+        output_dir = Path(args.output_dir) if args.output_dir else source_path.parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / (source_path.stem + EXTENSIONS[args.format])
+        input_shape = tuple(model_config.get("input_shape", (64, 64, 3)))
+
+        print(f"🔄 {model_config['id']}: {source_path.name} -> {output_path.name}")
+        model = tf.keras.models.load_model(source_path)
+
+        if args.format == "tflite":
+            convert_to_tflite(model, output_path)
+        else:
+            convert_to_onnx(model, output_path, input_shape)
+
+        runner = get_backend(args.format)(output_path, input_shape, (1, 16))
+        max_diff = check_conversion(model, runner, input_shape)
+        size_mb = output_path.stat().st_size / (1024 * 1024)
+        print(f"   ✅ {size_mb:.1f} MB, écart max vs Keras : {max_diff:.2e}")
+
+        if args.register:
+            entry = converted_entry(model_config, args.format, output_path, args.format)
+            try:
+                append_model_config(entry, args.config)
+                print(f"   📝 {entry['id']} ajouté à {args.config}")
+            except ValueError as e:
+                print(f"   ⚠️ {e}")
+
+
+if __name__ == "__main__":
+    main()
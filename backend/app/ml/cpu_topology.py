@@ -0,0 +1,151 @@
+# ========================================
+# CPU TOPOLOGY - Threads d'inférence et affinité CPU
+# ========================================
+#
+# Les pools de threads intra-op / inter-op des runtimes se dimensionnent par
+# défaut sur tous les cœurs de la machine, sans tenir compte des workers
+# uvicorn, des autres modèles ni du quota CPU du conteneur (cgroup). Ce module
+# calcule des valeurs adaptées au nombre de CPU réellement utilisables et
+# permet d'épingler un processus ou un thread sur un ensemble de CPU.
+
+import math
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """Ensemble de CPU d'une liste au format Linux : '0-3,8' -> {0, 1, 2, 3, 8}"""
+    cpus = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def format_cpu_list(cpus: Iterable[int]) -> str:
+    """Inverse de `parse_cpu_list` : {0, 1, 2, 3, 8} -> '0-3,8'"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def cgroup_cpu_quota(root: Path = CGROUP_ROOT) -> Optional[float]:
+    """
+    Quota CPU du conteneur en nombre de cœurs (ex. 2.5), None si illimité
+
+    cgroup v2 : cpu.max ("<quota> <période>" ou "max <période>")
+    cgroup v1 : cpu.cfs_quota_us / cpu.cfs_period_us (quota -1 = illimité)
+    """
+    try:
+        quota, period = (root / "cpu.max").read_text().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def available_cpus() -> Set[int]:
+    """CPU sur lesquels le processus courant peut s'exécuter (affinité)"""
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+
+def effective_cpu_count() -> int:
+    """Nombre de cœurs utilisables : affinité, bornée par le quota cgroup"""
+    count = len(available_cpus())
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        count = min(count, max(1, math.ceil(quota)))
+    return count
+
+
+def split_cpus(cpus: Iterable[int], parts: int, index: int) -> Set[int]:
+    """Tranche `index` sur `parts` de `cpus`, en blocs contigus (une par worker)"""
+    cpus = sorted(cpus)
+    parts = max(1, min(parts, len(cpus)))
+    size, extra = divmod(len(cpus), parts)
+    index = index % parts
+    start = index * size + min(index, extra)
+    return set(cpus[start:start + size + (1 if index < extra else 0)])
+
+
+def resolve_threads(intra_op: int = 0,
+                    inter_op: int = 0,
+                    cpus: Optional[Set[int]] = None,
+                    processes: int = 1) -> Tuple[int, int]:
+    """
+    Nombre de threads intra-op / inter-op (0 = automatique)
+
+    En automatique, les cœurs utilisables (ou `cpus`, bornés par le quota) sont
+    partagés entre les `processes` processus d'inférence ; l'inter-op reste à 1
+    ou 2 car les graphes des modèles sont essentiellement séquentiels.
+    """
+    count = effective_cpu_count()
+    if cpus:
+        count = min(count, len(cpus))
+    per_process = max(1, count // max(1, processes))
+
+    intra_op = intra_op or per_process
+    inter_op = inter_op or (2 if per_process >= 8 else 1)
+    return intra_op, inter_op
+
+
+def set_affinity(cpus: Optional[Iterable[int]]):
+    """
+    Épingle le thread appelant sur `cpus`
+
+    Sous Linux, les threads créés ensuite par ce thread (pools des runtimes,
+    micro-batchers) héritent de cette affinité.
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    os.sched_setaffinity(0, set(cpus))
+
+
+@contextmanager
+def pinned(cpus: Optional[Iterable[int]]):
+    """Épingle le thread appelant sur `cpus` le temps du bloc, puis restaure son affinité"""
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        yield
+        return
+
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, set(cpus))
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def describe() -> List[str]:
+    """Résumé de la topologie vue par le processus (pour les logs et benchmarks)"""
+    quota = cgroup_cpu_quota()
+    return [
+        f"cpu_count={os.cpu_count()}",
+        f"affinity={format_cpu_list(available_cpus())}",
+        f"cgroup_quota={'none' if quota is None else f'{quota:g}'}",
+        f"effective={effective_cpu_count()}",
+    ]
@@ -0,0 +1,52 @@
+# ========================================
+# DATASET - Accès au jeu de données étiqueté (cell_images/)
+# ========================================
+
+import hashlib
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+# backend/app/ml/dataset.py -> racine du dépôt
+DATASET_DIR = Path(__file__).resolve().parents[3] / "cell_images"
+
+# Même convention de labels que le notebook d'entraînement
+CLASSES = {"Parasitized": 1, "Uninfected": 0}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+
+def list_images(root: Path = DATASET_DIR) -> List[Tuple[str, int]]:
+    """Liste (chemin, label) de toutes les images, triée pour être reproductible"""
+    items = []
+    for class_name, label in CLASSES.items():
+        class_dir = Path(root) / class_name
+        if not class_dir.is_dir():
+            raise FileNotFoundError(f"Dossier introuvable : {class_dir}")
+        items.extend(
+            (str(path), label)
+            for path in sorted(class_dir.iterdir())
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        )
+    return items
+
+
+def is_holdout(path: str, holdout_fraction: float = 0.15) -> bool:
+    """Affectation stable d'une image au split held-out, par hash du nom de fichier"""
+    digest = hashlib.sha1(Path(path).name.encode()).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF < holdout_fraction
+
+
+def split(items: List[Tuple[str, int]],
+          holdout_fraction: float = 0.15) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    """Sépare (calibration, held-out) de façon déterministe"""
+    calibration, holdout = [], []
+    for item in items:
+        (holdout if is_holdout(item[0], holdout_fraction) else calibration).append(item)
+    return calibration, holdout
+
+
+def sample(items: List[Tuple[str, int]], n: int, seed: int = 42) -> List[Tuple[str, int]]:
+    """Échantillon aléatoire reproductible de n images (toutes si n <= 0)"""
+    if n <= 0 or n >= len(items):
+        return list(items)
+    return random.Random(seed).sample(items, n)
@@ -0,0 +1,258 @@
+# ========================================
+# ÉVALUATION HORS LIGNE - cell_images/ en streaming
+# ========================================
+#
+# Évalue chaque modèle de model_config.yaml, et l'ensemble pondéré de
+# `_predict_all_models` (modèles votants seulement : ni variantes converties
+# ni candidats shadow), sur le jeu étiqueté cell_images/ sans le charger en
+# mémoire : les images sont décodées par tranches dans un pool de threads
+# (quelques tranches d'avance au plus) et chaque tranche passe en un forward
+# pass par modèle. Seule une probabilité par image et par modèle est gardée.
+#
+# Rapport : matrice de confusion, sensibilité / spécificité, ROC / AUC et
+# calibration (fiabilité par intervalle, ECE, Brier) par modèle. Avec
+# --write-accuracy, les accuracies mesurées remplacent celles de
+# model_config.yaml, qui pondèrent l'ensemble.
+#
+# Usage (depuis backend/):
+#   python -m app.ml.evaluate --split all --workers 8
+#   python -m app.ml.evaluate --split holdout --write-accuracy
+
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from app.ml import dataset
+from app.ml.model_loader import update_model_config
+from app.ml.model_manager import ModelManager
+from app.services.ml_service import MLService, tensor_pool
+
+REPORT_PATH = Path(__file__).parent / "cache" / "evaluation.json"
+CHUNK_SIZE = 256
+CALIBRATION_BINS = 10
+ROC_POINTS = 101
+
+
+def stream_batches(items: List[Tuple[str, int]],
+                   workers: int,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Tranches (images (N, H, W, 3), labels (N,)) décodées en parallèle, dans l'ordre
+
+    Au plus `2 * workers` tranches sont décodées d'avance : la mémoire reste
+    constante quelle que soit la taille du jeu de données.
+    """
+    ml_service = MLService()
+
+    def decode(chunk):
+        batch, errors = ml_service.preprocess_batch([path for path, _ in chunk])
+        labels = np.array([label for index, (_, label) in enumerate(chunk) if index not in errors])
+        return batch, labels
+
+    chunks = (items[start:start + chunk_size] for start in range(0, len(items), chunk_size))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(decode, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def binary_metrics(probas: np.ndarray, labels: np.ndarray, threshold: float = 0.5) -> Dict:
+    """Matrice de confusion (positif = parasitée) et métriques associées"""
+    predicted = probas > threshold
+    positive = labels == 1
+    tp = int(np.sum(predicted & positive))
+    fp = int(np.sum(predicted & ~positive))
+    fn = int(np.sum(~predicted & positive))
+    tn = int(np.sum(~predicted & ~positive))
+
+    def ratio(a, b):
+        return round(a / b, 4) if b else None
+
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, tp + fn)
+    return {
+        'confusion_matrix': {'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn},
+        'accuracy': ratio(tp + tn, len(labels)),
+        'sensitivity': recall,
+        'specificity': ratio(tn, tn + fp),
+        'precision': precision,
+        'f1': round(2 * precision * recall / (precision + recall), 4) if precision and recall else None,
+    }
+
+
+def roc(probas: np.ndarray, labels: np.ndarray, points: int = ROC_POINTS) -> Dict:
+    """
+    AUC exacte (statistique de Mann-Whitney, ex aequo comptés pour moitié) et
+    courbe ROC échantillonnée sur `points` seuils
+    """
+    n_pos = int(np.sum(labels == 1))
+    n_neg = len(labels) - n_pos
+    if not n_pos or not n_neg:
+        return {'auc': None, 'curve': []}
+
+    order = np.argsort(probas, kind="mergesort")
+    sorted_probas = probas[order]
+    ranks = np.empty(len(probas), dtype=np.float64)
+    ranks[order] = np.arange(1, len(probas) + 1)
+    # Rang moyen pour les probabilités égales
+    unique, inverse, counts = np.unique(sorted_probas, return_inverse=True, return_counts=True)
+    if len(unique) < len(probas):
+        first_rank = np.cumsum(counts) - counts + 1
+        ranks[order] = (first_rank + (counts - 1) / 2)[inverse]
+    auc = (ranks[labels == 1].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+    curve = []
+    for threshold in np.linspace(0, 1, points):
+        predicted = probas >= threshold
+        curve.append({
+            'threshold': round(float(threshold), 3),
+            'tpr': round(float(np.sum(predicted & (labels == 1)) / n_pos), 4),
+            'fpr': round(float(np.sum(predicted & (labels == 0)) / n_neg), 4),
+        })
+    return {'auc': round(float(auc), 4), 'curve': curve}
+
+
+def calibration(probas: np.ndarray, labels: np.ndarray, bins: int = CALIBRATION_BINS) -> Dict:
+    """Diagramme de fiabilité, Expected Calibration Error et score de Brier"""
+    edges = np.linspace(0, 1, bins + 1)
+    indices = np.clip(np.digitize(probas, edges[1:-1]), 0, bins - 1)
+
+    reliability = []
+    ece = 0.0
+    for b in range(bins):
+        mask = indices == b
+        count = int(mask.sum())
+        if not count:
+            continue
+        mean_proba = float(probas[mask].mean())
+        positive_rate = float(labels[mask].mean())
+        ece += count / len(probas) * abs(mean_proba - positive_rate)
+        reliability.append({
+            'bin': [round(float(edges[b]), 2), round(float(edges[b + 1]), 2)],
+            'count': count,
+            'mean_probability': round(mean_proba, 4),
+            'positive_rate': round(positive_rate, 4),
+        })
+
+    return {
+        'ece': round(ece, 4),
+        'brier': round(float(np.mean((probas - labels) ** 2)), 4),
+        'reliability': reliability,
+    }
+
+
+def evaluate(probas: np.ndarray, labels: np.ndarray) -> Dict:
+    return {
+        **binary_metrics(probas, labels),
+        'roc': roc(probas, labels),
+        'calibration': calibration(probas, labels),
+    }
+
+
+def ensemble_probas(probas: Dict[str, np.ndarray], weights: Dict[str, float]) -> np.ndarray:
+    """Moyenne pondérée normalisée, comme `_predict_all_models`"""
+    total = sum(weights.values())
+    return sum(probas[m] * (w / total) for m, w in weights.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation des modèles sur cell_images/ (streaming)")
+    parser.add_argument("--model-id", action="append", help="Modèle(s) à évaluer (défaut : tous)")
+    parser.add_argument("--split", choices=["all", "holdout", "calibration"], default="all")
+    parser.add_argument("--samples", type=int, default=0, help="Images évaluées (0 = toutes)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads de décodage")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--output", default=str(REPORT_PATH))
+    parser.add_argument("--write-accuracy", action="store_true",
+                        help="Écrire les accuracies mesurées (poids de l'ensemble) dans model_config.yaml")
+    args = parser.parse_args()
+
+    items = dataset.list_images()
+    if args.split != "all":
+        calibration_items, holdout_items = dataset.split(items)
+        items = holdout_items if args.split == "holdout" else calibration_items
+    items = dataset.sample(items, args.samples)
+
+    manager = ModelManager()
+    model_ids = [m for m in manager.models if not args.model_id or m in args.model_id]
+    for model_id in model_ids:
+        manager.load_model(model_id)
+
+    print(f"📊 {len(items)} images ({args.split}), {len(model_ids)} modèle(s), "
+          f"{args.workers} threads de décodage, tranches de {args.chunk_size}")
+
+    # Un forward pass par tranche et par modèle, au plus grand bucket pré-tracé
+    forward_size = max(manager.config.get('inference', {}).get('batch_buckets', [args.chunk_size]))
+    probas = {model_id: [] for model_id in model_ids}
+    labels = []
+    done = 0
+    start = time.perf_counter()
+    for batch, batch_labels in stream_batches(items, args.workers, args.chunk_size):
+        labels.append(batch_labels)
+        for model_id in model_ids:
+            probas[model_id].append(
+                manager.forward_chunked(model_id, batch, forward_size).astype(np.float32)
+            )
+        tensor_pool.release(batch)
+        done += len(batch_labels)
+        print(f"\r   {done}/{len(items)} images ({done / (time.perf_counter() - start):.0f} img/s)",
+              end="", flush=True)
+    print()
+
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=int)
+    probas = {m: np.concatenate(p) if p else np.empty(0, dtype=np.float32) for m, p in probas.items()}
+
+    report = {
+        'split': args.split,
+        'images': int(len(labels)),
+        'skipped': len(items) - int(len(labels)),
+        'elapsed_s': round(time.perf_counter() - start, 1),
+        'models': {model_id: evaluate(probas[model_id], labels) for model_id in model_ids},
+    }
+
+    # Mêmes votants que `_predict_all_models` : une variante compterait deux fois son réseau
+    voters = [m for m in manager.ensemble_model_ids() if m in model_ids]
+    if len(voters) > 1:
+        weights = {m: manager.models[m]['config']['accuracy'] for m in voters}
+        measured = {m: report['models'][m]['accuracy'] for m in voters}
+        report['ensemble'] = {
+            'config_weights': {**evaluate(ensemble_probas(probas, weights), labels), 'weights': weights},
+            'measured_weights': {**evaluate(ensemble_probas(probas, measured), labels), 'weights': measured},
+        }
+
+    print(f"\n{'modèle':>22} {'accuracy':>9} {'sensib.':>8} {'spécif.':>8} {'AUC':>7} {'ECE':>7} {'Brier':>7}")
+    rows = [(m, report['models'][m]) for m in model_ids]
+    rows += [(f"ensemble ({name.split('_')[0]})", r) for name, r in report.get('ensemble', {}).items()]
+    for name, r in rows:
+        values = [r['accuracy'], r['sensitivity'], r['specificity'], r['roc']['auc'],
+                  r['calibration']['ece'], r['calibration']['brier']]
+        cells = ["-" if v is None else f"{v:.4f}" for v in values]
+        print(f"{name:>22} {cells[0]:>9} {cells[1]:>8} {cells[2]:>8} {cells[3]:>7} {cells[4]:>7} {cells[5]:>7}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Rapport écrit dans {output}")
+
+    if args.write_accuracy:
+        update_model_config(
+            {m: {'accuracy': report['models'][m]['accuracy']} for m in model_ids}, manager.config_path
+        )
+        print(f"✅ Accuracies (poids de l'ensemble) mises à jour dans {manager.config_path}")
+
+    manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# ========================================
+# FETCH MODELS - Téléchargement des artefacts en parallèle
+# ========================================
+#
+# Télécharge (ou copie depuis un miroir) tous les artefacts de
+# model_config.yaml en parallèle, reprend les fichiers partiels et vérifie
+# leur SHA-256. Pour les sites sans réseau et la CI : remplir un dossier
+# miroir une fois, puis démarrer l'API avec MODEL_MIRROR=<dossier>.
+#
+# Usage (depuis backend/):
+#   python -m app.ml.fetch_models
+#   python -m app.ml.fetch_models --mirror /srv/malaria-models
+#   python -m app.ml.fetch_models --write-checksums   # renseigne `sha256` dans la config
+
+import argparse
+import sys
+
+import yaml
+
+from app.ml.model_loader import fetch_models, artifact_hash, update_model_config, CONFIG_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Téléchargement parallèle et vérifié des artefacts de modèles")
+    parser.add_argument("--model-id", action="append", help="Modèle(s) à récupérer (défaut : tous)")
+    parser.add_argument("--mirror", default=None, help="Dossier local ou URL http(s) remplaçant les remotes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--write-checksums", action="store_true",
+                        help="Écrire le SHA-256 des artefacts récupérés dans la configuration")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    models = [m for m in config["models"] if not args.model_id or m["id"] in args.model_id]
+    errors = fetch_models(models, mirror=args.mirror, max_workers=args.workers)
+
+    for model_config in models:
+        if model_config["id"] in errors:
+            print(f"❌ {model_config['id']}: {errors[model_config['id']]}")
+        else:
+            print(f"✅ {model_config['id']}: {model_config['local_path']}")
+
+    if args.write_checksums:
+        checksums = {
+            m["id"]: {"sha256": artifact_hash(m["local_path"])} for m in models if m["id"] not in errors
+        }
+        update_model_config(checksums, args.config)
+        print(f"📝 SHA-256 de {len(checksums)} artefact(s) écrits dans {args.config}")
+
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+# ========================================
+# INFERENCE EXECUTOR - Inférence hors de l'event loop
+# ========================================
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité d'une version d'artefact obtenue du côté inférence (modes distants)
+ARTIFACT_VERSION_TTL_SECONDS = 10
+
+
+class InferenceQueueFull(Exception):
+    """Levée quand la file d'inférence est pleine (backpressure)"""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Inference queue is full, retry in {retry_after}s")
+
+
+def _worker_options(options: dict, index: int) -> dict:
+    """Options du ModelManager du worker `index` (tranche de CPU en "per-worker")"""
+    if options.get('cpu_affinity') != "per-worker":
+        return options
+    from app.ml.cpu_topology import available_cpus, format_cpu_list, split_cpus
+
+    # Une tranche contiguë des CPU disponibles par worker, stable aux redémarrages
+    cpus = split_cpus(available_cpus(), options['inference_processes'], index)
+    return {**options, 'cpu_affinity': format_cpu_list(cpus)}
+
+
+def _worker_main(conn, config_path: str, options: dict, index: int):
+    """
+    Boucle d'un processus worker : chaque worker possède son ModelManager
+
+    Message : (cible, args, kwargs), où la cible est le nom d'une méthode du
+    ModelManager ou une fonction picklable. Réponse : ("ok", résultat) ou
+    ("error", exception), suivi de la génération de rechargement du worker.
+    """
+    from app.ml.model_manager import ModelManager
+
+    manager = ModelManager(config_path, **_worker_options(options, index))
+    # Ce thread sert les appels : il prend l'affinité du worker
+    manager.pin_thread()
+    try:
+        while True:
+            try:
+                target, args, kwargs = conn.recv()
+            except EOFError:
+                return
+
+            try:
+                if isinstance(target, str):
+                    if target.startswith("_"):
+                        raise AttributeError(f"Méthode non exposée : {target}")
+                    target = getattr(manager, target)
+                response = ("ok", target(*args, **kwargs))
+            except Exception as e:
+                response = ("error", e)
+
+            # La génération suit chaque réponse : l'API voit aussi les
+            # rechargements déclenchés par la surveillance des fichiers du worker
+            try:
+                conn.send(response + (manager.reload_generation,))
+            except Exception as e:
+                conn.send(("error", RuntimeError(f"Réponse non sérialisable : {e!r}"), manager.reload_generation))
+    finally:
+        manager.shutdown()
+        conn.close()
+
+
+class _Worker:
+    """
+    Processus worker et son thread de dispatch côté API
+
+    Chaque worker a sa propre file : une commande diffusée à tous les workers
+    est exécutée exactement une fois par chacun. Un worker mort pendant un appel
+    fait échouer cet appel seul ; il est relancé (même index, donc même tranche
+    de CPU) au suivant, puis reçoit les commandes persistantes du pool.
+
+    Un changement de la génération de rechargement renvoyée par le worker, ou
+    sa relance, est signalé au pool (`reloaded`).
+    """
+
+    def __init__(self, pool: "_WorkerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.jobs: "queue.Queue" = queue.Queue()
+        self.pending = 0  # Tâches en file ou en cours (sous pool._lock)
+        self._process = None
+        self._conn = None
+        self._generation = None  # Dernière génération de rechargement reçue
+        self._thread = threading.Thread(target=self._dispatch, name=f"inference-worker-{index}", daemon=True)
+        self._thread.start()
+
+    def _start(self):
+        if self._generation is not None:
+            # Worker relancé : ses modèles sont rechargés depuis les fichiers
+            self._generation = None
+            self.pool.reloaded()
+        context = self.pool.context
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.pool.config_path, self.pool.options, self.index),
+            name=f"inference-worker-{self.index}",
+            daemon=True
+        )
+        self._process.start()
+        # Seul l'enfant garde cette extrémité : sa mort ferme le pipe (EOFError)
+        child_conn.close()
+
+        for target, args, kwargs in self.pool.sticky_commands():
+            try:
+                self._send(target, args, kwargs)
+            except Exception as e:
+                logger.warning(f"⚠️ Worker {self.index}: {target} non rejoué au démarrage: {e}")
+
+    def _stop(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+
+    def _send(self, target, args: tuple, kwargs: dict):
+        try:
+            self._conn.send((target, args, kwargs))
+            status, result, generation = self._conn.recv()
+        except (EOFError, OSError):
+            exitcode = self._process.exitcode if self._process else None
+            self._stop()
+            raise RuntimeError(f"Worker d'inférence {self.index} arrêté (code {exitcode})")
+        if self._generation is not None and generation != self._generation:
+            self.pool.reloaded()
+        self._generation = generation
+        if status == "error":
+            raise result
+        return result
+
+    def _dispatch(self):
+        try:
+            self._start()
+        except Exception as e:
+            logger.error(f"❌ Worker d'inférence {self.index} non démarré: {e}")
+            self._stop()
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            future, target, args, kwargs = job
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if self._process is None or not self._process.is_alive():
+                        self._stop()
+                        logger.warning(f"⚠️ Redémarrage du worker d'inférence {self.index}")
+                        self._start()
+                    future.set_result(self._send(target, args, kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            finally:
+                self.pool.done(self)
+
+        self._stop()
+
+    def submit(self, target, args: tuple, kwargs: dict) -> Future:
+        future = Future()
+        self.jobs.put((future, target, args, kwargs))
+        return future
+
+    def close(self, cancel_futures: bool):
+        if cancel_futures:
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+                    self.pool.done(self)
+        self.jobs.put(None)
+
+    def join(self):
+        self._thread.join()
+
+
+class _WorkerPool:
+    """
+    Workers d'inférence du mode "process" (contexte spawn)
+
+    Les tâches vont au worker le moins chargé ; `broadcast` en place une dans
+    la file de chaque worker. Les commandes persistantes (défaut, préchargement)
+    sont rejouées sur tout worker relancé, la dernière de chaque méthode primant.
+    `reloads` compte les rechargements observés sur l'ensemble des workers.
+    """
+
+    def __init__(self, config_path: str, options: dict, size: int):
+        # spawn : un fork après l'initialisation de TensorFlow n'est pas sûr
+        self.context = multiprocessing.get_context("spawn")
+        self.config_path = config_path
+        self.options = options
+        self._lock = threading.Lock()
+        self._sticky: Dict[str, tuple] = {}
+        self.reloads = 0
+        self.workers = [_Worker(self, index) for index in range(size)]
+
+    def sticky_commands(self) -> List[tuple]:
+        with self._lock:
+            return list(self._sticky.values())
+
+    def reloaded(self):
+        with self._lock:
+            self.reloads += 1
+
+    def done(self, worker: _Worker):
+        with self._lock:
+            worker.pending -= 1
+
+    def _submit_to(self, worker: _Worker, target, args: tuple, kwargs: dict) -> Future:
+        with self._lock:
+            worker.pending += 1
+        return worker.submit(target, args, kwargs)
+
+    def submit(self, target, *args, **kwargs) -> Future:
+        with self._lock:
+            worker = min(self.workers, key=lambda w: w.pending)
+            worker.pending += 1
+        return worker.submit(target, args, kwargs)
+
+    def broadcast(self, method: str, args: tuple, kwargs: dict, sticky: bool = False) -> List[Future]:
+        if sticky:
+            with self._lock:
+                # Réinsérée en fin : rejouée dans l'ordre des dernières commandes
+                self._sticky.pop(method, None)
+                self._sticky[method] = (method, args, kwargs)
+        return [self._submit_to(worker, method, args, kwargs) for worker in self.workers]
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        for worker in self.workers:
+            worker.close(cancel_futures)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+
+class InferenceExecutor:
+    """
+    Exécuteur dédié à l'inférence avec file bornée
+
+    Les handlers `async` y délèguent le prétraitement et les forward passes pour
+    ne pas bloquer l'event loop. Au-delà de `max_workers + max_queue_size`
+    tâches en cours, `InferenceQueueFull` est levée au lieu de laisser la
+    latence croître sans limite.
+    """
+
+    def __init__(self,
+                 model_manager,
+                 kind: str = "thread",
+                 max_workers: int = 4,
+                 max_queue_size: int = 32,
+                 retry_after: int = 1,
+                 server_client=None):
+        if kind not in ("thread", "process", "server"):
+            raise ValueError(f"Type d'exécuteur inconnu : {kind}")
+        if kind == "server" and server_client is None:
+            raise ValueError("Le mode server nécessite un InferenceClient")
+
+        self.model_manager = model_manager
+        self.kind = kind
+        self.server_client = server_client
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue_size
+        self.retry_after = retry_after
+
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._versions = {}  # {model_id: (version, obtenue à, rechargements vus)}, modes distants
+        self._pool = self._create_pool()
+
+        logger.info(
+            f"⚙️ Exécuteur d'inférence: {kind} x{max_workers}, file max {max_queue_size}"
+        )
+
+    def _create_pool(self):
+        if self.kind == "process":
+            return _WorkerPool(self.model_manager.config_path, {
+                'memory_budget_mb': self.model_manager.memory_budget_mb,
+                'default_model_id': self.model_manager.current_model_id,
+                'reload_interval': self.model_manager.reload_interval,
+                'mirror': self.model_manager.mirror,
+                'intra_op_threads': self.model_manager.intra_op_threads,
+                'inter_op_threads': self.model_manager.inter_op_threads,
+                'cpu_affinity': self.model_manager.cpu_affinity,
+                # Les workers se partagent les CPU (threads automatiques, "per-worker")
+                'inference_processes': self.max_workers
+            }, self.max_workers)
+        # Affinité appliquée aux seuls threads d'inférence, pas à la boucle asyncio
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="inference",
+            initializer=self.model_manager.pin_thread if self.kind == "thread" else None
+        )
+
+    @property
+    def remote(self) -> bool:
+        """Les modèles vivent-ils hors du processus de l'API (workers ou serveur) ?"""
+        return self.kind != "thread"
+
+    @property
+    def pending(self) -> int:
+        """Nombre de tâches en cours ou en attente"""
+        return self._pending
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise InferenceQueueFull(self.retry_after)
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Soumet `fn(*args, **kwargs)` au pool sans attendre
+
+        En mode "process", `fn` et ses arguments doivent être picklables ; une
+        chaîne désigne une méthode du ModelManager du worker. Le Future se
+        termine quand la tâche est réellement finie, même si l'appelant a
+        cessé de l'attendre.
+
+        Raises:
+            InferenceQueueFull: Si la file est pleine
+        """
+        self._acquire()
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        # Le slot est libéré quand la tâche se termine réellement,
+        # même si la requête HTTP a été annulée entre-temps
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Exécute `fn(*args, **kwargs)` dans le pool (voir `submit`)
+
+        Raises:
+            InferenceQueueFull: Si la file est pleine
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def submit_model(self, method: str, *args, **kwargs) -> Future:
+        """Soumet `ModelManager.<method>` au pool sans attendre (ModelManager d'un worker en mode process)"""
+        if self.kind == "process":
+            return self.submit(method, *args, **kwargs)
+        if self.kind == "server":
+            return self.submit(self.server_client.call, method, *args, **kwargs)
+        return self.submit(getattr(self.model_manager, method), *args, **kwargs)
+
+    async def run_model(self, method: str, *args, **kwargs):
+        """Appelle `ModelManager.<method>` dans le pool (ModelManager d'un worker en mode process)"""
+        return await asyncio.wrap_future(self.submit_model(method, *args, **kwargs))
+
+    async def artifact_version(self, model_id: str) -> str:
+        """
+        Version des artefacts derrière `model_id` (clés du cache de prédictions)
+
+        Calculée là où les modèles vivent : en modes distants, le processus de
+        l'API ne télécharge ni ne hache aucun artefact. La réponse y est gardée
+        ARTIFACT_VERSION_TTL_SECONDS, et oubliée dès qu'un worker (ou le
+        serveur) signale un rechargement, y compris par sa propre surveillance
+        des fichiers.
+        """
+        if not self.remote:
+            return await asyncio.to_thread(self.model_manager.artifact_version, model_id)
+
+        cached = self._versions.get(model_id)
+        if (cached is not None
+                and time.monotonic() - cached[1] < ARTIFACT_VERSION_TTL_SECONDS
+                and cached[2] == self._reloads()):
+            return cached[0]
+        # Relevé avant l'appel : un rechargement vu entre-temps invalide la réponse
+        reloads = self._reloads()
+        version = await self.run_model("artifact_version", model_id)
+        self._versions[model_id] = (version, time.monotonic(), reloads)
+        return version
+
+    def _reloads(self) -> int:
+        """Rechargements observés côté inférence (modes distants)"""
+        if self.kind == "server":
+            return self.server_client.reloads
+        return self._pool.reloads
+
+    async def broadcast_model(self, method: str, *args, sticky: bool = False, **kwargs) -> list:
+        """
+        Appelle `ModelManager.<method>` sur chaque ModelManager qui sert l'inférence
+
+        En mode "thread", le ModelManager partagé (hors du pool d'inférence, pour
+        ne pas occuper ses slots) ; en mode "process", celui de chaque worker,
+        exactement une fois ; en mode "server", celui du serveur d'inférence.
+        Les exceptions sont retournées dans la liste des résultats.
+
+        `sticky` (mode process) : la commande est rejouée sur les workers
+        relancés après un crash, pour qu'ils ne reviennent pas à l'état initial.
+        """
+        try:
+            if self.kind == "process":
+                futures = self._pool.broadcast(method, args, kwargs, sticky=sticky)
+                return await asyncio.gather(*[asyncio.wrap_future(f) for f in futures], return_exceptions=True)
+            if self.kind == "server":
+                call = functools.partial(self.server_client.call, method)
+            else:
+                call = getattr(self.model_manager, method)
+            try:
+                return [await asyncio.to_thread(call, *args, **kwargs)]
+            except Exception as e:
+                return [e]
+        finally:
+            if method == "reload":
+                self._versions.clear()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self.server_client is not None:
+            self.server_client.close()
@@ -0,0 +1,269 @@
+# ========================================
+# INFERENCE SERVER - Processus d'inférence partagé
+# ========================================
+#
+# Un seul processus possède TensorFlow et les modèles ; les workers de l'API
+# (uvicorn/gunicorn) lui envoient leurs tenseurs prétraités par une socket
+# Unix. Les tenseurs transitent par un segment de mémoire partagée propre à
+# chaque connexion : seul un petit en-tête est sérialisé. Toutes les requêtes
+# passent par les micro-batchers du même ModelManager, donc les requêtes de
+# tous les workers sont regroupées ensemble.
+#
+# Usage (depuis backend/, avant de démarrer l'API avec INFERENCE_EXECUTOR=server):
+#   python -m app.ml.inference_server
+
+import argparse
+import hashlib
+import logging
+import os
+import threading
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Taille minimale d'un segment partagé (réalloué à la hausse si besoin)
+MIN_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+def derive_authkey(secret: str) -> bytes:
+    """Clé d'authentification de la socket, dérivée du secret de l'application"""
+    return hashlib.sha256(f"inference-server:{secret}".encode()).digest()
+
+
+def _attach(name: str) -> SharedMemory:
+    """Ouvre un segment créé par le client sans que ce processus le détruise à sa sortie"""
+    shm = SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class InferenceServer:
+    """
+    Sert les méthodes d'un ModelManager sur une socket Unix
+
+    Message client : (méthode, args, kwargs, nom du segment, tableaux) où
+    `tableaux` décrit les arguments numpy copiés dans le segment :
+    [(position, shape, dtype, offset)]. Réponse : ("ok", résultat) ou
+    ("error", exception), suivi de la génération de rechargement du ModelManager.
+    """
+
+    def __init__(self, model_manager, socket_path: str, authkey: bytes):
+        self.model_manager = model_manager
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"🛰️ Serveur d'inférence à l'écoute sur {self.socket_path}")
+
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    # Listener fermé par close(), échec d'authentification ou
+                    # client parti pendant la poignée de main
+                    if self._listener is None:
+                        return
+                    logger.warning("⚠️ Connexion refusée au serveur d'inférence")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="inference-conn", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+    def _handle(self, conn):
+        """Une connexion = un thread côté client ; les appels y sont séquentiels"""
+        shm = None
+        try:
+            while True:
+                try:
+                    method, args, kwargs, shm_name, arrays = conn.recv()
+                except EOFError:
+                    return
+
+                try:
+                    if arrays:
+                        if shm is None or shm.name != shm_name:
+                            if shm is not None:
+                                shm.close()
+                            shm = _attach(shm_name)
+                        # Copie hors du segment : un micro-batcher peut garder une
+                        # référence au lot après l'appel, et le segment est réutilisé
+                        args = list(args)
+                        for position, shape, dtype, offset in arrays:
+                            args[position] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+
+                    if method.startswith("_"):
+                        raise AttributeError(f"Méthode non exposée : {method}")
+                    result = getattr(self.model_manager, method)(*args, **kwargs)
+                    response = ("ok", result)
+                except Exception as e:
+                    response = ("error", e)
+
+                generation = self.model_manager.reload_generation
+                try:
+                    conn.send(response + (generation,))
+                except Exception as e:
+                    conn.send(("error", RuntimeError(f"Réponse non sérialisable : {e!r}"), generation))
+        finally:
+            if shm is not None:
+                shm.close()
+            conn.close()
+
+
+class InferenceClient:
+    """
+    Appelle le ModelManager du serveur d'inférence
+
+    Une connexion et un segment de mémoire partagée par thread appelant : les
+    threads de l'exécuteur d'inférence n'ont jamais à se les partager.
+    `reloads` compte les rechargements observés côté serveur (génération
+    changée ou serveur redémarré).
+    """
+
+    def __init__(self, socket_path: str, authkey: bytes):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self._local = threading.local()
+        self._segments = []
+        self._lock = threading.Lock()
+        self._generation = None  # Dernière génération de rechargement reçue
+        self.reloads = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _buffer(self, nbytes: int) -> SharedMemory:
+        shm = getattr(self._local, "shm", None)
+        if shm is None or shm.size < nbytes:
+            new = SharedMemory(create=True, size=max(nbytes, MIN_BUFFER_BYTES, 2 * (shm.size if shm else 0)))
+            with self._lock:
+                self._segments.append(new)
+                if shm is not None:
+                    self._segments.remove(shm)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._local.shm = shm = new
+        return shm
+
+    def _pack(self, args: tuple):
+        """Copie les arguments numpy dans le segment partagé du thread"""
+        positions = [i for i, arg in enumerate(args) if isinstance(arg, np.ndarray)]
+        if not positions:
+            return args, None, []
+
+        arrays = [np.ascontiguousarray(args[i]) for i in positions]
+        shm = self._buffer(sum(a.nbytes for a in arrays))
+
+        args = list(args)
+        descriptors = []
+        offset = 0
+        for position, array in zip(positions, arrays):
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)[...] = array
+            descriptors.append((position, array.shape, array.dtype.str, offset))
+            args[position] = None
+            offset += array.nbytes
+
+        return tuple(args), shm.name, descriptors
+
+    def call(self, method: str, *args, **kwargs):
+        """Exécute `ModelManager.<method>(*args, **kwargs)` dans le serveur"""
+        args, shm_name, arrays = self._pack(args)
+        message = (method, args, kwargs, shm_name, arrays)
+
+        # Une reconnexion si le serveur a redémarré depuis le dernier appel du thread
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(message)
+                status, result, generation = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt:
+                    raise ConnectionError(f"Serveur d'inférence injoignable sur {self.socket_path}")
+
+        with self._lock:
+            if self._generation is not None and (generation != self._generation or attempt):
+                self.reloads += 1
+            self._generation = generation
+
+        if status == "error":
+            raise result
+        return result
+
+    def close(self):
+        """Libère les segments partagés créés par ce client"""
+        with self._lock:
+            segments, self._segments = self._segments, []
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+
+def main():
+    from app.core.config import settings
+    from app.ml.model_manager import ModelManager
+
+    parser = argparse.ArgumentParser(description="Serveur d'inférence partagé par les workers de l'API")
+    parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    model_manager = ModelManager(
+        memory_budget_mb=settings.MODEL_MEMORY_BUDGET_MB,
+        default_model_id=settings.DEFAULT_MODEL_ID,
+        reload_interval=settings.MODEL_RELOAD_INTERVAL_SECONDS,
+        mirror=settings.MODEL_MIRROR,
+        intra_op_threads=settings.INFERENCE_INTRA_OP_THREADS,
+        inter_op_threads=settings.INFERENCE_INTER_OP_THREADS,
+        cpu_affinity=settings.INFERENCE_CPU_AFFINITY
+    )
+    server = InferenceServer(model_manager, args.socket, derive_authkey(settings.SECRET_KEY))
+    # Processus dédié à l'inférence : les threads de connexion héritent de l'affinité
+    model_manager.pin_thread()
+
+    # Préchargement en arrière-plan : le serveur accepte les connexions tout de suite
+    threading.Thread(
+        target=model_manager.preload,
+        args=(model_manager.models_for_policy(settings.MODEL_LOAD_POLICY), settings.MODEL_PRELOAD_WORKERS),
+        name="preload",
+        daemon=True
+    ).start()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        model_manager.shutdown()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
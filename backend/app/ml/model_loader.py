@@ -1,14 +1,36 @@
 import os
+import hashlib
+import logging
+import re
+import shutil
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
 import yaml
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import tensorflow as tf
 
-from huggingface_hub import hf_hub_download
+from app.ml.runtimes import get_backend, CompiledModel, PrecompiledRunner, DEFAULT_BATCH_BUCKETS
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).parent
 CONFIG_PATH = BASE_DIR / "model_config.yaml"
 CACHE_DIR = BASE_DIR / "cache" / "downloaded"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
+COMPILED_DIR = BASE_DIR / "cache" / "compiled"
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60  # secondes sans données avant abandon
+
+# Un téléchargement à la fois par artefact (préchargement, requêtes, rechargement)
+_path_locks = defaultdict(threading.Lock)
+# Artefacts déjà vérifiés : {chemin: (sha256, (fichier, taille, mtime)...)}
+_verified = {}
+# Modèles sans `sha256` déjà signalés (un avertissement par modèle)
+_unchecked = set()
 
 
 def load_config():
@@ -16,41 +38,344 @@ def load_config():
         return yaml.safe_load(f)
 
 
-def _download_from_huggingface(url, local_path):
-    parts = url.split("/")
-    repo_id = f"{parts[3]}/{parts[4]}"
-    filename = parts[-1]
+def artifact_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 d'un artefact (fichier, ou ensemble des fichiers d'un dossier SavedModel)"""
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
 
-    return hf_hub_download(
-        repo_id=repo_id,
-        filename=filename,
-        local_dir=str(Path(local_path).parent)
-    )
+    digest = hashlib.sha256()
+    for file in files:
+        if path.is_dir():
+            digest.update(str(file.relative_to(path)).encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
 
+    return digest.hexdigest()
 
-def download_model_if_needed(model_info):
-    local_path = model_info["local_path"]
 
-    if os.path.exists(local_path):
-        return local_path
+def _source(model_info, mirror=None):
+    """
+    Emplacement d'où récupérer l'artefact : URL http(s) ou chemin local
 
-    print(f"Téléchargement du modèle : {model_info['name']}")
+    Un miroir (dossier local, `file://` ou serveur de fichiers http) remplace
+    le remote de toutes les entrées ; il contient les artefacts à plat, sous
+    le nom de fichier de `local_path`.
+    """
+    if mirror:
+        filename = Path(model_info["local_path"]).name
+        if mirror.startswith(("http://", "https://")):
+            return f"{mirror.rstrip('/')}/{filename}"
+        return Path(mirror.removeprefix("file://")) / filename
 
     if model_info["remote"] == "huggingface":
-        _download_from_huggingface(model_info["url"], local_path)
-    else:
-        raise ValueError(f"Remote inconnu : {model_info['remote']}")
+        # URL "blob" (page web) -> URL "resolve" (fichier brut, accepte les Range)
+        return model_info["url"].replace("/blob/", "/resolve/", 1)
+    if model_info["remote"] == "http":
+        return model_info["url"]
+    if model_info["remote"] == "local":
+        # Artefact produit localement (conversion, quantification)
+        raise FileNotFoundError(f"Artefact local introuvable : {model_info['local_path']}")
+    raise ValueError(f"Remote inconnu : {model_info['remote']}")
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Suit les redirections sans transmettre `Authorization` à un autre hôte
+
+    Hugging Face redirige les fichiers LFS vers un CDN / stockage objet : le
+    jeton ne doit pas quitter huggingface.co. Le Range est conservé.
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        new = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if new is not None and _origin(newurl) != _origin(req.full_url):
+            new.remove_header("Authorization")
+        return new
+
+
+def _origin(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme, parts.hostname, parts.port
+
+
+_http_opener = urllib.request.build_opener(_RedirectHandler)
+
+
+def _is_huggingface(url):
+    host = urllib.parse.urlsplit(url).hostname or ""
+    return host == "huggingface.co" or host.endswith(".huggingface.co")
+
+
+def _fetch_http(url, part_path):
+    """Télécharge `url` dans `part_path` en reprenant à la fin du fichier partiel"""
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    if os.getenv("HF_TOKEN") and _is_huggingface(url):
+        request.add_header("Authorization", f"Bearer {os.getenv('HF_TOKEN')}")
+
+    try:
+        response = _http_opener.open(request, timeout=DOWNLOAD_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            # Fichier partiel déjà complet : la vérification du SHA-256 tranchera
+            return
+        raise
+
+    with response:
+        # 200 au lieu de 206 : le serveur ignore les Range, on repart de zéro
+        mode = "ab" if response.status == 206 else "wb"
+        with open(part_path, mode) as f:
+            shutil.copyfileobj(response, f, DOWNLOAD_CHUNK_SIZE)
+
+
+def _fetch_file(source, part_path):
+    """Copie un artefact d'un miroir local en reprenant à la fin du fichier partiel"""
+    if not source.exists():
+        raise FileNotFoundError(f"Artefact absent du miroir : {source}")
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    with open(source, "rb") as src, open(part_path, "ab") as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+
+
+def _verify(model_info, path):
+    """
+    Compare le SHA-256 de l'artefact à `sha256` (si renseigné dans model_config.yaml)
+
+    Sans `sha256`, l'artefact est accepté tel quel, avec un avertissement :
+    ni une corruption ni une reprise incohérente ne seraient détectées.
+    """
+    expected = model_info.get("sha256")
+    if not expected:
+        if model_info.get("id") not in _unchecked:
+            _unchecked.add(model_info.get("id"))
+            logger.warning(
+                f"⚠️ Pas de sha256 pour {model_info.get('id', path)} : artefact non vérifié "
+                f"(python -m app.ml.fetch_models --write-checksums)"
+            )
+        return True
+
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    stat = tuple((str(f), f.stat().st_size, f.stat().st_mtime_ns) for f in files)
+    if _verified.get(str(path)) == (expected, stat):
+        return True
+
+    if artifact_hash(path) != expected.lower():
+        return False
+    _verified[str(path)] = (expected, stat)
+    return True
+
+
+def _fetch(model_info, local_path, mirror=None):
+    source = _source(model_info, mirror)
+
+    part_path = local_path.with_name(local_path.name + ".part")
+
+    if isinstance(source, Path) and source.is_dir():
+        # SavedModel d'un miroir local : copie complète (pas de reprise), vérifiée
+        # sur le hash du dossier (`artifact_hash`) avant d'être mise en place
+        shutil.rmtree(part_path, ignore_errors=True)
+        shutil.copytree(source, part_path)
+        if _verify(model_info, part_path):
+            os.replace(part_path, local_path)
+            return
+        shutil.rmtree(part_path)
+        raise ValueError(f"SHA-256 invalide pour {local_path} (attendu {model_info['sha256']})")
+
+    for attempt in range(2):
+        resumed = part_path.exists() and part_path.stat().st_size > 0
+        if isinstance(source, Path):
+            _fetch_file(source, part_path)
+        else:
+            _fetch_http(source, part_path)
+
+        if _verify(model_info, part_path):
+            # Renommage atomique : local_path n'existe que complet et vérifié
+            os.replace(part_path, local_path)
+            return
+
+        part_path.unlink()
+        if not resumed or attempt:
+            break
+        logger.warning(f"⚠️ SHA-256 invalide après reprise de {local_path.name}, nouveau téléchargement complet")
+
+    raise ValueError(f"SHA-256 invalide pour {local_path} (attendu {model_info['sha256']})")
+
+
+def download_model_if_needed(model_info, mirror=None):
+    """
+    Retourne le chemin local de l'artefact, téléchargé et vérifié au besoin
+
+    Le téléchargement passe par `<local_path>.part`, repris s'il a été
+    interrompu, et n'est renommé qu'une fois le SHA-256 vérifié. Un artefact
+    présent mais corrompu est téléchargé à nouveau.
+    """
+    local_path = Path(model_info["local_path"])
+
+    with _path_locks[str(local_path)]:
+        if local_path.exists():
+            if _verify(model_info, local_path):
+                return str(local_path)
+            logger.warning(f"⚠️ SHA-256 invalide pour {local_path}, nouveau téléchargement")
+            if local_path.is_dir():
+                shutil.rmtree(local_path)
+            else:
+                local_path.unlink()
+
+        logger.info(f"Téléchargement du modèle : {model_info['name']}" + (f" (miroir {mirror})" if mirror else ""))
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        _fetch(model_info, local_path, mirror)
+
+    return str(local_path)
+
+
+def fetch_models(model_infos, mirror=None, max_workers=4):
+    """
+    Télécharge et vérifie des artefacts en parallèle
+
+    Returns:
+        {model_id: message d'erreur} pour les artefacts en échec
+    """
+    errors = {}
+    if not model_infos:
+        return errors
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as pool:
+        futures = {m["id"]: pool.submit(download_model_if_needed, m, mirror) for m in model_infos}
+
+    for model_id, future in futures.items():
+        if future.exception() is not None:
+            errors[model_id] = str(future.exception())
+    return errors
+
+
+def compiled_cache_path(model_info, local_path, input_shape, batch_buckets):
+    """
+    Dossier du modèle précompilé : cache/compiled/<id>/<hash artefact>-<runtime>-<spec>
+
+    Toute modification de l'artefact, de la version du runtime, de la forme
+    ou du type d'entrée ou des buckets donne une autre clé.
+    """
+    spec = hashlib.sha256(
+        f"{model_info['format']}|{tuple(input_shape)}|{sorted(set(batch_buckets))}|uint8".encode()
+    ).hexdigest()[:8]
+    key = f"{artifact_hash(local_path)[:16]}-{CompiledModel.runtime_version()}-{spec}"
+    return COMPILED_DIR / model_info["id"] / key
+
+
+def _export_compiled(runner, cache_path):
+    """Écrit le cache (dossier temporaire puis renommage) et retire les versions précédentes"""
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        runner.export(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Écrit entre-temps par un autre processus
+        if not cache_path.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    for stale in cache_path.parent.iterdir():
+        if stale != cache_path and not stale.name.startswith("."):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def load_model(model_info, batch_buckets=DEFAULT_BATCH_BUCKETS, mirror=None, compiled_cache=True):
+    """
+    Charge un modèle avec le runner de son `format` et le préchauffe
+
+    Pour les formats TensorFlow, la forme précompilée (fonctions déjà tracées)
+    est chargée depuis le cache si elle existe, et écrite sinon.
+    """
+    local_path = download_model_if_needed(model_info, mirror)
+    input_shape = tuple(model_info.get("input_shape", (64, 64, 3)))
+    batch_buckets = model_info.get("batch_buckets", batch_buckets)
+    backend = get_backend(model_info["format"])
+    threads = model_info.get("threading")
+
+    if not (compiled_cache and issubclass(backend, CompiledModel)):
+        runner = backend(local_path, input_shape, batch_buckets, threads=threads)
+        runner.warmup()
+        return runner
+
+    cache_path = compiled_cache_path(model_info, local_path, input_shape, batch_buckets)
+    runner = None
+    if cache_path.exists():
+        try:
+            runner = PrecompiledRunner(cache_path, input_shape, batch_buckets, threads=threads)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache précompilé illisible pour {model_info['id']}, reconstruction : {e}")
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    if runner is None:
+        runner = backend(local_path, input_shape, batch_buckets, threads=threads)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            _export_compiled(runner, cache_path)
+        except Exception as e:
+            # Le cache n'est qu'une accélération : le modèle reste servi
+            logger.warning(f"⚠️ Cache précompilé non écrit pour {model_info['id']} : {e}")
+
+    runner.warmup()
+    return runner
+
+
+def append_model_config(entry, config_path=CONFIG_PATH):
+    """
+    Ajoute une entrée à la liste `models` de model_config.yaml
+
+    Le texte est ajouté en fin de fichier (la liste `models` est la dernière
+    clé) pour conserver les commentaires existants.
+    """
+    with open(config_path, "r") as f:
+        content = f.read()
+
+    if any(m["id"] == entry["id"] for m in yaml.safe_load(content)["models"]):
+        raise ValueError(f"Modèle {entry['id']} déjà présent dans {config_path}")
+
+    block = yaml.safe_dump([entry], allow_unicode=True, sort_keys=False)
+    block = "\n".join(f"  {line}" if line else line for line in block.splitlines())
+
+    with open(config_path, "w") as f:
+        f.write(content.rstrip("\n") + "\n\n" + block + "\n")
 
-    return local_path
 
+def update_model_config(values, config_path=CONFIG_PATH):
+    """
+    Ajoute ou met à jour des clés scalaires d'entrées de model_config.yaml
 
-def load_model(model_info):
-    local_path = download_model_if_needed(model_info)
+    `values` : {model_id: {clé: valeur}}. Édition textuelle, bloc par bloc,
+    pour conserver les commentaires ; une clé absente est ajoutée après
+    `local_path`.
+    """
+    with open(config_path, "r") as f:
+        content = f.read()
 
-    if model_info["format"] == "keras":
-        return tf.keras.models.load_model(local_path)
+    for model_id, entries in values.items():
+        block = re.search(
+            rf'^(\s*)- id: "?{re.escape(model_id)}"?\s*$.*?(?=^\s*- id:|\Z)',
+            content, flags=re.MULTILINE | re.DOTALL
+        )
+        if block is None:
+            raise ValueError(f"Modèle {model_id} introuvable dans {config_path}")
 
-    if model_info["format"] == "saved_model":
-        return tf.saved_model.load(local_path)
+        text = block.group(0)
+        for key, value in entries.items():
+            rendered = f'"{value}"' if isinstance(value, str) else str(value)
+            pattern = rf"^(\s*{re.escape(key)}:\s*)[^#\n]*?(\s*(#.*)?)$"
+            if re.search(pattern, text, flags=re.MULTILINE):
+                text = re.sub(pattern, lambda m: f"{m.group(1)}{rendered}{m.group(2)}", text,
+                              count=1, flags=re.MULTILINE)
+            else:
+                text = re.sub(r"^(\s*)(local_path:.*)$",
+                              lambda m: f"{m.group(1)}{m.group(2)}\n{m.group(1)}{key}: {rendered}",
+                              text, count=1, flags=re.MULTILINE)
+        content = content[:block.start()] + text + content[block.end():]
 
-    raise ValueError(f"Format inconnu : {model_info['format']}")
+    with open(config_path, "w") as f:
+        f.write(content)
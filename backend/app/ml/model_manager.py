@@ -3,34 +3,333 @@
 # MODEL MANAGER - Gestion des Modèles ML
 # ========================================
 
+import gc
 import os
 import yaml
+import threading
+import time
 import numpy as np
-from typing import Dict, List, Optional
-from app.ml.model_loader import load_model as remote_load_model, download_model_if_needed
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+from app.ml.model_loader import (
+    load_model as remote_load_model,
+    download_model_if_needed,
+    artifact_hash,
+    DEFAULT_BATCH_BUCKETS
+)
+from app.ml.runtimes import configure_threads
+from app.ml import benchmark
+from app.ml.shadow import ShadowScorer, ShadowSkipped, DEFAULT_QUEUE_SIZE as DEFAULT_SHADOW_QUEUE_SIZE
+from app.ml.cpu_topology import (
+    parse_cpu_list, format_cpu_list, resolve_threads, set_affinity, pinned, describe as describe_cpus
+)
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Valeurs par défaut du micro-batching (surchargées par modèle dans model_config.yaml)
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Identifiant du mode cascade (utilisable comme model_id)
+CASCADE_MODEL_ID = "cascade"
+DEFAULT_UNCERTAINTY_BAND = (0.1, 0.9)
+
+
+def run_cascade(n: int,
+                stages: Sequence[str],
+                weights: Dict[str, float],
+                uncertainty_band: Tuple[float, float],
+                infer: Callable[[str, np.ndarray], np.ndarray]) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    Exécute une cascade de modèles sur n images
+
+    Chaque étage ne traite que les images dont la probabilité combinée (moyenne
+    pondérée des étages déjà exécutés) tombe dans `uncertainty_band`.
+
+    Args:
+        n: Nombre d'images
+        stages: IDs des modèles, du plus rapide au plus coûteux
+        weights: Poids de chaque modèle dans la moyenne
+        uncertainty_band: (bas, haut) - au-delà, la prédiction est considérée sûre
+        infer: infer(model_id, indices) -> probabilités des images `indices`
+
+    Returns:
+        Tuple (probabilités combinées (n,), étages exécutés par image)
+    """
+    low, high = uncertainty_band
+    weighted_sum = np.zeros(n)
+    weight_total = np.zeros(n)
+    stages_run = [[] for _ in range(n)]
+    pending = np.arange(n)
+
+    for stage, model_id in enumerate(stages):
+        try:
+            probas = np.asarray(infer(model_id, pending)).reshape(-1)
+        except Exception as e:
+            # Le premier étage est obligatoire, les suivants sont un raffinement
+            if stage == 0:
+                raise
+            logger.error(f"Erreur cascade {model_id}: {e}")
+            break
+
+        weighted_sum[pending] += weights[model_id] * probas
+        weight_total[pending] += weights[model_id]
+        for index in pending:
+            stages_run[index].append(model_id)
+
+        combined = weighted_sum[pending] / weight_total[pending]
+        pending = pending[(combined >= low) & (combined <= high)]
+        if len(pending) == 0:
+            break
+
+    return weighted_sum / weight_total, stages_run
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes concurrentes d'un même modèle en un seul forward pass
+
+    Chaque appel à `predict` dépose son tenseur dans une file. Un thread dédié
+    vide la file dès que `max_batch_size` images sont en attente, que
+    `max_wait_ms` s'est écoulé depuis la première, ou que tous les appelants
+    en cours (`callers`) ont déjà déposé leur requête : chacun attend son
+    résultat, personne d'autre ne peut donc rejoindre le lot. Il exécute un
+    seul appel au modèle puis redistribue à chaque appelant sa propre tranche
+    du résultat.
+
+    Le nombre d'appelants simultanés est borné par l'exécuteur d'inférence
+    (INFERENCE_WORKERS en mode thread, un par worker en mode process) : un lot
+    ne dépasse jamais ce nombre de requêtes, et sans `callers` chaque lot
+    incomplet attendrait `max_wait_ms`.
+    """
+
+    def __init__(self,
+                 name: str,
+                 forward_fn,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 cpus: Optional[set] = None,
+                 callers: Optional[Callable[[], int]] = None):
+        self.name = name
+        self.forward_fn = forward_fn
+        self.cpus = cpus  # Affinité du thread du batcher (None = celle du thread qui le crée)
+        self.callers = callers  # Appelants en cours (None = inconnu : seul max_wait_ms borne l'attente)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.stats = {'batches': 0, 'requests': 0, 'images': 0}
+
+        self._items: deque = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name=f"batcher-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, images: np.ndarray) -> Future:
+        """Met en file un tenseur (N, 64, 64, 3) et retourne un Future de ses N probabilités"""
+        future = Future()
+        with self._cond:
+            # Sous verrou : aucune requête ne peut être déposée après l'arrêt
+            if self._closed:
+                raise RuntimeError(f"Batcher {self.name} arrêté")
+            self._items.append((images, future))
+            self._cond.notify()
+        return future
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        """Version bloquante de `submit`"""
+        return self.submit(images).result()
+
+    def wake(self):
+        """Réévalue la condition de vidage (un appelant vient de terminer)"""
+        with self._cond:
+            self._cond.notify()
+
+    def close(self):
+        """Arrête le thread après avoir traité les requêtes déjà en file"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+
+    def _collect(self) -> List:
+        """Attend une première requête puis remplit le batch jusqu'à la taille, au délai max ou au dernier appelant"""
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    return []
+                self._cond.wait()
+
+            items = []
+            rows = 0
+            deadline = time.perf_counter() + self.max_wait
+
+            while True:
+                while self._items and rows < self.max_batch_size:
+                    item = self._items.popleft()
+                    items.append(item)
+                    rows += len(item[0])
+
+                if rows >= self.max_batch_size or self._closed:
+                    # Arrêt demandé : on traite ce qui a déjà été collecté
+                    break
+                if self.callers is not None and len(items) >= self.callers():
+                    break
+
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            return items
+
+    def _run(self):
+        set_affinity(self.cpus)
+        while True:
+            items = self._collect()
+            if not items:
+                return
+
+            batch = items[0][0] if len(items) == 1 else np.concatenate([img for img, _ in items])
+
+            try:
+                probas = np.asarray(self.forward_fn(batch)).reshape(-1)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['requests'] += len(items)
+            self.stats['images'] += len(batch)
+
+            offset = 0
+            for images, future in items:
+                future.set_result(probas[offset:offset + len(images)])
+                offset += len(images)
+
+
 class ModelManager:
     """
     Gestionnaire centralisé pour tous les modèles ML
     Permet de charger, changer et comparer les modèles
+    
+    Avec `serving=False`, catalogue seul : configuration, modèle par défaut et
+    readiness, pour le processus de l'API quand l'inférence tourne dans des
+    workers ou le serveur d'inférence. Ni threads des runtimes, ni affinité,
+    ni surveillance des fichiers, ni scorer shadow ; aucun modèle n'y est
+    chargé ni téléchargé.
     """
     
-    def __init__(self, config_path: str = "app/ml/model_config.yaml"):
+    def __init__(self,
+                 config_path: str = "app/ml/model_config.yaml",
+                 memory_budget_mb: int = 0,
+                 default_model_id: Optional[str] = None,
+                 reload_interval: float = 0,
+                 mirror: Optional[str] = None,
+                 intra_op_threads: int = 0,
+                 inter_op_threads: int = 0,
+                 cpu_affinity: Optional[str] = None,
+                 inference_processes: int = 1,
+                 serving: bool = True):
         self.config_path = config_path
+        self.memory_budget_mb = memory_budget_mb  # 0 = illimité
+        self.reload_interval = reload_interval  # 0 = pas de surveillance des fichiers
+        self.mirror = mirror  # Dossier ou serveur de fichiers remplaçant les remotes
+        self.intra_op_threads = intra_op_threads  # 0 = automatique
+        self.inter_op_threads = inter_op_threads  # 0 = automatique
+        self.cpu_affinity = cpu_affinity  # "0-3,8" ou "per-worker" (workers du mode process)
+        self.inference_processes = inference_processes  # Processus d'inférence qui se partagent les CPU
+        self.serving = serving
+        self.cpus: Optional[set] = None  # Affinité des threads d'inférence
         self.models: Dict[str, any] = {}
         self.config: Dict = {}
-        self.current_model_id: str = "model_2"  # Défaut
+        self.current_model_id: str = default_model_id or "model_2"  # Défaut
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self._callers = 0  # Appels de prédiction en cours (vidage anticipé des micro-batchers)
+        self._forwards = 0  # Forward passes principaux en cours (le shadow leur cède la place)
+        self._callers_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self.reload_generation = 0  # Incrémenté à chaque rechargement qui modifie les modèles
+        self._readiness: Dict = {'ready': False, 'required': [], 'errors': {}}
         
+        if serving:
+            self._configure_threads()
         self._load_config()
         self._load_models()
+        
+        self._pool = None
+        self.shadow = None
+        if serving:
+            # Exécute les modèles sans micro-batching en parallèle (mode ensemble)
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(1, len(self.models)), thread_name_prefix="model",
+                initializer=self.pin_thread
+            )
+            
+            # Modèles candidats rejoués en arrière-plan (bloc `shadow` des modèles)
+            self.shadow = ShadowScorer(
+                self._forward_shadow,
+                queue_size=self.config.get('inference', {}).get('shadow_queue_size', DEFAULT_SHADOW_QUEUE_SIZE)
+            )
+        
+        self._stop_watcher = threading.Event()
+        self._watcher = None
+        if serving and reload_interval > 0:
+            self._watcher = threading.Thread(
+                target=self._watch, args=(reload_interval,), name="model-watcher", daemon=True
+            )
+            self._watcher.start()
+    
+    def _configure_threads(self):
+        """
+        Dimensionne les threads des runtimes d'après `cpu_affinity`
+
+        Le thread qui construit le gestionnaire (en mode thread, celui de la
+        boucle asyncio) n'est pas épinglé : seuls le sont les threads
+        d'inférence (`pin_thread` en initializer), les micro-batchers, les
+        chargements et les threads que ceux-ci créent.
+        """
+        cpus = None
+        if self.cpu_affinity and self.cpu_affinity != "per-worker":
+            cpus = parse_cpu_list(self.cpu_affinity)
+        self.cpus = cpus
+        
+        intra_op, inter_op = resolve_threads(
+            self.intra_op_threads, self.inter_op_threads, cpus,
+            processes=1 if cpus else self.inference_processes
+        )
+        configure_threads(intra_op, inter_op)
+        self.threading = {
+            'intra_op': intra_op,
+            'inter_op': inter_op,
+            'cpus': format_cpu_list(cpus) if cpus else None
+        }
+        logger.info(
+            f"🧵 Threads d'inférence: intra_op={intra_op}, inter_op={inter_op}, "
+            f"cpus={self.threading['cpus'] or 'tous'} ({', '.join(describe_cpus())})"
+        )
+    
+    def pin_thread(self):
+        """Épingle le thread appelant sur `cpu_affinity` (initializer des threads d'inférence)"""
+        set_affinity(self.cpus)
+    
+    def _model_cpus(self, model_config: Dict) -> Optional[set]:
+        """Affinité propre au modèle (`threading.cpus` dans model_config.yaml), sinon `cpu_affinity`"""
+        cpus = (model_config.get('threading') or {}).get('cpus')
+        return parse_cpu_list(cpus) if cpus else self.cpus
     
     def _load_config(self):
         """Charge la configuration des modèles"""
         try:
+            self._config_mtime = os.stat(self.config_path).st_mtime_ns
             with open(self.config_path, 'r') as f:
                 self.config = yaml.safe_load(f)
             logger.info(f"✅ Configuration chargée: {len(self.config['models'])} modèles")
@@ -41,37 +340,500 @@ class ModelManager:
     def _load_models(self):
         """Charge tous les modèles en lazy loading"""
         for model_config in self.config['models']:
-            model_id = model_config['id']
-            local_path = model_config['local_path']
-
-            self.models[model_id] = {
-                'path': local_path,
-                'loaded': False,
-                'model': None,
-                'config': model_config
-            }
-
-            logger.info(f"📁 Modèle {model_id} enregistré (lazy loading)")
+            self.models[model_config['id']] = self._register_model(model_config)
+    
+    @staticmethod
+    def _register_model(model_config: Dict) -> Dict:
+        logger.info(f"📁 Modèle {model_config['id']} enregistré (lazy loading)")
+        return {
+            'path': model_config['local_path'],
+            'loaded': False,
+            'model': None,
+            'config': model_config,
+            'lock': threading.Lock(),
+            'memory_bytes': 0,
+            'last_used': None,
+            'artifact_stat': None
+        }
+    
+    @staticmethod
+    def _artifact_stat(model_config: Dict) -> Optional[Tuple[int, int]]:
+        """(mtime le plus récent, taille totale) de l'artefact local, None s'il est absent"""
+        path = Path(model_config['local_path'])
+        try:
+            files = [p for p in path.rglob("*") if p.is_file()] if path.is_dir() else [path]
+            stats = [f.stat() for f in files]
+        except FileNotFoundError:
+            return None
+        return max((st.st_mtime_ns for st in stats), default=0), sum(st.st_size for st in stats)
     
-    def load_model(self, model_id: str):
+    def load_model(self, model_id: str, evict: bool = True):
+        """
+        Charge (au besoin) et retourne le runner du modèle
+        
+        Avec `evict=False`, le budget mémoire n'est pas appliqué après le
+        chargement : aucun autre modèle n'est déchargé (chargements shadow).
+        """
         if model_id not in self.models:
             raise ValueError(f"Modèle {model_id} non trouvé")
+        if not self.serving:
+            raise RuntimeError("Catalogue seul (serving=False) : les modèles se chargent côté inférence")
         
         model_info = self.models[model_id]
 
-        if not model_info['loaded']:
+        # Lecture unique de la référence : un déchargement concurrent ne peut
+        # pas la remplacer par None entre le test et le retour
+        model = model_info['model']
+        if model is not None:
+            return model
+
+        # Un verrou par modèle : des modèles différents se chargent en parallèle
+        with model_info['lock']:
+            model = model_info['model']
+            if model is not None:
+                return model
+
             try:
                 # Téléchargement si nécessaire + chargement
-                local_path = download_model_if_needed(model_info['config'])
-                model_info['model'] = remote_load_model(model_info['config'])
+                local_path = download_model_if_needed(model_info['config'], self.mirror)
+                model_info['artifact_stat'] = self._artifact_stat(model_info['config'])
+                # Les threads créés par le runtime au chargement héritent de l'affinité du modèle
+                with pinned(self._model_cpus(model_info['config'])):
+                    model = remote_load_model(
+                        model_info['config'],
+                        batch_buckets=self.config.get('inference', {}).get('batch_buckets', DEFAULT_BATCH_BUCKETS),
+                        mirror=self.mirror,
+                        compiled_cache=self.config.get('inference', {}).get('compiled_cache', True)
+                    )
+                model_info['model'] = model
+                model_info['measured_inference_time_ms'] = model.latency_ms.get(1)
+                model_info['memory_bytes'] = model.memory_bytes or os.path.getsize(local_path)
+                model_info['last_used'] = time.time()
                 model_info['loaded'] = True
-                logger.info(f"✅ Modèle {model_id} chargé depuis {local_path}")
+                logger.info(
+                    f"✅ Modèle {model_id} chargé et préchauffé depuis {local_path} "
+                    f"({model_info['memory_bytes'] / (1024 * 1024):.1f} MB, "
+                    f"latences ms par batch: { {b: round(t, 2) for b, t in model.latency_ms.items()} })"
+                )
             
             except Exception as e:
                 logger.error(f"❌ Erreur chargement modèle {model_id}: {e}")
                 raise
 
-        return model_info['model']
+        if evict:
+            self._enforce_memory_budget(keep=model_id)
+        return model
+    
+    def unload_model(self, model_id: str) -> bool:
+        """
+        Décharge un modèle (rechargé à la demande au prochain usage)
+        
+        Les requêtes en cours conservent leur référence au runner et se terminent
+        normalement ; la mémoire est libérée quand la dernière se termine.
+        """
+        model_info = self.models[model_id]
+        with model_info['lock']:
+            if not model_info['loaded']:
+                return False
+            model_info['loaded'] = False
+            model_info['model'] = None
+        gc.collect()
+        logger.info(f"♻️ Modèle {model_id} déchargé ({model_info['memory_bytes'] / (1024 * 1024):.1f} MB)")
+        return True
+    
+    def resident_memory_bytes(self) -> int:
+        """Mémoire estimée des modèles chargés"""
+        return sum(info['memory_bytes'] for info in self.models.values() if info['loaded'])
+    
+    def _enforce_memory_budget(self, keep: str):
+        """
+        Décharge les modèles les moins récemment utilisés tant que le budget
+        mémoire est dépassé, les candidats shadow en premier. Ni le modèle par
+        défaut ni `keep` (qui vient d'être chargé) ne sont évincés.
+        """
+        if not self.memory_budget_mb:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        
+        shadow_ids = self.candidate_model_ids()
+        with self._lock:
+            while self.resident_memory_bytes() > budget:
+                candidates = [
+                    (model_id not in shadow_ids, info['last_used'] or 0, model_id)
+                    for model_id, info in self.models.items()
+                    if info['loaded'] and model_id not in (keep, self.current_model_id)
+                ]
+                if not candidates:
+                    logger.warning(
+                        f"⚠️ Budget mémoire dépassé ({self.resident_memory_bytes() / (1024 * 1024):.1f} MB "
+                        f"> {self.memory_budget_mb} MB) sans modèle évinçable"
+                    )
+                    return
+                _, _, lru_model_id = min(candidates)
+                self.unload_model(lru_model_id)
+
+    def reload(self, model_ids: Optional[List[str]] = None) -> Dict[str, any]:
+        """
+        Relit model_config.yaml et remplace à chaud les modèles modifiés
+        
+        Un modèle chargé dont l'entrée de configuration ou l'artefact a changé
+        (ou listé dans `model_ids`) est rechargé et préchauffé à côté de
+        l'ancien, puis substitué atomiquement : les requêtes en cours terminent
+        sur l'ancienne version, libérée ensuite. Un modèle non chargé prend
+        simplement la nouvelle configuration. En cas d'échec, l'ancienne
+        version reste en service.
+        
+        Returns:
+            {'added', 'removed', 'updated', 'reloaded': [model_id], 'errors': {model_id: message}}
+        """
+        with self._reload_lock:
+            config_mtime = os.stat(self.config_path).st_mtime_ns
+            with open(self.config_path, 'r') as f:
+                config = yaml.safe_load(f)
+            entries = {m['id']: m for m in config['models']}
+            report = {'added': [], 'removed': [], 'updated': [], 'reloaded': [], 'errors': {}}
+            
+            # Nouveau dictionnaire plutôt que mutation : les itérations en cours restent valides
+            models = {}
+            for model_id, info in self.models.items():
+                if model_id in entries:
+                    models[model_id] = info
+                elif model_id == self.current_model_id:
+                    models[model_id] = info
+                    report['errors'][model_id] = "Modèle par défaut retiré de la configuration : conservé"
+                else:
+                    report['removed'].append(model_id)
+            for model_id, entry in entries.items():
+                if model_id not in models:
+                    models[model_id] = self._register_model(entry)
+                    report['added'].append(model_id)
+            
+            self.config = config
+            self.models = models
+            self._config_mtime = config_mtime
+            for model_id in report['removed']:
+                self._close_batcher(model_id)
+            
+            for model_id, entry in entries.items():
+                info = models[model_id]
+                if model_id in report['added']:
+                    continue
+                
+                artifact_changed = (
+                    info['artifact_stat'] is not None
+                    and self._artifact_stat(entry) != info['artifact_stat']
+                )
+                forced = bool(model_ids) and model_id in model_ids
+                if entry == info['config'] and not artifact_changed and not forced:
+                    continue
+                
+                if info['model'] is None:
+                    self._update_model_config(model_id, entry)
+                    report['updated'].append(model_id)
+                    continue
+                
+                try:
+                    self._swap_model(model_id, entry)
+                    report['reloaded'].append(model_id)
+                except Exception as e:
+                    logger.error(f"❌ Rechargement de {model_id} impossible, ancienne version conservée: {e}")
+                    report['errors'][model_id] = str(e)
+            
+            if report['added'] or report['removed'] or report['updated'] or report['reloaded']:
+                self.reload_generation += 1
+        
+        logger.info(f"🔁 Configuration rechargée: {report}")
+        return report
+    
+    def _update_model_config(self, model_id: str, model_config: Dict):
+        """Nouvelle configuration d'un modèle non chargé (prise en compte au prochain chargement)"""
+        info = self.models[model_id]
+        with info['lock']:
+            old_batching = self._batcher_settings(info['config'])
+            info.update({
+                'path': model_config['local_path'],
+                'config': model_config,
+                'measured_inference_time_ms': None,
+                'artifact_hash': None,
+                'artifact_stat': None
+            })
+        if self._batcher_settings(model_config) != old_batching:
+            self._close_batcher(model_id)
+    
+    def _swap_model(self, model_id: str, model_config: Dict):
+        """Charge et préchauffe une nouvelle version du modèle, puis la substitue à l'ancienne"""
+        info = self.models[model_id]
+        
+        local_path = download_model_if_needed(model_config, self.mirror)
+        artifact_stat = self._artifact_stat(model_config)
+        with pinned(self._model_cpus(model_config)):
+            model = remote_load_model(
+                model_config,
+                batch_buckets=self.config.get('inference', {}).get('batch_buckets', DEFAULT_BATCH_BUCKETS),
+                mirror=self.mirror,
+                compiled_cache=self.config.get('inference', {}).get('compiled_cache', True)
+            )
+        
+        with info['lock']:
+            old_batching = self._batcher_settings(info['config'])
+            info.update({
+                'path': model_config['local_path'],
+                'config': model_config,
+                'model': model,
+                'loaded': True,
+                'measured_inference_time_ms': model.latency_ms.get(1),
+                'memory_bytes': model.memory_bytes or os.path.getsize(local_path),
+                'last_used': time.time(),
+                'artifact_hash': None,
+                'artifact_stat': artifact_stat
+            })
+        
+        # Le micro-batcher appelle load_model à chaque lot : il sert déjà la
+        # nouvelle version, il n'est recréé que si ses réglages ont changé
+        if self._batcher_settings(model_config) != old_batching:
+            self._close_batcher(model_id)
+        
+        gc.collect()
+        logger.info(f"🔁 Modèle {model_id} remplacé à chaud depuis {local_path}")
+        self._enforce_memory_budget(keep=model_id)
+    
+    @staticmethod
+    def _batcher_settings(model_config: Dict) -> Tuple:
+        """Réglages figés à la création du micro-batcher (recréé s'ils changent)"""
+        return model_config.get('batching'), (model_config.get('threading') or {}).get('cpus')
+    
+    def _close_batcher(self, model_id: str):
+        """Retire le micro-batcher d'un modèle après avoir traité ses requêtes en file"""
+        with self._lock:
+            batcher = self.batchers.pop(model_id, None)
+        if batcher is not None:
+            batcher.close()
+    
+    def _has_changes(self) -> bool:
+        """La configuration ou l'artefact d'un modèle chargé a-t-il changé sur disque ?"""
+        if os.stat(self.config_path).st_mtime_ns != self._config_mtime:
+            return True
+        return any(
+            info['artifact_stat'] is not None and self._artifact_stat(info['config']) != info['artifact_stat']
+            for info in self.models.values()
+            if info['loaded']
+        )
+    
+    def _watch(self, interval: float):
+        """Surveille model_config.yaml et les artefacts chargés, recharge à chaud si besoin"""
+        logger.info(f"👀 Surveillance de {self.config_path} et des artefacts (toutes les {interval}s)")
+        while not self._stop_watcher.wait(interval):
+            try:
+                if self._has_changes():
+                    self.reload()
+            except Exception as e:
+                logger.error(f"❌ Erreur de rechargement automatique: {e}")
+    
+    def models_for_policy(self, policy: str) -> List[str]:
+        """
+        Modèles à précharger selon la politique de chargement
+        
+        - "lazy" : aucun (chargement à la première requête)
+        - "eager-default" : le modèle par défaut
+        - "eager-all" : tous les modèles
+        """
+        if policy == "lazy":
+            return []
+        if policy == "eager-default":
+            return [self.current_model_id]
+        if policy == "eager-all":
+            return list(self.models.keys())
+        raise ValueError(f"Politique de chargement inconnue : {policy}")
+    
+    def preload(self, model_ids: List[str], max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        Télécharge, charge et préchauffe des modèles en parallèle
+        
+        Returns:
+            {model_id: message d'erreur} pour les modèles en échec
+        """
+        self.set_readiness(model_ids, None)
+        errors = {}
+        
+        if model_ids:
+            logger.info(f"⏳ Préchargement en parallèle: {', '.join(model_ids)}")
+            with ThreadPoolExecutor(max_workers=max_workers or len(model_ids),
+                                    thread_name_prefix="preload", initializer=self.pin_thread) as pool:
+                futures = {model_id: pool.submit(self.load_model, model_id) for model_id in model_ids}
+            
+            for model_id, future in futures.items():
+                if future.exception() is not None:
+                    errors[model_id] = str(future.exception())
+        
+        self.set_readiness(model_ids, errors)
+        return errors
+    
+    def set_readiness(self, model_ids: List[str], errors: Optional[Dict[str, str]]):
+        """Met à jour l'état de readiness (errors=None : préchargement en cours)"""
+        self._readiness = {
+            'ready': errors is not None and not errors,
+            'required': list(model_ids),
+            'errors': errors or {}
+        }
+        if errors:
+            logger.error(f"❌ Préchargement incomplet: {errors}")
+        elif errors is not None:
+            logger.info("✅ Modèles requis chargés et préchauffés")
+    
+    def readiness(self) -> Dict:
+        """État de readiness : prêt quand tous les modèles requis sont chargés et préchauffés"""
+        return {
+            **self._readiness,
+            'loaded': [model_id for model_id, info in self.models.items() if info['loaded']]
+        }
+    
+    def _forward(self, model_id: str, batch: np.ndarray) -> np.ndarray:
+        """Exécute un forward pass brut et retourne les probabilités (N,)"""
+        model = self.load_model(model_id)
+        self.models[model_id]['last_used'] = time.time()
+        with self._callers_lock:
+            self._forwards += 1
+        try:
+            return model.predict(batch)
+        finally:
+            with self._callers_lock:
+                self._forwards -= 1
+
+    def _get_batcher(self, model_id: str) -> Optional[MicroBatcher]:
+        """Retourne (et crée au besoin) le micro-batcher du modèle, None si désactivé"""
+        batcher = self.batchers.get(model_id)
+        if batcher is not None:
+            return batcher
+
+        batching = self.models[model_id]['config'].get('batching') or {}
+        max_batch_size = batching.get('max_batch_size', DEFAULT_MAX_BATCH_SIZE)
+        max_wait_ms = batching.get('max_wait_ms', DEFAULT_MAX_WAIT_MS)
+
+        if max_batch_size <= 1:
+            return None
+
+        with self._lock:
+            if model_id not in self.batchers:
+                self.batchers[model_id] = MicroBatcher(
+                    model_id,
+                    lambda batch, mid=model_id: self._forward(mid, batch),
+                    max_batch_size=max_batch_size,
+                    max_wait_ms=max_wait_ms,
+                    cpus=self._model_cpus(self.models[model_id]['config']),
+                    callers=self.active_callers
+                )
+                logger.info(
+                    f"📦 Micro-batching {model_id}: "
+                    f"max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}"
+                )
+            return self.batchers[model_id]
+
+    def active_callers(self) -> int:
+        """Appels de prédiction en cours, en file dans un micro-batcher ou sur le point d'y entrer"""
+        return self._callers
+
+    @contextmanager
+    def _caller(self):
+        """Compte l'appelant pendant sa prédiction ; à sa sortie, les batchers réévaluent leur lot"""
+        with self._callers_lock:
+            self._callers += 1
+        try:
+            yield
+        finally:
+            with self._callers_lock:
+                self._callers -= 1
+            for batcher in list(self.batchers.values()):
+                batcher.wake()
+
+    def _submit(self, model_id: str, image: np.ndarray) -> Future:
+        """Lance l'inférence sans attendre : Future des probabilités (N,)"""
+        while True:
+            batcher = self._get_batcher(model_id)
+            if batcher is None:
+                return self._pool.submit(self._forward, model_id, image)
+            try:
+                return batcher.submit(image)
+            except RuntimeError:
+                # Batcher remplacé par un rechargement entre-temps : on prend le nouveau
+                if self.batchers.get(model_id) is batcher:
+                    raise
+
+    def _infer(self, model_id: str, image: np.ndarray) -> np.ndarray:
+        """Probabilités (N,) pour un tenseur, en passant par le micro-batcher du modèle"""
+        if self._get_batcher(model_id) is None:
+            return self._forward(model_id, image)
+        return self._submit(model_id, image).result()
+
+    def primary_busy(self) -> bool:
+        """Une prédiction principale est-elle en file ou en cours d'exécution ?"""
+        return self._callers > 0 or self._forwards > 0
+    
+    def _forward_shadow(self, model_id: str, images: np.ndarray) -> np.ndarray:
+        """
+        Forward pass du candidat, hors micro-batcher, sur des ressources libres
+        
+        Le candidat partage les threads du runtime (pool intra-op de
+        TensorFlow, commun au processus) et le budget mémoire avec les modèles
+        principaux : le lot est abandonné (ShadowSkipped) dès qu'une
+        prédiction principale est en cours, ou si le candidat n'est pas chargé
+        et ne tient pas dans le budget sans évincer un autre modèle.
+        """
+        if model_id not in self.models:
+            raise ValueError(f"Modèle candidat {model_id} non trouvé")
+        if self.primary_busy():
+            raise ShadowSkipped("inférence principale en cours")
+        model = self.models[model_id]['model'] or self._load_shadow(model_id)
+        
+        step = max(self.config.get('inference', {}).get('batch_buckets', DEFAULT_BATCH_BUCKETS))
+        outputs = []
+        for start in range(0, len(images), step):
+            if self.primary_busy():
+                raise ShadowSkipped("inférence principale en cours")
+            outputs.append(model.predict(images[start:start + step]))
+        self.models[model_id]['last_used'] = time.time()
+        return np.concatenate(outputs)
+    
+    def _load_shadow(self, model_id: str):
+        """Charge un candidat seulement s'il tient dans le budget mémoire sans rien évincer"""
+        if not self.memory_budget_mb:
+            return self.load_model(model_id, evict=False)
+        
+        budget = self.memory_budget_mb * 1024 * 1024
+        model_info = self.models[model_id]
+        # Taille connue d'un chargement précédent, sinon celle de l'artefact
+        stat = self._artifact_stat(model_info['config'])
+        estimate = model_info['memory_bytes'] or (stat[1] if stat else None)
+        if estimate is None or self.resident_memory_bytes() + estimate > budget:
+            raise ShadowSkipped("le charger dépasserait le budget mémoire")
+        
+        model = self.load_model(model_id, evict=False)
+        if self.resident_memory_bytes() > budget:
+            # Estimation trop basse : c'est le candidat qui repart
+            self.unload_model(model_id)
+            raise ShadowSkipped("le charger dépasse le budget mémoire")
+        return model
+    
+    def _shadow(self, model_id: str, images: np.ndarray, probas: np.ndarray, latency_ms: float):
+        """Confie une fraction des requêtes au candidat du modèle (sans jamais bloquer)"""
+        self.shadow.maybe_submit(
+            model_id, self.models[model_id]['config'].get('shadow'), images, probas, latency_ms
+        )
+    
+    def shadow_stats(self) -> Dict:
+        """Accord, écarts de confiance et latences des candidats évalués en arrière-plan"""
+        return self.shadow.stats()
+    
+    def shutdown(self):
+        """Arrête la surveillance des fichiers et les threads de micro-batching"""
+        self._stop_watcher.set()
+        if self.shadow is not None:
+            self.shadow.close()
+        with self._lock:
+            batchers, self.batchers = self.batchers, {}
+        for batcher in batchers.values():
+            batcher.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
 
     
     def predict(self, 
@@ -89,16 +851,207 @@ class ModelManager:
         Returns:
             Dict avec résultats de prédiction
         """
-        if return_all:
-            return self._predict_all_models(image)
+        with self._caller():
+            if return_all:
+                return self._predict_all_models(image)
+            
+            if model_id == CASCADE_MODEL_ID:
+                return self._predict_cascade(image, self._infer)[0]
+            
+            # Utiliser le modèle spécifié ou le modèle par défaut
+            model_id = model_id or self.current_model_id
+            if model_id not in self.models:
+                raise ValueError(f"Modèle {model_id} non trouvé")
+            
+            # Prédiction (regroupée avec les requêtes concurrentes du même modèle)
+            start = time.perf_counter()
+            probas = self._infer(model_id, image)
+            self._shadow(model_id, image, probas, (time.perf_counter() - start) * 1000)
+            
+            return self._build_result(model_id, probas[0])
+    
+    def predict_batch(self,
+                      images: np.ndarray,
+                      model_id: Optional[str] = None,
+                      max_chunk_size: int = DEFAULT_MAX_BATCH_SIZE) -> List[Dict]:
+        """
+        Prédit un lot d'images en un forward pass par tranche de `max_chunk_size`
+        
+        Args:
+            images: Images prétraitées (N, 64, 64, 3)
+            model_id: ID du modèle à utiliser (None = défaut)
+            max_chunk_size: Taille maximale d'un appel au modèle
+        
+        Returns:
+            Liste de N dicts de résultats, dans l'ordre des images
+        """
+        if len(images) == 0:
+            return []
+        
+        if model_id == CASCADE_MODEL_ID:
+            return self._predict_cascade(
+                images,
+                lambda mid, batch: self.forward_chunked(mid, batch, max_chunk_size)
+            )
         
-        # Utiliser le modèle spécifié ou le modèle par défaut
         model_id = model_id or self.current_model_id
-        model = self.load_model(model_id)
-        model_config = self.models[model_id]['config']
+        if model_id not in self.models:
+            raise ValueError(f"Modèle {model_id} non trouvé")
+        
+        start = time.perf_counter()
+        probas = self.forward_chunked(model_id, images, max_chunk_size)
+        self._shadow(model_id, images, probas, (time.perf_counter() - start) * 1000)
+        
+        return [self._build_result(model_id, proba) for proba in probas]
+    
+    def forward_chunked(self, model_id: str, images: np.ndarray, max_chunk_size: int) -> np.ndarray:
+        """
+        Probabilités (N,) brutes d'un modèle, en forward passes successifs de
+        `max_chunk_size` images au plus, sans micro-batcher ni shadow
+        (évaluation hors ligne, benchmarks)
+        """
+        max_chunk_size = max(1, max_chunk_size)
+        return np.concatenate([
+            self._forward(model_id, images[start:start + max_chunk_size])
+            for start in range(0, len(images), max_chunk_size)
+        ])
+    
+    def artifact_version(self, model_id: Optional[str] = None) -> str:
+        """
+        Version du ou des artefacts derrière un model_id, pour les clés de cache
+        
+        - modèle : SHA-256 du fichier (téléchargé au besoin), mémorisé
+        - "cascade" : étages (artefact et poids) et bande d'incertitude
+        - "ensemble" : artefacts et poids (accuracy) des modèles votants
+        """
+        model_id = model_id or self.current_model_id
+        
+        if model_id == CASCADE_MODEL_ID:
+            cascade = self.get_cascade_config()
+            parts = [self._weighted_version(m) for m in cascade['stages']]
+            parts.append(str(cascade['uncertainty_band']))
+            return hashlib.sha256("|".join(parts).encode()).hexdigest()
+        
+        if model_id == "ensemble":
+            parts = [self._weighted_version(m) for m in self.ensemble_model_ids()]
+            return hashlib.sha256("|".join(parts).encode()).hexdigest()
+        
+        if model_id not in self.models:
+            raise ValueError(f"Modèle {model_id} non trouvé")
+        
+        model_info = self.models[model_id]
+        if model_info.get('artifact_hash') is None:
+            if not self.serving:
+                raise RuntimeError("Catalogue seul (serving=False) : version à demander côté inférence")
+            local_path = download_model_if_needed(model_info['config'], self.mirror)
+            model_info['artifact_hash'] = artifact_hash(local_path)
+        return model_info['artifact_hash']
+    
+    def _weighted_version(self, model_id: str) -> str:
+        # Pondération incluse : changer l'accuracy d'un modèle change le vote
+        return f"{model_id}:{self.artifact_version(model_id)}:{self.models[model_id]['config']['accuracy']}"
+    
+    def candidate_model_ids(self) -> set:
+        """
+        Modèles en cours d'évaluation : nommés par le bloc `shadow` d'un autre
+        modèle, ils ne servent que le shadow scoring tant qu'ils n'ont pas été
+        promus (bloc `shadow` retiré)
+        """
+        return {
+            (info['config'].get('shadow') or {}).get('model_id')
+            for info in self.models.values()
+        } - {None}
+    
+    def ensemble_model_ids(self) -> List[str]:
+        """
+        Modèles votant dans l'ensemble et la comparaison : les variantes
+        converties ou quantifiées (`source_model`) en sont exclues, elles
+        compteraient deux fois le même réseau, ainsi que les candidats shadow
+        """
+        candidates = self.candidate_model_ids()
+        return [
+            m for m, info in self.models.items()
+            if not info['config'].get('source_model') and m not in candidates
+        ]
+    
+    def model_ids(self) -> List[str]:
+        """Modèles sélectionnables par les clients (tous sauf les candidats shadow)"""
+        candidates = self.candidate_model_ids()
+        return [m for m in self.models if m not in candidates]
+    
+    def available_model_ids(self) -> List[str]:
+        """IDs acceptés par `predict` (modèles hors candidats + mode cascade s'il est configuré)"""
+        model_ids = self.model_ids()
+        if self.config.get('cascade'):
+            model_ids.append(CASCADE_MODEL_ID)
+        return model_ids
+    
+    def get_cascade_config(self) -> Dict:
+        """Étages et bande d'incertitude de la cascade (model_config.yaml)"""
+        cascade = self.config.get('cascade') or {}
+        if not cascade:
+            raise ValueError("Mode cascade non configuré")
+        
+        stages = cascade.get('stages') or sorted(
+            self.ensemble_model_ids(), key=lambda m: self.models[m]['config'].get('inference_time_ms', 0)
+        )
+        for model_id in stages:
+            if model_id not in self.models:
+                raise ValueError(f"Modèle {model_id} non trouvé")
+        
+        return {
+            'stages': stages,
+            'uncertainty_band': tuple(cascade.get('uncertainty_band', DEFAULT_UNCERTAINTY_BAND))
+        }
+    
+    def predict_cascade(self, image: np.ndarray) -> Dict:
+        """
+        Prédiction en cascade : le modèle le plus rapide d'abord, les suivants
+        seulement si la probabilité reste dans la bande d'incertitude
+        
+        Args:
+            image: Image prétraitée (1, 64, 64, 3)
+        
+        Returns:
+            Dict de résultat avec `stages_run`
+        """
+        with self._caller():
+            return self._predict_cascade(image, self._infer)[0]
+    
+    def _predict_cascade(self, images: np.ndarray, infer) -> List[Dict]:
+        """Cascade vectorisée : chaque étage ne reçoit que les images encore incertaines"""
+        cascade = self.get_cascade_config()
+        weights = {m: self.models[m]['config']['accuracy'] for m in cascade['stages']}
         
-        # Prédiction
-        prediction_proba = model.predict(image, verbose=0)[0][0]
+        probas, stages_run = run_cascade(
+            len(images),
+            cascade['stages'],
+            weights,
+            cascade['uncertainty_band'],
+            lambda model_id, indices: infer(model_id, images[indices])
+        )
+        
+        return [self._build_cascade_result(p, stages) for p, stages in zip(probas, stages_run)]
+    
+    def _build_cascade_result(self, proba: float, stages_run: List[str]) -> Dict:
+        is_parasitized = proba > 0.5
+        confidence = proba if is_parasitized else (1 - proba)
+        
+        return {
+            'model_id': CASCADE_MODEL_ID,
+            'model_name': 'Cascade (' + ' → '.join(self.models[m]['config']['name'] for m in stages_run) + ')',
+            'prediction': 'Parasitée' if is_parasitized else 'Non infectée',
+            'confidence': float(confidence * 100),
+            'probability_parasitized': float(proba * 100),
+            'probability_uninfected': float((1 - proba) * 100),
+            'is_parasitized': bool(is_parasitized),
+            'inference_time_ms': round(sum(self.get_inference_time_ms(m) for m in stages_run), 2),
+            'stages_run': stages_run
+        }
+    
+    def _build_result(self, model_id: str, prediction_proba: float) -> Dict:
+        """Construit le dict de résultat à partir de la probabilité 'parasitée'"""
+        model_config = self.models[model_id]['config']
         
         is_parasitized = prediction_proba > 0.5
         confidence = prediction_proba if is_parasitized else (1 - prediction_proba)
@@ -111,35 +1064,69 @@ class ModelManager:
             'probability_parasitized': float(prediction_proba * 100),
             'probability_uninfected': float((1 - prediction_proba) * 100),
             'is_parasitized': bool(is_parasitized),
-            'inference_time_ms': model_config.get('inference_time_ms', 0),
+            'inference_time_ms': self.get_inference_time_ms(model_id),
             'accuracy': model_config.get('accuracy', 0)
         }
     
+    def get_inference_time_ms(self, model_id: str) -> float:
+        """
+        Latence batch 1 : mesurée au préchauffage, sinon p50 du dernier
+        benchmark, sinon valeur de model_config.yaml
+        """
+        info = self.models[model_id]
+        measured = info.get('measured_inference_time_ms')
+        if measured is not None:
+            return round(measured, 2)
+        benchmarked = self._benchmark_summary().get(model_id)
+        if benchmarked:
+            return benchmarked['p50_ms']
+        return info['config'].get('inference_time_ms', 0)
+    
+    def _benchmark_summary(self) -> Dict[str, Dict]:
+        """Chiffres clés par modèle du dernier benchmark (de préférence sur cette machine)"""
+        try:
+            run = benchmark.latest_run()
+        except Exception as e:
+            logger.error(f"❌ Résultats de benchmark illisibles: {e}")
+            return {}
+        return benchmark.summarize(run) if run else {}
+    
     def _predict_all_models(self, image: np.ndarray) -> Dict:
-        """Fait une prédiction avec tous les modèles"""
+        """Fait une prédiction avec tous les modèles votants, exécutés en parallèle"""
         results = {
             'predictions': [],
             'ensemble_result': None
         }
         
+        # Le même tenseur est envoyé à tous les modèles avant d'attendre le premier
+        futures = {}
+        for model_id in self.ensemble_model_ids():
+            try:
+                futures[model_id] = self._submit(model_id, image)
+            except Exception as e:
+                logger.error(f"Erreur prédiction {model_id}: {e}")
+        
+        model_ids = []
         probas = []
         
-        for model_id in self.models.keys():
+        for model_id, future in futures.items():
             try:
-                result = self.predict(image, model_id=model_id)
-                results['predictions'].append(result)
-                probas.append(result['probability_parasitized'] / 100)
+                probas.append(future.result()[0])
+                model_ids.append(model_id)
             except Exception as e:
                 logger.error(f"Erreur prédiction {model_id}: {e}")
         
+        results['predictions'] = [
+            self._build_result(model_id, proba) for model_id, proba in zip(model_ids, probas)
+        ]
+        
         # Calcul ensemble (moyenne pondérée)
         if probas:
-            # Pondération selon l'accuracy
-            weights = [m['config']['accuracy'] for m in self.models.values()]
-            total_weight = sum(weights)
-            weights = [w / total_weight for w in weights]
+            # Pondération selon l'accuracy, uniquement pour les modèles ayant répondu
+            weights = np.array([self.models[m]['config']['accuracy'] for m in model_ids])
+            weights = weights / weights.sum()
             
-            ensemble_proba = sum(p * w for p, w in zip(probas, weights))
+            ensemble_proba = float(np.dot(np.array(probas), weights))
             is_parasitized = ensemble_proba > 0.5
             confidence = ensemble_proba if is_parasitized else (1 - ensemble_proba)
             
@@ -151,31 +1138,61 @@ class ModelManager:
                 'probability_parasitized': float(ensemble_proba * 100),
                 'probability_uninfected': float((1 - ensemble_proba) * 100),
                 'is_parasitized': bool(is_parasitized),
-                'weights': weights
+                'models': model_ids,
+                'weights': weights.tolist()
             }
         
         return results
     
     def get_models_info(self) -> List[Dict]:
-        """Retourne les infos de tous les modèles"""
+        """Retourne les infos des modèles sélectionnables (candidats shadow exclus)"""
+        summary = self._benchmark_summary()
+        model_ids = set(self.model_ids())
         return [
             {
                 'id': model_id,
                 'name': info['config']['name'],
                 'accuracy': info['config']['accuracy'],
-                'inference_time_ms': info['config'].get('inference_time_ms', 0),
+                'inference_time_ms': self.get_inference_time_ms(model_id),
                 'parameters': info['config'].get('parameters', 'N/A'),
                 'use_case': info['config'].get('use_case', ''),
-                'is_default': info['config'].get('is_default', False),
-                'loaded': info.get('loaded', False)
+                'is_default': model_id == self.current_model_id,
+                'source_model': info['config'].get('source_model'),
+                'loaded': info.get('loaded', False),
+                'memory_mb': round(info['memory_bytes'] / (1024 * 1024), 2) if info['memory_bytes'] else None,
+                'last_used': info['last_used'],
+                'benchmark': summary.get(model_id)
             }
             for model_id, info in self.models.items()
+            if model_id in model_ids
         ]
     
-    def set_default_model(self, model_id: str):
-        """Définit le modèle par défaut"""
+    def status(self) -> Dict:
+        """
+        Modèles, modèle par défaut et mémoire résidente de ce ModelManager,
+        tels que vus par le processus qui sert l'inférence
+        """
+        return {
+            'default_model': self.current_model_id,
+            'models': self.get_models_info(),
+            'resident_mb': round(self.resident_memory_bytes() / (1024 * 1024), 2),
+            'budget_mb': self.memory_budget_mb or None
+        }
+    
+    def set_default_model(self, model_id: str, warm: bool = True):
+        """
+        Définit le modèle par défaut
+        
+        Avec `warm`, le modèle est chargé et préchauffé avant la bascule : les
+        requêtes ne passent sur le nouveau modèle qu'une fois celui-ci prêt.
+        """
         if model_id not in self.models:
             raise ValueError(f"Modèle {model_id} non trouvé")
+        if model_id in self.candidate_model_ids():
+            raise ValueError(f"Modèle {model_id} en évaluation shadow : à promouvoir d'abord")
+        
+        if warm:
+            self.load_model(model_id)
         
         self.current_model_id = model_id
         logger.info(f"✅ Modèle par défaut: {model_id}")
@@ -185,7 +1202,8 @@ class ModelManager:
         Compare les performances de tous les modèles sur une image
         Utile pour la page de comparaison
         """
-        results = self._predict_all_models(image)
+        with self._caller():
+            results = self._predict_all_models(image)
         
         comparison = {
             'image_analyzed': True,
@@ -226,22 +1244,44 @@ class ModelManager:
     
     def benchmark_models(self) -> Dict:
         """
-        Benchmark de tous les modèles
-        (À utiliser avec un dataset de test)
+        Résultats du dernier benchmark mesuré (python -m app.ml.benchmark)
+        
+        Sans résultat enregistré, les modèles et recommandations reposent sur
+        les latences de préchauffage et les valeurs de model_config.yaml.
         """
+        try:
+            run = benchmark.latest_run()
+        except Exception as e:
+            logger.error(f"❌ Résultats de benchmark illisibles: {e}")
+            run = None
+        
         return {
+            'measured': run is not None,
+            'run': {
+                'timestamp': run['timestamp'],
+                'hardware': run['hardware'],
+                'same_hardware': run['same_hardware'],
+                'settings': run['settings'],
+                'results': run['models']
+            } if run else None,
             'models': self.get_models_info(),
             'recommendation': self._get_recommendation()
         }
     
     def _get_recommendation(self) -> Dict:
-        """Recommande le meilleur modèle selon le cas d'usage"""
+        """Recommande le meilleur modèle selon le cas d'usage, à partir des mesures disponibles"""
+        summary = self._benchmark_summary()
+        models = {}
+        for model_id, info in self.models.items():
+            measured = summary.get(model_id) or {}
+            models[model_id] = {
+                'accuracy': measured.get('accuracy') or info['config'].get('accuracy'),
+                'p50_ms': measured.get('p50_ms') or self.get_inference_time_ms(model_id),
+                'throughput': measured.get('throughput')
+            }
         return {
-            'speed': 'model_1',  # Le plus rapide
-            'balanced': 'model_3',  # Le plus précis
-            'accuracy': 'model_2',  # Équilibré
-            'production': 'model_2',  # Recommandé pour production
-            'ensemble': 'ensemble'  # Maximum de précision
+            **benchmark.recommend(models),
+            'basis': 'benchmark' if summary else 'config'
         }
 
 
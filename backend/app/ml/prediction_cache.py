@@ -0,0 +1,213 @@
+# ========================================
+# PREDICTION CACHE - Cache adressé par contenu
+# ========================================
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Écritures disque entre deux purges (expirées + au-delà de disk_max_entries)
+PURGE_INTERVAL = 1000
+
+
+class PredictionCache:
+    """
+    Cache des résultats de prédiction
+
+    Clé : (SHA-256 de l'image, model_id, hash de l'artefact du modèle). Un
+    nouvel artefact invalide donc naturellement les anciennes entrées.
+
+    - Tier mémoire : LRU borné en nombre d'entrées, avec TTL
+    - Tier disque (optionnel) : SQLite, survit aux redémarrages ; purgé au
+      démarrage puis toutes les PURGE_INTERVAL écritures, borné à
+      `disk_max_entries` (les plus anciennes partent)
+
+    `get` / `set` sont bloquants ; depuis la boucle asyncio, `aget` / `aset`
+    ne font que le LRU mémoire sur place et passent le SQLite à un thread.
+    """
+
+    def __init__(self,
+                 max_entries: int = 10000,
+                 ttl_seconds: float = 24 * 3600,
+                 disk_path: Optional[str] = None,
+                 disk_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'disk_hits': 0, 'evictions': 0}
+
+        # Verrou distinct : une requête SQLite ne bloque pas le tier mémoire
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes_since_purge = 0
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_created_at ON predictions (created_at)"
+            )
+            self._db.commit()
+            removed = self.purge_expired()
+            logger.info(f"💾 Cache de prédictions sur disque: {disk_path} ({removed} entrée(s) purgée(s))")
+
+    @staticmethod
+    def make_key(image_hash: str, model_id: str, artifact_hash: str) -> str:
+        return f"{image_hash}:{model_id}:{artifact_hash}"
+
+    def get(self, image_hash: str, model_id: str, artifact_hash: str) -> Optional[Any]:
+        """Retourne le résultat en cache ou None"""
+        key = self.make_key(image_hash, model_id, artifact_hash)
+        found, value = self._get_memory(key)
+        if found:
+            return value
+        return self._get_disk(key)
+
+    async def aget(self, image_hash: str, model_id: str, artifact_hash: str) -> Optional[Any]:
+        """`get` sans bloquer la boucle asyncio"""
+        key = self.make_key(image_hash, model_id, artifact_hash)
+        found, value = self._get_memory(key)
+        if found:
+            return value
+        if self._db is None:
+            return None
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def set(self, image_hash: str, model_id: str, artifact_hash: str, value: Any):
+        """Ajoute un résultat (doit être sérialisable en JSON pour le tier disque)"""
+        key = self.make_key(image_hash, model_id, artifact_hash)
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, value, now)
+        self._set_disk(key, value, now)
+
+    async def aset(self, image_hash: str, model_id: str, artifact_hash: str, value: Any):
+        """`set` sans bloquer la boucle asyncio"""
+        key = self.make_key(image_hash, model_id, artifact_hash)
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, value, now)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, now)
+
+    def _get_memory(self, key: str) -> tuple:
+        """(trouvé, valeur) dans le LRU mémoire"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if time.time() - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters['hits'] += 1
+                    self._counters['memory_hits'] += 1
+                    return True, value
+                del self._memory[key]
+            if self._db is None:
+                self._counters['misses'] += 1
+            return False, None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        """Tier disque, appelé après un échec du tier mémoire"""
+        if self._db is None:
+            return None
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+
+        with self._lock:
+            if row is not None and time.time() - row[1] <= self.ttl_seconds:
+                value = json.loads(row[0])
+                self._store_memory(key, value, row[1])
+                self._counters['hits'] += 1
+                self._counters['disk_hits'] += 1
+                return value
+            self._counters['misses'] += 1
+            return None
+
+    def _set_disk(self, key: str, value: Any, created_at: float):
+        if self._db is None:
+            return
+
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created_at)
+                )
+                self._db.commit()
+            except (TypeError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Cache disque non mis à jour: {e}")
+                return
+            self._writes_since_purge += 1
+            if self._writes_since_purge < PURGE_INTERVAL:
+                return
+
+        self.purge_expired()
+
+    def _store_memory(self, key: str, value: Any, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def purge_expired(self) -> int:
+        """
+        Supprime du tier disque les entrées expirées, puis les plus anciennes
+        au-delà de `disk_max_entries`
+        """
+        if self._db is None:
+            return 0
+        with self._db_lock:
+            self._writes_since_purge = 0
+            removed = self._db.execute(
+                "DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            removed += self._db.execute(
+                "DELETE FROM predictions WHERE key IN ("
+                "SELECT key FROM predictions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,)
+            ).rowcount
+            self._db.commit()
+            return removed
+
+    def stats(self) -> Dict:
+        """Compteurs hit/miss et taille des tiers"""
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            stats = {
+                **self._counters,
+                'hit_rate': self._counters['hits'] / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_enabled': self._db is not None
+            }
+        if self._db is not None:
+            with self._db_lock:
+                stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            stats['disk_max_entries'] = self.disk_max_entries
+        return stats
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,152 @@
+# ========================================
+# QUANTIFICATION INT8 - avec contrôle de l'accuracy
+# ========================================
+#
+# Pour chaque modèle .keras de model_config.yaml :
+#   1. quantification post-entraînement int8 (TFLite), calibrée sur un
+#      échantillon représentatif de cell_images/ (split de calibration)
+#   2. comparaison accuracy / latence float vs int8 sur le split held-out
+#   3. enregistrement de la variante `<id>_int8` seulement si la perte
+#      d'accuracy reste dans `quantization.max_accuracy_drop`
+#
+# Usage (depuis backend/):
+#   python -m app.ml.quantize --model-id model_3 --register
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from app.ml import dataset
+from app.ml.convert_models import convert_to_tflite, converted_entry
+from app.ml.model_loader import download_model_if_needed, append_model_config, CONFIG_PATH
+from app.ml.runtimes import get_backend, PIXEL_TO_FLOAT
+from app.services.ml_service import MLService
+
+CHUNK_SIZE = 256
+LATENCY_BUCKETS = (1, 32)
+
+
+def representative_dataset(items, ml_service: MLService):
+    """
+    Générateur de calibration : une image par lot, comme attendu par le convertisseur
+
+    La calibration se fait dans le domaine float du modèle d'origine : les
+    pixels sont normalisés ici comme le fait le runner (`PIXEL_TO_FLOAT`), et
+    le convertisseur en déduit la quantification de l'entrée int8.
+    """
+    def generator():
+        for start in range(0, len(items), CHUNK_SIZE):
+            batch, _ = ml_service.preprocess_batch([path for path, _ in items[start:start + CHUNK_SIZE]])
+            for image in batch:
+                yield [PIXEL_TO_FLOAT[image[np.newaxis]]]
+    return generator
+
+
+def evaluate(runners: dict, items, ml_service: MLService) -> dict:
+    """Accuracy de chaque runner sur `items`, par tranches pour limiter la mémoire"""
+    correct = {name: 0 for name in runners}
+    total = 0
+
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = items[start:start + CHUNK_SIZE]
+        batch, errors = ml_service.preprocess_batch([path for path, _ in chunk])
+        labels = np.array([label for index, (_, label) in enumerate(chunk) if index not in errors])
+        total += len(labels)
+
+        for name, runner in runners.items():
+            correct[name] += int(np.sum((runner.predict(batch) > 0.5) == labels))
+
+    return {name: correct[name] / total for name in runners}
+
+
+def quantize_model(model_config: dict, calibration, holdout, ml_service: MLService) -> dict:
+    import tensorflow as tf
+
+    source_path = Path(download_model_if_needed(model_config))
+    output_path = source_path.parent / f"{source_path.stem}_int8.tflite"
+    input_shape = tuple(model_config.get("input_shape", (64, 64, 3)))
+
+    print(f"🔄 {model_config['id']}: quantification int8 ({len(calibration)} images de calibration)")
+    model = tf.keras.models.load_model(source_path)
+    convert_to_tflite(model, output_path, representative_dataset(calibration, ml_service))
+
+    runners = {
+        "float": get_backend("keras")(source_path, input_shape, LATENCY_BUCKETS),
+        "int8": get_backend("tflite")(output_path, input_shape, LATENCY_BUCKETS),
+    }
+    latencies = {name: runner.warmup() for name, runner in runners.items()}
+    accuracies = evaluate(runners, holdout, ml_service)
+
+    return {
+        "model_config": model_config,
+        "output_path": output_path,
+        "accuracy": accuracies,
+        "latency_ms": latencies,
+        "accuracy_drop": accuracies["float"] - accuracies["int8"],
+        "size_mb": {
+            "float": source_path.stat().st_size / (1024 * 1024),
+            "int8": output_path.stat().st_size / (1024 * 1024),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantification int8 des modèles avec contrôle d'accuracy")
+    parser.add_argument("--model-id", action="append", help="Modèle(s) à quantifier (défaut : tous les .keras)")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--max-accuracy-drop", type=float, default=None)
+    parser.add_argument("--calibration-samples", type=int, default=None)
+    parser.add_argument("--evaluation-samples", type=int, default=None)
+    parser.add_argument("--register", action="store_true", help="Enregistrer les variantes acceptées")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    settings = config.get("quantization", {})
+    max_drop = args.max_accuracy_drop if args.max_accuracy_drop is not None else settings.get("max_accuracy_drop", 0.005)
+    n_calibration = args.calibration_samples or settings.get("calibration_samples", 300)
+    n_evaluation = args.evaluation_samples or settings.get("evaluation_samples", 2000)
+
+    calibration, holdout = dataset.split(dataset.list_images())
+    calibration = dataset.sample(calibration, n_calibration)
+    holdout = dataset.sample(holdout, n_evaluation)
+    ml_service = MLService()
+
+    models = [
+        m for m in config["models"]
+        if m["format"] == "keras" and (not args.model_id or m["id"] in args.model_id)
+    ]
+
+    for model_config in models:
+        report = quantize_model(model_config, calibration, holdout, ml_service)
+        accepted = report["accuracy_drop"] <= max_drop
+
+        print(f"   accuracy  float {report['accuracy']['float']:.4f} / int8 {report['accuracy']['int8']:.4f} "
+              f"(perte {report['accuracy_drop'] * 100:+.2f} pts, tolérance {max_drop * 100:.2f})")
+        for bucket in LATENCY_BUCKETS:
+            float_ms = report['latency_ms']['float'][bucket]
+            int8_ms = report['latency_ms']['int8'][bucket]
+            print(f"   batch {bucket:>2}  float {float_ms:.2f} ms / int8 {int8_ms:.2f} ms (x{float_ms / int8_ms:.2f})")
+        print(f"   taille    float {report['size_mb']['float']:.1f} MB / int8 {report['size_mb']['int8']:.1f} MB")
+
+        if not accepted:
+            print(f"   ❌ Variante int8 rejetée : perte d'accuracy hors tolérance")
+            continue
+
+        print(f"   ✅ Variante int8 acceptée")
+        if args.register:
+            entry = converted_entry(model_config, "tflite", report["output_path"], "int8")
+            entry["accuracy"] = round(model_config["accuracy"] - max(report["accuracy_drop"], 0.0), 4)
+            entry["inference_time_ms"] = round(report["latency_ms"]["int8"][1], 2)
+            try:
+                append_model_config(entry, args.config)
+                print(f"   📝 {entry['id']} ajouté à {args.config}")
+            except ValueError as e:
+                print(f"   ⚠️ {e}")
+
+
+if __name__ == "__main__":
+    main()
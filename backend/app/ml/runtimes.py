@@ -0,0 +1,378 @@
+# ========================================
+# RUNTIMES - Backends d'exécution des modèles
+# ========================================
+#
+# Chaque format déclaré dans model_config.yaml (`format: ...`) correspond à un
+# runner enregistré ici. Tous exposent la même interface :
+#
+#   runner = get_backend(format)(path, input_shape, batch_buckets, threads=None)
+#   runner.warmup()          -> latences mesurées par taille de batch (ms)
+#   runner.predict(batch)    -> probabilités (N,)
+#
+# Les entrées sont des pixels uint8 (N, H, W, C) : la normalisation /255 est
+# faite dans le graphe (TensorFlow) ou par table de correspondance juste avant
+# l'appel (TFLite, ONNX), si bien que le serveur ne transporte et ne met en
+# file que des uint8, quatre fois moins volumineux que des float32.
+#
+# Les threads intra-op / inter-op se règlent avec `configure_threads` avant le
+# premier chargement : TensorFlow ne les accepte qu'une fois par processus,
+# TFLite et ONNX Runtime les appliquent à chaque interpréteur / session
+# (`threads`, réglage propre au modèle, prioritaire).
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tailles de batch pour lesquelles chaque runner prépare une exécution dédiée
+DEFAULT_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+WARMUP_RUNS = 5
+
+_BACKENDS = {}
+
+# Pixel uint8 -> entrée float32 du modèle, identique à `pixels.astype(float32) / 255`
+PIXEL_TO_FLOAT = np.arange(256, dtype=np.float32) / np.float32(255.0)
+
+# Threads par défaut des runners (None = choix du runtime)
+_threads = {'intra_op': None, 'inter_op': None}
+_tf_configured = False
+_tf_lock = threading.Lock()
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """Threads intra-op / inter-op des runners créés ensuite"""
+    _threads.update(intra_op=intra_op or None, inter_op=inter_op or None)
+
+
+def _import_tensorflow():
+    """Importe TensorFlow et lui applique les threads configurés (une fois par processus)"""
+    global _tf_configured
+    import tensorflow as tf
+
+    with _tf_lock:
+        if not _tf_configured:
+            _tf_configured = True
+            try:
+                if _threads['intra_op']:
+                    tf.config.threading.set_intra_op_parallelism_threads(_threads['intra_op'])
+                if _threads['inter_op']:
+                    tf.config.threading.set_inter_op_parallelism_threads(_threads['inter_op'])
+            except RuntimeError as e:
+                # Contexte TensorFlow déjà initialisé (par un autre module du processus)
+                logger.warning(f"⚠️ Threads TensorFlow non appliqués: {e}")
+    return tf
+
+
+def as_pixels(batch):
+    """
+    Lot en pixels uint8
+
+    Un tenseur déjà normalisé dans [0, 1] (ancien format d'entrée) est
+    reconverti exactement s'il provient de pixels 8 bits.
+    """
+    batch = np.asarray(batch)
+    if batch.dtype == np.uint8:
+        return batch
+    return np.rint(np.clip(batch, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+
+def pixel_table(dtype, quantization=(0.0, 0)):
+    """
+    Table pixel uint8 -> entrée du modèle : PIXEL_TO_FLOAT, quantifiée en
+    round(x / scale + zero_point) pour une entrée entière
+    """
+    if np.dtype(dtype) == np.float32:
+        return PIXEL_TO_FLOAT
+    scale, zero_point = quantization
+    info = np.iinfo(dtype)
+    return np.clip(np.round(PIXEL_TO_FLOAT / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def dequantize(output, quantization=(0.0, 0)):
+    """Sortie entière -> float : (q - zero_point) * scale"""
+    output = np.asarray(output)
+    if output.dtype == np.float32:
+        return output
+    scale, zero_point = quantization
+    return (output.astype(np.float32) - zero_point) * np.float32(scale)
+
+
+def register_backend(name):
+    """Décorateur : enregistre un runner pour `format: <name>`"""
+    def decorator(cls):
+        _BACKENDS[name] = cls
+        cls.format = name
+        return cls
+    return decorator
+
+
+def get_backend(name):
+    if name not in _BACKENDS:
+        raise ValueError(f"Format inconnu : {name} (disponibles : {', '.join(sorted(_BACKENDS))})")
+    return _BACKENDS[name]
+
+
+def available_backends():
+    return sorted(_BACKENDS)
+
+
+class BucketedRunner:
+    """
+    Base des runners : un lot de N images est complété jusqu'au plus petit
+    bucket >= N (ou découpé au plus grand), pour n'exécuter que des formes
+    préparées à l'avance
+    """
+
+    format = None
+
+    def __init__(self, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS):
+        self.input_shape = tuple(input_shape)
+        self.batch_buckets = sorted(set(int(b) for b in batch_buckets))
+        self.latency_ms = {}
+        self.memory_bytes = 0  # Estimation de la mémoire résidente (poids)
+
+    def _run(self, bucket, batch):
+        """Exécute un lot de taille exactement `bucket` et retourne sa sortie"""
+        raise NotImplementedError
+
+    def _bucket_for(self, n):
+        for bucket in self.batch_buckets:
+            if bucket >= n:
+                return bucket
+        return self.batch_buckets[-1]
+
+    def _run_bucket(self, batch):
+        n = len(batch)
+        bucket = self._bucket_for(n)
+        if n < bucket:
+            padding = np.zeros((bucket - n,) + self.input_shape, dtype=np.uint8)
+            batch = np.concatenate([batch, padding])
+        output = self._run(bucket, batch)
+        return np.asarray(output).reshape(-1)[:n]
+
+    def predict(self, batch):
+        """Retourne les probabilités (N,) pour un lot de pixels (N, H, W, C)"""
+        batch = as_pixels(batch)
+        largest = self.batch_buckets[-1]
+
+        if len(batch) <= largest:
+            return self._run_bucket(batch)
+
+        return np.concatenate([
+            self._run_bucket(batch[start:start + largest])
+            for start in range(0, len(batch), largest)
+        ])
+
+    def warmup(self, runs=WARMUP_RUNS):
+        """Exécute chaque bucket pour initialiser les kernels et mesure sa latence (ms)"""
+        for bucket in self.batch_buckets:
+            batch = np.zeros((bucket,) + self.input_shape, dtype=np.uint8)
+            self._run_bucket(batch)
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                self._run_bucket(batch)
+            self.latency_ms[bucket] = (time.perf_counter() - start) * 1000 / runs
+
+        return self.latency_ms
+
+
+def _variables_nbytes(variables):
+    return sum(int(np.prod(v.shape)) * v.dtype.size for v in variables)
+
+
+class CompiledModel(BucketedRunner):
+    """
+    Modèle TensorFlow enveloppé dans des fonctions tracées à signature fixe
+
+    Une fonction concrète est tracée par bucket, ce qui évite le coût de
+    `model.predict` (data adapter, callbacks) et tout re-tracing en régime établi.
+    Elle prend des pixels uint8 et normalise dans le graphe.
+    """
+
+    def __init__(self, call_fn, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS):
+        tf = _import_tensorflow()
+
+        super().__init__(input_shape, batch_buckets)
+        self._tf = tf
+
+        def call_pixels(x):
+            return call_fn(tf.cast(x, tf.float32) / 255.0)
+
+        self._call_fn = call_pixels
+        traced = tf.function(call_pixels)
+        self._functions = {
+            bucket: traced.get_concrete_function(
+                tf.TensorSpec((bucket,) + self.input_shape, tf.uint8)
+            )
+            for bucket in self.batch_buckets
+        }
+
+    def _run(self, bucket, batch):
+        return self._functions[bucket](self._tf.constant(batch, dtype=self._tf.uint8)).numpy()
+
+    def _weights(self):
+        """Variables du modèle (sauvegardées avec les fonctions par `export`)"""
+        raise NotImplementedError
+
+    def export(self, path):
+        """
+        Sauvegarde une fonction déjà tracée par bucket dans un SavedModel
+
+        Rechargé par `PrecompiledRunner`, ce dossier évite la désérialisation
+        Keras et le traçage des fonctions aux démarrages suivants.
+        """
+        tf = self._tf
+        module = tf.Module()
+        module.weights = list(self._weights())
+        for bucket in self.batch_buckets:
+            setattr(module, f"bucket_{bucket}", tf.function(
+                self._call_fn,
+                input_signature=[tf.TensorSpec((bucket,) + self.input_shape, tf.uint8)]
+            ))
+        tf.saved_model.save(module, str(path))
+
+    @staticmethod
+    def runtime_version():
+        return f"tf{_import_tensorflow().__version__}"
+
+
+@register_backend("keras")
+class KerasRunner(CompiledModel):
+    """Fichier .keras / .h5 chargé avec tf.keras"""
+
+    def __init__(self, path, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS, threads=None):
+        tf = _import_tensorflow()
+
+        self.model = tf.keras.models.load_model(path)
+        super().__init__(lambda x: self.model(x, training=False), input_shape, batch_buckets)
+        self.memory_bytes = _variables_nbytes(self.model.weights)
+
+    def _weights(self):
+        return self.model.weights
+
+
+@register_backend("saved_model")
+class SavedModelRunner(CompiledModel):
+    """Dossier SavedModel, via sa signature `serving_default`"""
+
+    def __init__(self, path, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS, threads=None):
+        tf = _import_tensorflow()
+
+        self.loaded = tf.saved_model.load(path)
+        signature = self.loaded.signatures["serving_default"]
+
+        def call(x):
+            outputs = signature(x)
+            return next(iter(outputs.values()))
+
+        super().__init__(call, input_shape, batch_buckets)
+        self.memory_bytes = _variables_nbytes(self.loaded.variables)
+
+    def _weights(self):
+        return self.loaded.variables
+
+
+class PrecompiledRunner(CompiledModel):
+    """
+    SavedModel produit par `CompiledModel.export` (cache de compilation)
+
+    Les fonctions par bucket sont restaurées déjà tracées : ni modèle Keras
+    à reconstruire, ni traçage au chargement. Non exposé comme `format` : le
+    chargeur l'utilise à la place du runner d'origine quand le cache existe.
+    """
+
+    def __init__(self, path, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS, threads=None):
+        tf = _import_tensorflow()
+
+        BucketedRunner.__init__(self, input_shape, batch_buckets)
+        self._tf = tf
+        self.loaded = tf.saved_model.load(str(path))
+        self._functions = {bucket: getattr(self.loaded, f"bucket_{bucket}") for bucket in self.batch_buckets}
+        self.memory_bytes = _variables_nbytes(self.loaded.weights)
+
+
+@register_backend("tflite")
+class TFLiteRunner(BucketedRunner):
+    """
+    Modèle TensorFlow Lite (float ou quantifié int8)
+
+    Utilise `tflite_runtime` s'il est installé (sans TensorFlow complet), sinon
+    `tf.lite`. Un interpréteur par bucket, dimensionné une fois pour toutes.
+    """
+
+    def __init__(self, path, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS, threads=None):
+        super().__init__(input_shape, batch_buckets)
+
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = _import_tensorflow().lite.Interpreter
+
+        num_threads = (threads or {}).get('intra_op') or _threads['intra_op'] or os.cpu_count()
+        self._interpreters = {}
+        self._inputs = {}
+        for bucket in self.batch_buckets:
+            interpreter = Interpreter(model_path=str(path), num_threads=num_threads)
+            input_index = interpreter.get_input_details()[0]['index']
+            interpreter.resize_tensor_input(input_index, (bucket,) + self.input_shape)
+            interpreter.allocate_tensors()
+            self._interpreters[bucket] = interpreter
+            # Entrée du modèle, remplie en place à chaque appel
+            self._inputs[bucket] = np.empty(
+                (bucket,) + self.input_shape, dtype=interpreter.get_input_details()[0]['dtype']
+            )
+
+        # Pixel -> valeur d'entrée (quantifiée pour un modèle int8)
+        input_details = self._interpreters[self.batch_buckets[0]].get_input_details()[0]
+        self._pixel_table = pixel_table(input_details['dtype'], input_details['quantization'])
+
+        # Un interpréteur TFLite n'est pas thread-safe
+        self._lock = threading.Lock()
+        self.memory_bytes = os.path.getsize(path)
+
+    def _run(self, bucket, batch):
+        interpreter = self._interpreters[bucket]
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+
+        with self._lock:
+            inputs = self._inputs[bucket]
+            np.take(self._pixel_table, batch, out=inputs)
+            interpreter.set_tensor(input_details['index'], inputs)
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details['index'])
+
+        return dequantize(output, output_details['quantization'])
+
+
+@register_backend("onnx")
+class OnnxRunner(BucketedRunner):
+    """Modèle ONNX exécuté par ONNX Runtime (CPU)"""
+
+    def __init__(self, path, input_shape, batch_buckets=DEFAULT_BATCH_BUCKETS, threads=None):
+        import onnxruntime as ort
+
+        super().__init__(input_shape, batch_buckets)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        intra_op = (threads or {}).get('intra_op') or _threads['intra_op']
+        inter_op = (threads or {}).get('inter_op') or _threads['inter_op']
+        if intra_op:
+            options.intra_op_num_threads = intra_op
+        if inter_op:
+            options.inter_op_num_threads = inter_op
+        self.session = ort.InferenceSession(
+            str(path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+        self.memory_bytes = os.path.getsize(path)
+
+    def _run(self, bucket, batch):
+        # Session réentrante : pas de buffer d'entrée partagé entre les appels
+        return self.session.run(None, {self._input_name: PIXEL_TO_FLOAT[batch]})[0]
@@ -0,0 +1,223 @@
+# ========================================
+# SHADOW - Évaluation en arrière-plan d'un modèle candidat
+# ========================================
+#
+# Une fraction des requêtes d'un modèle principal est rejouée sur son modèle
+# candidat (bloc `shadow` de model_config.yaml), hors du chemin de la
+# requête : la réponse est rendue dès que le modèle principal a répondu, le
+# candidat est exécuté plus tard par un thread de basse priorité. La file est
+# bornée : quand elle est pleine, le travail est abandonné (et compté) plutôt
+# que de ralentir l'inférence principale. De même pour un lot que
+# `forward_fn` refuse (ShadowSkipped) : ressources occupées par le trafic
+# principal, candidat qui ne tient pas en mémoire.
+#
+# Sont enregistrés par couple principal -> candidat : accord des décisions,
+# écarts de probabilité et de confiance, latences des deux côtés et derniers
+# désaccords.
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from queue import Queue, Empty, Full
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+LATENCY_WINDOW = 1000  # Latences gardées par couple pour les percentiles
+RECENT_DISAGREEMENTS = 20
+SHADOW_NICE = 10  # Priorité ajoutée au thread (Linux : priorité par thread)
+
+
+class ShadowSkipped(Exception):
+    """Lot abandonné par `forward_fn` plutôt que de gêner l'inférence principale"""
+
+
+class ShadowScorer:
+    """
+    File bornée de lots à rejouer sur les modèles candidats
+
+    `forward_fn(model_id, images)` retourne les probabilités (N,) du modèle,
+    ou lève ShadowSkipped (lot compté comme abandonné) ; il n'est appelé que
+    depuis le thread de l'évaluateur.
+    """
+
+    def __init__(self, forward_fn: Callable[[str, np.ndarray], np.ndarray],
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.forward_fn = forward_fn
+        self._queue: Queue = Queue(maxsize=max(1, queue_size))
+        self._stats: Dict[str, Dict] = {}
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._closed = False
+
+    def maybe_submit(self,
+                     primary_id: str,
+                     shadow_config: Optional[Dict],
+                     images: np.ndarray,
+                     primary_probas: np.ndarray,
+                     primary_latency_ms: float) -> bool:
+        """
+        Met le lot en file pour le candidat avec la probabilité `sample_rate`
+
+        Ne bloque jamais : file pleine => lot abandonné. Retourne True si le
+        lot a été mis en file.
+        """
+        if not shadow_config or self._closed:
+            return False
+        candidate_id = shadow_config.get('model_id')
+        if not candidate_id or candidate_id == primary_id:
+            return False
+        if random.random() >= shadow_config.get('sample_rate', 0.0):
+            return False
+
+        stats = self._pair_stats(primary_id, candidate_id)
+        try:
+            # Copie : le tenseur de l'appelant retourne dans le pool de prétraitement après la réponse
+            self._queue.put_nowait((primary_id, candidate_id, images.copy(),
+                                    np.asarray(primary_probas).reshape(-1), primary_latency_ms))
+        except Full:
+            with self._stats_lock:
+                stats['dropped'] += 1
+            return False
+
+        with self._stats_lock:
+            stats['queued'] += 1
+        self._ensure_thread()
+        return True
+
+    def _pair_stats(self, primary_id: str, candidate_id: str) -> Dict:
+        key = f"{primary_id}->{candidate_id}"
+        with self._stats_lock:
+            if key not in self._stats:
+                self._stats[key] = {
+                    'primary': primary_id,
+                    'candidate': candidate_id,
+                    'queued': 0,
+                    'dropped': 0,
+                    'errors': 0,
+                    'requests': 0,
+                    'images': 0,
+                    'agreements': 0,
+                    'sum_abs_proba_diff': 0.0,
+                    'sum_confidence_diff': 0.0,
+                    'primary_latency_ms': deque(maxlen=LATENCY_WINDOW),
+                    'shadow_latency_ms': deque(maxlen=LATENCY_WINDOW),
+                    'disagreements': deque(maxlen=RECENT_DISAGREEMENTS),
+                }
+            return self._stats[key]
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # Basse priorité : sous Linux, setpriority sur le tid ne concerne que ce thread
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SHADOW_NICE)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            primary_id, candidate_id, images, primary_probas, primary_latency_ms = item
+            stats = self._pair_stats(primary_id, candidate_id)
+
+            try:
+                start = time.perf_counter()
+                shadow_probas = np.asarray(self.forward_fn(candidate_id, images)).reshape(-1)
+                shadow_latency_ms = (time.perf_counter() - start) * 1000
+            except ShadowSkipped as e:
+                logger.debug(f"Shadow {candidate_id} (pour {primary_id}) abandonné: {e}")
+                with self._stats_lock:
+                    stats['dropped'] += 1
+                continue
+            except Exception as e:
+                logger.warning(f"⚠️ Shadow {candidate_id} (pour {primary_id}) en échec: {e}")
+                with self._stats_lock:
+                    stats['errors'] += 1
+                continue
+
+            self._record(stats, primary_probas, shadow_probas, primary_latency_ms, shadow_latency_ms)
+
+    def _record(self, stats: Dict, primary: np.ndarray, shadow: np.ndarray,
+                primary_latency_ms: float, shadow_latency_ms: float):
+        primary_decision = primary > 0.5
+        shadow_decision = shadow > 0.5
+        primary_confidence = np.where(primary_decision, primary, 1 - primary)
+        shadow_confidence = np.where(shadow_decision, shadow, 1 - shadow)
+        agree = primary_decision == shadow_decision
+
+        with self._stats_lock:
+            stats['requests'] += 1
+            stats['images'] += len(primary)
+            stats['agreements'] += int(agree.sum())
+            stats['sum_abs_proba_diff'] += float(np.abs(shadow - primary).sum())
+            stats['sum_confidence_diff'] += float((shadow_confidence - primary_confidence).sum())
+            stats['primary_latency_ms'].append(primary_latency_ms)
+            stats['shadow_latency_ms'].append(shadow_latency_ms)
+            for index in np.flatnonzero(~agree):
+                stats['disagreements'].append({
+                    'timestamp': time.time(),
+                    'primary_probability': round(float(primary[index]), 4),
+                    'shadow_probability': round(float(shadow[index]), 4),
+                })
+
+    def stats(self) -> Dict:
+        """Compteurs et écarts agrégés par couple principal -> candidat"""
+        def percentile(values, q):
+            return round(float(np.percentile(values, q)), 2) if values else None
+
+        report = {'queue_size': self._queue.maxsize, 'pending': self._queue.qsize(), 'pairs': {}}
+        with self._stats_lock:
+            for key, s in self._stats.items():
+                images = s['images']
+                primary_latency = list(s['primary_latency_ms'])
+                shadow_latency = list(s['shadow_latency_ms'])
+                report['pairs'][key] = {
+                    'primary': s['primary'],
+                    'candidate': s['candidate'],
+                    'queued': s['queued'],
+                    'dropped': s['dropped'],
+                    'errors': s['errors'],
+                    'requests_scored': s['requests'],
+                    'images_scored': images,
+                    'agreement_rate': round(s['agreements'] / images, 4) if images else None,
+                    'mean_abs_probability_diff': round(s['sum_abs_proba_diff'] / images, 4) if images else None,
+                    # > 0 : le candidat est en moyenne plus confiant que le modèle principal
+                    'mean_confidence_diff': round(s['sum_confidence_diff'] / images, 4) if images else None,
+                    'primary_latency_ms': {'p50': percentile(primary_latency, 50),
+                                           'p99': percentile(primary_latency, 99)},
+                    'shadow_latency_ms': {'p50': percentile(shadow_latency, 50),
+                                          'p99': percentile(shadow_latency, 99)},
+                    'recent_disagreements': list(s['disagreements']),
+                }
+        return report
+
+    def close(self):
+        """Arrête le thread ; les lots encore en file sont abandonnés"""
+        self._closed = True
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                break
+        try:
+            self._queue.put_nowait(None)
+        except Full:
+            pass
+        self._thread.join(timeout=5)
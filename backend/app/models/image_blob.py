@@ -0,0 +1,29 @@
+# ========================================
+# DATABASE MODELS - Image Blob
+# ========================================
+
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from app.db.session import Base
+
+
+class ImageBlob(Base):
+    """Stored image file, shared by every prediction made on identical bytes"""
+    __tablename__ = "image_blobs"
+
+    # SHA-256 of the raw bytes (content address)
+    sha256 = Column(String(64), primary_key=True)
+
+    # Sharded location under UPLOAD_DIR (what Prediction.image_path points to)
+    path = Column(String(500), nullable=False, unique=True, index=True)
+    size = Column(Integer, nullable=False)  # in bytes
+
+    # Number of predictions referencing the blob (file removed at 0)
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ImageBlob {self.sha256[:12]} ({self.ref_count} refs)>"
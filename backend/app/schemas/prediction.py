@@ -20,6 +20,8 @@ class PredictionResult(BaseModel):
     probability_uninfected: float
     inference_time_ms: Optional[float] = None
     accuracy: Optional[float] = None
+    stages_run: Optional[List[str]] = None  # Cascade mode only
+    cached: Optional[bool] = None  # Served from the prediction cache
 
 
 class PredictionResponse(BaseModel):
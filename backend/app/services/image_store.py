@@ -0,0 +1,245 @@
+# ========================================
+# IMAGE STORE
+# ========================================
+#
+# Content-addressed image storage. Each image is written once, under
+#   UPLOAD_DIR/<sha256[0:2]>/<sha256[2:4]>/<sha256>.<ext>
+# so no directory holds more than a few thousand files, and identical
+# re-uploads share the same file. The `image_blobs` table counts the
+# predictions referencing each file; it is removed with the last one.
+
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.image_blob import ImageBlob
+
+SHARD_WIDTH = 2  # Hex characters per directory level
+SHARD_DEPTH = 2  # 256 x 256 directories
+INCOMING_DIR = ".incoming"  # Uploads being streamed (same filesystem: atomic rename)
+
+# Magic numbers -> extension (the extension must not depend on the client filename)
+SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpg",
+}
+
+
+def sniff_extension(head: bytes) -> str:
+    """File extension from the first bytes of an image"""
+    for signature, ext in SIGNATURES.items():
+        if head.startswith(signature):
+            return ext
+    return "bin"
+
+
+class ImageStore:
+    """Sharded, deduplicated image files under UPLOAD_DIR"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.UPLOAD_DIR)
+
+    def path_for(self, sha256: str, ext: str) -> str:
+        """Sharded path of a blob"""
+        shards = [sha256[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+        return str(self.root.joinpath(*shards, f"{sha256}.{ext}"))
+
+    def is_blob_path(self, path: str) -> bool:
+        """Does `path` follow the sharded layout (as opposed to a legacy flat upload)?"""
+        try:
+            relative = Path(path).relative_to(self.root)
+        except ValueError:
+            return False
+        return len(relative.parts) == SHARD_DEPTH + 1 and not relative.parts[0].startswith(".")
+
+    def incoming_path(self) -> str:
+        """Temporary path for an upload whose hash is not known yet"""
+        incoming = self.root / INCOMING_DIR
+        incoming.mkdir(parents=True, exist_ok=True)
+        return str(incoming / f"{uuid.uuid4()}.part")
+
+    def put_bytes(self, contents: bytes, sha256: str) -> str:
+        """Store `contents` (SHA-256 `sha256`) unless already present; returns the blob path"""
+        path = self.path_for(sha256, sniff_extension(bytes(contents[:8])))
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        part_path = self.incoming_path()
+        try:
+            with open(part_path, 'wb') as f:
+                f.write(contents)
+            self._publish(part_path, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return path
+
+    def put_file(self, part_path: str, sha256: str, keep: bool = False) -> str:
+        """
+        Move a fully written file into the store (dropped if the blob exists); returns the blob path
+
+        With `keep`, `part_path` is left in place as a private copy of the
+        bytes (a hard link when possible), for `ensure_blob`; the caller
+        removes it.
+        """
+        with open(part_path, 'rb') as f:
+            path = self.path_for(sha256, sniff_extension(f.read(8)))
+
+        if os.path.exists(path):
+            if not keep:
+                os.remove(part_path)
+            self._touch(path)
+        else:
+            self._publish(self.link_copy(part_path) if keep else part_path, path)
+        return path
+
+    def link_copy(self, path: str) -> str:
+        """New incoming name for the bytes of `path`: hard link, or copy across filesystems"""
+        part_path = self.incoming_path()
+        try:
+            os.link(path, part_path)
+        except OSError:
+            shutil.copyfile(path, part_path)
+        return part_path
+
+    @staticmethod
+    def _touch(path: str):
+        # Reused blob: fresh mtime, so the orphan pruning grace period covers it
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _publish(part_path: str, path: str):
+        # Rename within the same filesystem: readers never see a partial blob,
+        # and concurrent writers of the same bytes simply replace each other
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(part_path, path)
+
+    def remove(self, path: str) -> bool:
+        """Delete a blob file (missing files are ignored)"""
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+image_store = ImageStore()
+
+
+def lock_key(path: str) -> int:
+    """Postgres advisory lock key (signed 64-bit) of a blob path, the same in every process"""
+    return int.from_bytes(hashlib.sha256(path.encode()).digest()[:8], 'big', signed=True)
+
+
+async def _lock_paths(db: AsyncSession, paths: Iterable[str]) -> None:
+    # Held until the caller's transaction ends; a fixed order avoids deadlocks
+    for path in sorted(paths):
+        await db.execute(select(func.pg_advisory_xact_lock(lock_key(path))))
+
+
+async def add_references(db: AsyncSession, blobs: Dict[str, tuple]) -> None:
+    """
+    Count new predictions referencing blobs, in the caller's transaction
+
+    Each blob path stays locked until the caller commits, so
+    `discard_unreferenced` either sees the new references or has removed
+    the file before them (which `ensure_blob` then repairs).
+
+    Args:
+        db: Session that will also insert the predictions
+        blobs: {sha256: (path, size, number of new references)}
+    """
+    await _lock_paths(db, [path for path, _, _ in blobs.values()])
+    for sha256, (path, size, count) in sorted(blobs.items()):
+        # Upsert: the row lock serializes with `release_reference` on the same blob
+        statement = pg_insert(ImageBlob).values(sha256=sha256, path=path, size=size, ref_count=count)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[ImageBlob.sha256],
+            set_={"ref_count": ImageBlob.ref_count + count}
+        ))
+
+
+async def release_reference(db: AsyncSession, image_path: str) -> Optional[str]:
+    """
+    Drop one prediction's reference to its image, in the caller's transaction
+
+    The file itself is left alone: a rolled-back delete must keep it.
+
+    Returns:
+        Path to pass to `discard_unreferenced` once the transaction is
+        committed, when no other prediction uses the image; None otherwise
+    """
+    blob = (await db.execute(
+        select(ImageBlob).where(ImageBlob.path == image_path).with_for_update()
+    )).scalar_one_or_none()
+
+    if blob is None:
+        # Legacy flat upload (not migrated): the file belongs to this prediction only
+        return image_path
+
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        await db.delete(blob)
+        return blob.path
+    return None
+
+
+async def discard_unreferenced(db: AsyncSession, paths: Iterable[str]) -> None:
+    """
+    Delete stored uploads that no blob row references
+    
+    For files written by a request whose predictions were not saved
+    (inference or database failure, undecodable image), and for images
+    released by a committed delete. Blobs shared with existing predictions
+    are kept. The paths stay locked against `add_references` until the
+    caller's transaction ends.
+    """
+    paths = set(paths)
+    if not paths:
+        return
+    await _lock_paths(db, paths)
+    referenced = set((await db.execute(
+        select(ImageBlob.path).where(ImageBlob.path.in_(paths))
+    )).scalars())
+    for path in paths - referenced:
+        await asyncio.to_thread(image_store.remove, path)
+
+
+def ensure_blob(
+    path: str,
+    contents: Optional[bytes] = None,
+    sha256: Optional[str] = None,
+    copy_path: Optional[str] = None
+) -> None:
+    """
+    Check a referenced blob is on disk, after `add_references`
+
+    Its file can only be missing if `discard_unreferenced` removed it just
+    before the references were locked (last other prediction deleted, or a
+    failed request with the same bytes): it is rewritten from `contents`, or
+    from `copy_path` (see `ImageStore.put_file(keep=True)`).
+
+    Raises:
+        FileNotFoundError: If the file is missing and cannot be rewritten
+    """
+    if os.path.exists(path):
+        return
+    if contents is not None:
+        image_store.put_bytes(contents, sha256)
+    elif copy_path is not None:
+        image_store.put_file(image_store.link_copy(copy_path), sha256)
+    else:
+        raise FileNotFoundError(f"Image blob removed concurrently: {path}")
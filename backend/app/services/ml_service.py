@@ -2,73 +2,264 @@
 # ML SERVICE
 # ========================================
 
-import cv2
+import io
+import math
+import threading
 import numpy as np
-from PIL import Image
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Tuple
 
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Scales supported by libjpeg's DCT scaling (OpenCV IMREAD_REDUCED_COLOR_<n>)
+REDUCTION_FACTORS = (8, 4, 2)
+
+
+def jpeg_size(stream: BinaryIO) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from the JPEG frame header, None if not a JPEG
+    
+    Only marker segments are read; the stream is left at an arbitrary position.
+    """
+    if stream.read(2) != b"\xff\xd8":
+        return None
+    
+    while True:
+        byte = stream.read(1)
+        while byte and byte != b"\xff":
+            byte = stream.read(1)
+        while byte == b"\xff":
+            byte = stream.read(1)
+        if not byte:
+            return None
+        
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue  # Markers without a length
+        if marker in (0xD9, 0xDA):
+            return None  # End of image / start of scan before any frame header
+        
+        length = stream.read(2)
+        if len(length) < 2:
+            return None
+        
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            header = stream.read(5)
+            if len(header) < 5:
+                return None
+            return int.from_bytes(header[3:5], "big"), int.from_bytes(header[1:3], "big")
+        
+        stream.seek(int.from_bytes(length, "big") - 2, io.SEEK_CUR)
+
+
+class TensorPool:
+    """
+    Reusable uint8 model input tensors
+    
+    Blocks hold a power-of-two number of images, so a handful of blocks
+    serves every batch size. `acquire` returns a view of a free block,
+    `release` hands it back once nothing reads it anymore; tensors that are
+    never released are simply garbage collected.
+    """
+    
+    def __init__(self, max_free: int = 4):
+        self.max_free = max_free  # Idle blocks kept per (capacity, image shape)
+        self._free: Dict[Tuple, List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, n: int, image_shape: Tuple[int, int, int]) -> np.ndarray:
+        """Uninitialized (n, H, W, C) uint8 tensor"""
+        capacity = 1 << max(0, n - 1).bit_length()
+        with self._lock:
+            free = self._free.get((capacity, image_shape))
+            block = free.pop() if free else None
+        if block is None:
+            block = np.empty((capacity,) + image_shape, dtype=np.uint8)
+        return block[:n]
+    
+    def release(self, tensor: np.ndarray):
+        """Return a tensor from `acquire` to the pool (other arrays are ignored)"""
+        block = tensor.base if isinstance(tensor.base, np.ndarray) else tensor
+        capacity = len(block)
+        if (block.dtype != np.uint8 or block.ndim != 4 or not block.flags.owndata
+                or capacity & (capacity - 1)):
+            return
+        key = (capacity, block.shape[1:])
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_free and not any(b is block for b in free):
+                free.append(block)
+
+
+# Shared by every MLService instance (one per request)
+tensor_pool = TensorPool()
+
 
 class MLService:
-    """Service for ML-related operations"""
+    """
+    Service for ML-related operations
+    
+    Every entry point goes through the same engine: decode, resize straight
+    into a row of a pooled uint8 tensor, swap channels in place. Pixels stay
+    uint8 up to the model, whose runner normalizes them (/255 inside the
+    TensorFlow graph), so there is no float allocation per request. Large
+    JPEGs are decoded at the DCT scale given by `reduction_factor` on both
+    the OpenCV and PIL paths, which therefore give identical tensors for
+    identical files (tests/test_ml_service.py).
+    """
     
     def __init__(self):
         self.img_size = settings.IMAGE_SIZE
+        self.image_shape = (self.img_size, self.img_size, 3)
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def preprocess_image(self, image_path: str, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Preprocess image for model prediction
         
         Args:
             image_path: Path to image file
+            out: (1, 64, 64, 3) uint8 tensor to fill (default: from the pool)
         
         Returns:
-            Preprocessed image array (1, 64, 64, 3)
+            Preprocessed image array (1, 64, 64, 3) of uint8 RGB pixels
         """
-        # Read image
-        image = cv2.imread(image_path)
+        # OpenCV is imported on first use (not at API startup)
+        import cv2
+        
+        # Read image (at reduced scale for large JPEGs)
+        with open(image_path, 'rb') as f:
+            flags = self._decode_flags(f)
+        image = cv2.imread(image_path, flags)
         
         if image is None:
             raise ValueError(f"Could not read image: {image_path}")
         
-        # Resize
-        image = cv2.resize(image, (self.img_size, self.img_size))
+        return self._to_tensor(image, out)
+    
+    def preprocess_bytes(self, data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Preprocess an encoded image (upload bytes) without going through disk
+        
+        Args:
+            data: Encoded image (PNG, JPEG...)
+            out: (1, 64, 64, 3) uint8 tensor to fill (default: from the pool)
         
-        # Convert BGR to RGB
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        Returns:
+            Preprocessed image array (1, 64, 64, 3) of uint8 RGB pixels
+        """
+        import cv2
         
-        # Normalize
-        image = image.astype('float32') / 255.0
+        # Decode straight from the upload buffer (no copy of the bytes)
+        flags = self._decode_flags(io.BytesIO(data))
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
         
-        # Add batch dimension
-        image = np.expand_dims(image, axis=0)
+        if image is None:
+            raise ValueError("Could not decode image")
         
-        return image
+        return self._to_tensor(image, out)
+    
+    def reduction_factor(self, width: int, height: int) -> int:
+        """Largest DCT scaling that still decodes at least IMAGE_SIZE pixels per side"""
+        for factor in REDUCTION_FACTORS:
+            if math.ceil(min(width, height) / factor) >= self.img_size:
+                return factor
+        return 1
     
-    def preprocess_pil_image(self, pil_image: Image.Image) -> np.ndarray:
+    def _decode_flags(self, header: BinaryIO) -> int:
+        """
+        OpenCV read flags for an image, from its first bytes
+        
+        Only JPEG gets a reduced read: libjpeg scales in the DCT domain, so
+        decode time and memory drop with the square of the factor. Other
+        formats would be fully decoded then shrunk by OpenCV.
+        """
+        import cv2
+        
+        if not settings.IMAGE_REDUCED_DECODE:
+            return cv2.IMREAD_COLOR
+        
+        size = jpeg_size(header)
+        factor = self.reduction_factor(*size) if size else 1
+        if factor == 1:
+            return cv2.IMREAD_COLOR
+        return getattr(cv2, f"IMREAD_REDUCED_COLOR_{factor}")
+    
+    def _to_tensor(self, image: np.ndarray, out: Optional[np.ndarray] = None, bgr: bool = True) -> np.ndarray:
+        """
+        Decoded image -> (1, 64, 64, 3) uint8 RGB tensor
+        
+        The resize writes directly into `out` and the channel swap is done in
+        place: nothing is allocated besides the decoded image.
+        """
+        import cv2
+        
+        if out is None:
+            out = tensor_pool.acquire(1, self.image_shape)
+        
+        # Resize into the tensor row
+        cv2.resize(image, (self.img_size, self.img_size), dst=out[0], interpolation=cv2.INTER_LINEAR)
+        
+        # Convert BGR to RGB (in place)
+        if bgr:
+            cv2.cvtColor(out[0], cv2.COLOR_BGR2RGB, dst=out[0])
+        
+        return out
+    
+    def preprocess_batch(self, image_paths: List[str]) -> Tuple[np.ndarray, Dict[int, str]]:
+        """
+        Preprocess several images into a single batch tensor
+        
+        Args:
+            image_paths: Paths to image files
+        
+        Returns:
+            Tuple of (batch array (N, 64, 64, 3) of uint8 RGB pixels for the
+            readable images, in order, {index in image_paths: error message}
+            for the others)
+        """
+        batch = tensor_pool.acquire(len(image_paths), self.image_shape)
+        errors = {}
+        count = 0
+        
+        for index, image_path in enumerate(image_paths):
+            try:
+                # Decoded straight into its row of the batch tensor
+                self.preprocess_image(image_path, out=batch[count:count + 1])
+                count += 1
+            except Exception as e:
+                errors[index] = str(e)
+        
+        return batch[:count], errors
+    
+    def preprocess_pil_image(self, pil_image: "Image.Image", out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Preprocess PIL Image for model prediction
         
         Args:
             pil_image: PIL Image object
+            out: (1, 64, 64, 3) uint8 tensor to fill (default: from the pool)
         
         Returns:
-            Preprocessed image array (1, 64, 64, 3)
+            Preprocessed image array (1, 64, 64, 3) of uint8 RGB pixels
         """
+        # JPEG not loaded yet: decode at the same DCT scale as the OpenCV path
+        if settings.IMAGE_REDUCED_DECODE:
+            factor = self.reduction_factor(*pil_image.size)
+            if factor > 1:
+                # draft() keeps the largest scale s with size // request >= s: this is `factor`
+                width, height = pil_image.size
+                pil_image.draft('RGB', (width // factor, height // factor))
+        
         # Convert to RGB if needed
         if pil_image.mode != 'RGB':
             pil_image = pil_image.convert('RGB')
         
-        # Resize
-        pil_image = pil_image.resize((self.img_size, self.img_size))
-        
-        # Convert to numpy array
-        image = np.array(pil_image)
-        
-        # Normalize
-        image = image.astype('float32') / 255.0
-        
-        # Add batch dimension
-        image = np.expand_dims(image, axis=0)
-        
-        return image
\ No newline at end of file
+        # Same resize as the OpenCV path, channels already in RGB order
+        return self._to_tensor(np.asarray(pil_image), out, bgr=False)
+    
+    def release(self, tensor: np.ndarray):
+        """Return a preprocessed tensor to the pool once inference is done with it"""
+        tensor_pool.release(tensor)
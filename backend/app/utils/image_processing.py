@@ -3,16 +3,17 @@
 # ========================================
 
 from fastapi import UploadFile, HTTPException
-from pathlib import Path
-import uuid
+import asyncio
+import hashlib
 import os
 
 from app.core.config import settings
+from app.services.image_store import image_store
 
 
 async def validate_image(file: UploadFile) -> None:
     """
-    Validate uploaded image file
+    Validate uploaded image file name and type
     
     Args:
         file: Uploaded file
@@ -35,51 +36,141 @@ async def validate_image(file: UploadFile) -> None:
             f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
         )
     
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()  # Get position (size)
-    file.file.seek(0)  # Reset to start
+    # Size limits are enforced while the upload is streamed (read_upload_file,
+    # save_upload_file): the spooled file is never scanned just to measure it
+
+
+class UploadTooLarge(ValueError):
+    """Upload larger than MAX_UPLOAD_SIZE (HTTP 413)"""
     
-    if file_size > settings.MAX_UPLOAD_SIZE:
+    def __init__(self):
         size_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
-        raise ValueError(f"File too large. Maximum size: {size_mb}MB")
-    
-    if file_size == 0:
-        raise ValueError("File is empty")
+        super().__init__(f"File too large. Maximum size: {size_mb}MB")
+
+
+def _check_size(size: int) -> None:
+    """Raise once a streamed upload exceeds MAX_UPLOAD_SIZE"""
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise UploadTooLarge()
 
 
-async def save_upload_file(file: UploadFile) -> tuple[str, str]:
+def _next_read_size(size: int, chunk_size: int) -> int:
+    """Bytes to request next: never more than one byte past the limit"""
+    return min(chunk_size, settings.MAX_UPLOAD_SIZE - size + 1)
+
+
+async def read_upload_file(file: UploadFile) -> tuple[bytearray, str]:
     """
-    Save uploaded file to disk
+    Read an upload into memory, hashing it in the same pass
+    
+    A declared size over MAX_UPLOAD_SIZE is rejected before reading;
+    otherwise reading stops at the first byte past the limit.
     
     Args:
-        file: Uploaded file
+        file: Uploaded file (closed afterwards)
     
     Returns:
-        Tuple of (file_path, filename)
+        Tuple of (contents, SHA-256 hex digest)
+    
+    Raises:
+        UploadTooLarge: If the file is larger than MAX_UPLOAD_SIZE
+        ValueError: If the file is empty
     """
-    # Generate unique filename
-    ext = file.filename.split('.')[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{ext}"
+    digest = hashlib.sha256()
+    contents = bytearray()
+    try:
+        if file.size is not None:
+            _check_size(file.size)
+        while chunk := await file.read(_next_read_size(len(contents), settings.UPLOAD_CHUNK_SIZE)):
+            _check_size(len(contents) + len(chunk))
+            digest.update(chunk)
+            contents += chunk
+    finally:
+        await file.close()
+    
+    if not contents:
+        raise ValueError("File is empty")
+    
+    return contents, digest.hexdigest()
+
+
+def _stream_to_store(source, chunk_size: int) -> tuple[str, str, int, str]:
+    """Copy `source` into the image store chunk by chunk: (path, SHA-256, size, private copy), nothing left behind on error"""
+    digest = hashlib.sha256()
+    size = 0
+    part_path = image_store.incoming_path()
+    try:
+        source.seek(0)
+        with open(part_path, 'wb') as f:
+            for chunk in iter(lambda: source.read(_next_read_size(size, chunk_size)), b""):
+                size += len(chunk)
+                _check_size(size)
+                digest.update(chunk)
+                f.write(chunk)
+        if size == 0:
+            raise ValueError("File is empty")
+        image_hash = digest.hexdigest()
+        return image_store.put_file(part_path, image_hash, keep=True), image_hash, size, part_path
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+async def save_upload_file(file: UploadFile) -> tuple[str, str, str, int, str]:
+    """
+    Stream an uploaded file into the image store
     
-    # Create upload directory if it doesn't exist
-    upload_dir = Path(settings.UPLOAD_DIR)
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    The copy runs in a worker thread, UPLOAD_CHUNK_SIZE bytes at a time, and
+    computes the SHA-256 and size on the way: memory per upload is bounded by
+    the chunk size and the event loop never blocks on disk I/O. An image
+    already in the store is not written twice.
     
-    # Full file path
-    file_path = upload_dir / unique_filename
+    The upload is also kept as a private copy (a hard link when possible),
+    so a shared blob removed concurrently can be restored by `ensure_blob`;
+    delete it with `delete_file` once the request is done.
+    
+    Args:
+        file: Uploaded file
     
-    # Save file
+    Returns:
+        Tuple of (file_path, filename, SHA-256 hex digest, size in bytes, copy_path)
+    
+    Raises:
+        UploadTooLarge: If the file is larger than MAX_UPLOAD_SIZE
+        ValueError: If the file is empty
+    """
     try:
-        contents = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(contents)
+        if file.size is not None:
+            _check_size(file.size)
+        file_path, image_hash, size, copy_path = await asyncio.to_thread(
+            _stream_to_store, file.file, settings.UPLOAD_CHUNK_SIZE
+        )
+    except ValueError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
     finally:
         await file.close()
     
-    return str(file_path), unique_filename
+    return file_path, os.path.basename(file_path), image_hash, size, copy_path
+
+
+async def store_upload_bytes(contents: bytes, image_hash: str) -> str:
+    """
+    Write already-read upload bytes into the image store, in a worker thread
+    
+    Args:
+        contents: Raw upload bytes
+        image_hash: Their SHA-256 (from `read_upload_file`)
+    
+    Returns:
+        Path of the (possibly pre-existing) blob
+    """
+    try:
+        return await asyncio.to_thread(image_store.put_bytes, contents, image_hash)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
 
 def delete_file(file_path: str) -> bool:
@@ -0,0 +1,209 @@
+# ========================================
+# MIGRATE UPLOADS - Flat uploads/ -> content-addressed image store
+# ========================================
+#
+# Moves every file at the top of UPLOAD_DIR (legacy `<uuid4>.<ext>` uploads)
+# to its sharded content-hash path, points `predictions.image_path` at the
+# shared blobs and recomputes the `image_blobs` reference counts. Re-runnable:
+# blobs already in place are only recounted.
+#
+# Database paths are compared once resolved against --root, whatever form
+# they were stored in, and written back in the form the API uses
+# (UPLOAD_DIR/<shards>/<sha256>.<ext>). The run is refused when no
+# prediction points under --root (wrong directory).
+#
+# Originals are removed only after the database commit, so an interrupted
+# run loses nothing. Run it while the API is stopped: reference counts are
+# recomputed from the predictions table.
+#
+# Usage (from backend/):
+#   python -m app.utils.migrate_uploads --dry-run
+#   python -m app.utils.migrate_uploads
+#   python -m app.utils.migrate_uploads --prune-orphans   # also delete unreferenced blobs
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.session import Base, async_session_maker, engine
+from app.models.image_blob import ImageBlob
+from app.models.prediction import Prediction
+from app.services.image_store import ImageStore, sniff_extension, SHARD_DEPTH
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path_of(store: ImageStore, path: Path) -> str:
+    with open(path, 'rb') as f:
+        return store.path_for(file_sha256(path), sniff_extension(f.read(8)))
+
+
+def place(store: ImageStore, path: Path) -> str:
+    """Copy (hard link when possible) a legacy upload to its blob path; the original stays"""
+    blob_path = blob_path_of(store, path)
+    if os.path.exists(blob_path):
+        return blob_path
+
+    part_path = store.link_copy(str(path))
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    os.replace(part_path, blob_path)
+    return blob_path
+
+
+def relative_path(root: Path, path: str) -> Optional[str]:
+    """`path` relative to the resolved `root`, None outside it: one key for relative and absolute forms"""
+    try:
+        return Path(path).resolve().relative_to(root.resolve()).as_posix()
+    except ValueError:
+        return None
+
+
+def stored_blobs(store: ImageStore):
+    """Paths, relative to the store root, of every blob file in the sharded layout"""
+    pattern = "/".join(["*"] * (SHARD_DEPTH + 1))
+    return [
+        p.relative_to(store.root).as_posix()
+        for p in store.root.glob(pattern) if p.is_file() and store.is_blob_path(str(p))
+    ]
+
+
+async def migrate(
+    store: ImageStore,
+    dry_run: bool,
+    prune_orphans: bool,
+    grace_seconds: float,
+    db_root: str = settings.UPLOAD_DIR
+):
+    # Chemins écrits en base sous la forme utilisée par l'API
+    db_store = ImageStore(db_root)
+
+    def db_path(relative: str) -> str:
+        return str(db_store.root / relative)
+
+    legacy = sorted(p for p in store.root.iterdir() if p.is_file() and not p.name.startswith("."))
+    print(f"📁 {store.root}: {len(legacy)} fichier(s) à plat")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[ImageBlob.__table__])
+
+    async with async_session_maker() as db:
+        rows = (await db.execute(select(Prediction.id, Prediction.image_path))).all()
+        relative = {path: relative_path(store.root, path) for path in {path for _, path in rows}}
+        if rows and not any(relative.values()):
+            raise SystemExit(f"❌ Aucune prédiction ne pointe sous {store.root.resolve()} : vérifier --root")
+
+        # 1. Blobs à côté des originaux (aucune modification visible avant le commit)
+        placed = {}
+        for index, path in enumerate(legacy, 1):
+            placed[path.name] = blob_path_of(store, path) if dry_run else place(store, path)
+            if index % 1000 == 0:
+                print(f"   {index}/{len(legacy)}")
+        print(f"   {len(set(placed.values()))} image(s) distincte(s)")
+
+        # 2. Prédictions -> blobs partagés
+        updates, missing, outside = [], 0, 0
+        for prediction_id, image_path in rows:
+            current = relative[image_path]
+            if current is None:
+                outside += 1
+                continue
+            if store.is_blob_path(str(store.root / current)):
+                target = current
+            elif os.path.basename(image_path) in placed:
+                target = Path(placed[os.path.basename(image_path)]).relative_to(store.root).as_posix()
+            else:
+                missing += 1
+                continue
+            if db_path(target) != image_path:
+                updates.append({
+                    "id": prediction_id,
+                    "image_path": db_path(target),
+                    "image_filename": os.path.basename(target),
+                })
+        print(f"🔗 {len(updates)} prédiction(s) repointée(s), {missing} sans fichier, "
+              f"{outside} hors de {store.root} (inchangée(s))")
+
+        if dry_run:
+            print("🧪 --dry-run : rien n'est modifié")
+            return
+
+        if updates:
+            await db.execute(update(Prediction), updates)
+
+        # 3. Compteurs de références recalculés depuis les prédictions
+        counts = Counter()
+        for image_path, count in (await db.execute(
+            select(Prediction.image_path, func.count()).group_by(Prediction.image_path)
+        )).all():
+            current = relative_path(store.root, image_path)
+            if current is not None:
+                counts[current] += count
+        blobs = stored_blobs(store)
+        referenced = {path for path in blobs if counts[path]}
+        for path in sorted(referenced):
+            statement = pg_insert(ImageBlob).values(
+                sha256=Path(path).stem, path=db_path(path),
+                size=os.path.getsize(store.root / path), ref_count=counts[path]
+            )
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[ImageBlob.sha256],
+                set_={"path": statement.excluded.path, "ref_count": statement.excluded.ref_count}
+            ))
+        await db.execute(delete(ImageBlob).where(
+            ImageBlob.path.not_in([db_path(path) for path in referenced])
+        ))
+        await db.commit()
+    print(f"✅ {len(referenced)} blob(s) référencé(s)")
+
+    # 4. Originaux retirés une fois la base à jour
+    for path in legacy:
+        path.unlink()
+    print(f"🧹 {len(legacy)} original(aux) supprimé(s)")
+
+    orphans = [store.root / path for path in blobs if path not in referenced]
+    if not prune_orphans:
+        print(f"ℹ️ {len(orphans)} blob(s) sans prédiction conservé(s) (--prune-orphans pour les supprimer)")
+        return
+
+    # Délai de grâce : un upload en cours peut écrire son blob avant d'insérer sa prédiction
+    cutoff = time.time() - grace_seconds
+    pruned = 0
+    for path in orphans:
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            pruned += 1
+    print(f"🗑️ {pruned} blob(s) sans prédiction supprimé(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration de uploads/ vers le stockage par hash de contenu")
+    parser.add_argument("--root", default=settings.UPLOAD_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Afficher ce qui serait fait")
+    parser.add_argument("--prune-orphans", action="store_true",
+                        help="Supprimer les blobs qu'aucune prédiction ne référence")
+    parser.add_argument("--grace-minutes", type=float, default=60,
+                        help="Âge minimal d'un blob orphelin avant suppression")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(ImageStore(args.root), args.dry_run, args.prune_orphans, args.grace_minutes * 60))
+
+
+if __name__ == "__main__":
+    main()
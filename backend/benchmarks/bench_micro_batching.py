@@ -0,0 +1,95 @@
+# ========================================
+# BENCHMARK - Micro-batching
+# ========================================
+#
+# Mesure le débit (images/s) et la latence d'un modèle derrière le
+# MicroBatcher pour une grille (max_batch_size, max_wait_ms), avec N clients
+# concurrents qui envoient chacun des tenseurs de pixels (1, 64, 64, 3) uint8.
+#
+# Usage (depuis backend/):
+#   python -m benchmarks.bench_micro_batching --model-id model_2 --clients 32
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from app.ml.model_manager import ModelManager, MicroBatcher
+
+
+def run_load(predict_fn, clients: int, requests_per_client: int, img_size: int) -> dict:
+    """Lance `clients` threads qui appellent `predict_fn` et retourne débit + latences"""
+    latencies = []
+    latencies_lock = threading.Lock()
+    image = np.random.randint(0, 256, (1, img_size, img_size, 3), dtype=np.uint8)
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            predict_fn(image)
+            local.append((time.perf_counter() - start) * 1000)
+        with latencies_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du micro-batching")
+    parser.add_argument("--model-id", default="model_2")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50, help="Requêtes par client")
+    parser.add_argument("--batch-sizes", default="1,8,16,32,64")
+    parser.add_argument("--waits-ms", default="0,2,5,10")
+    parser.add_argument("--img-size", type=int, default=64)
+    args = parser.parse_args()
+
+    manager = ModelManager()
+    manager.load_model(args.model_id)
+
+    def forward(batch):
+        return manager._forward(args.model_id, batch)
+
+    # Warm-up hors mesure
+    forward(np.zeros((1, args.img_size, args.img_size, 3), dtype=np.uint8))
+
+    print(f"Modèle {args.model_id} - {args.clients} clients x {args.requests} requêtes\n")
+    print(f"{'batch':>6} {'wait_ms':>8} {'img/s':>10} {'p50_ms':>9} {'p99_ms':>9} {'batch moy.':>11}")
+
+    # Référence sans batching : chaque client appelle directement le modèle
+    ref = run_load(forward, args.clients, args.requests, args.img_size)
+    print(f"{'-':>6} {'-':>8} {ref['throughput']:>10.1f} {ref['p50_ms']:>9.2f} {ref['p99_ms']:>9.2f} {1:>11.2f}")
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        for wait_ms in [float(w) for w in args.waits_ms.split(",")]:
+            batcher = MicroBatcher(args.model_id, forward, batch_size, wait_ms)
+            try:
+                res = run_load(batcher.predict, args.clients, args.requests, args.img_size)
+            finally:
+                batcher.close()
+
+            avg_batch = batcher.stats['images'] / max(batcher.stats['batches'], 1)
+            print(
+                f"{batch_size:>6} {wait_ms:>8.1f} {res['throughput']:>10.1f} "
+                f"{res['p50_ms']:>9.2f} {res['p99_ms']:>9.2f} {avg_batch:>11.2f}"
+            )
+
+    manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# ========================================
+# BENCHMARK - Décodage JPEG à résolution réduite
+# ========================================
+#
+# Compare le décodage complet et le décodage réduit (DCT scaling de libjpeg,
+# IMREAD_REDUCED_COLOR_<n>) de grandes photos JPEG : temps de décodage,
+# taille de l'image décodée, écart des tenseurs d'entrée et, surtout, écart
+# des sorties du modèle (probabilités, décisions inversées).
+#
+# Sans --images, les crops de cell_images/ sont agrandis à --size pixels et
+# encodés en JPEG, pour simuler les photos de téléphone / caméra de microscope.
+#
+# Usage (depuis backend/):
+#   python -m benchmarks.bench_reduced_decode --samples 300 --size 3000
+#   python -m benchmarks.bench_reduced_decode --images /data/photos_cliniques --model-id model_2
+
+import argparse
+import io
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.ml import dataset
+from app.services.ml_service import MLService
+
+
+def load_jpegs(args) -> list:
+    """Octets JPEG à décoder"""
+    if args.images:
+        paths = sorted(p for p in Path(args.images).rglob("*") if p.suffix.lower() in {".jpg", ".jpeg"})
+        return [p.read_bytes() for p in paths[:args.samples or None]]
+
+    jpegs = []
+    for path, _ in dataset.sample(dataset.list_images(), args.samples):
+        image = cv2.resize(cv2.imread(path), (args.size, args.size), interpolation=cv2.INTER_CUBIC)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+        if ok:
+            jpegs.append(encoded.tobytes())
+    return jpegs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage JPEG réduit")
+    parser.add_argument("--images", default=None, help="Dossier de JPEG réels (défaut : cell_images/ agrandies)")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--size", type=int, default=3000, help="Côté des JPEG synthétiques")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--model-id", default="model_2", help="Modèle dont on compare les sorties ('' = aucun)")
+    args = parser.parse_args()
+
+    jpegs = load_jpegs(args)
+    ml_service = MLService()
+    print(f"📊 {len(jpegs)} JPEG, {sum(map(len, jpegs)) / len(jpegs) / 1024:.0f} KB en moyenne")
+
+    results = {}
+    for name in ("complet", "réduit"):
+        timings, decoded_bytes, tensors = [], [], []
+        for data in jpegs:
+            buffer = np.frombuffer(data, dtype=np.uint8)
+            flags = cv2.IMREAD_COLOR if name == "complet" else ml_service._decode_flags(io.BytesIO(data))
+            start = time.perf_counter()
+            image = cv2.imdecode(buffer, flags)
+            tensor = ml_service._to_tensor(image)
+            timings.append((time.perf_counter() - start) * 1000)
+            decoded_bytes.append(image.nbytes)
+            tensors.append(tensor[0].copy())
+            ml_service.release(tensor)
+        results[name] = {
+            'p50_ms': float(np.percentile(timings, 50)),
+            'p99_ms': float(np.percentile(timings, 99)),
+            'decoded_mb': float(np.mean(decoded_bytes)) / (1024 * 1024),
+            'tensors': np.stack(tensors),
+        }
+
+    print(f"\n{'décodage':>10} {'p50_ms':>9} {'p99_ms':>9} {'image_mb':>9}")
+    for name, res in results.items():
+        print(f"{name:>10} {res['p50_ms']:>9.2f} {res['p99_ms']:>9.2f} {res['decoded_mb']:>9.2f}")
+    full, reduced = results["complet"], results["réduit"]
+    print(f"\nAccélération : x{full['p50_ms'] / reduced['p50_ms']:.1f}, "
+          f"mémoire décodée : x{full['decoded_mb'] / reduced['decoded_mb']:.1f}")
+
+    tensor_diff = np.abs(full['tensors'].astype(np.int16) - reduced['tensors'])
+    print(f"Écart des tenseurs (pixels) : moyen {tensor_diff.mean():.2f}, max {tensor_diff.max()}")
+
+    if args.model_id:
+        from app.ml.model_manager import ModelManager
+
+        manager = ModelManager()
+        forward_size = max(manager.config.get('inference', {}).get('batch_buckets', [64]))
+        full_probas = manager.forward_chunked(args.model_id, full['tensors'], forward_size)
+        reduced_probas = manager.forward_chunked(args.model_id, reduced['tensors'], forward_size)
+        proba_diff = np.abs(full_probas - reduced_probas)
+        flips = int(np.sum((full_probas > 0.5) != (reduced_probas > 0.5)))
+        print(f"Sorties de {args.model_id} : écart de probabilité moyen {proba_diff.mean():.4f}, "
+              f"max {proba_diff.max():.4f}, décisions inversées {flips}/{len(jpegs)}")
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# ========================================
+# BENCHMARK - Threads d'inférence et affinité CPU
+# ========================================
+#
+# Compare la latence (p50 / p99) et le débit pour plusieurs réglages
+# intra-op / inter-op / affinité, avec N clients concurrents répartis sur un
+# ou plusieurs modèles. TensorFlow ne fixe ses pools de threads qu'une fois
+# par processus : chaque configuration tourne dans un sous-processus neuf.
+#
+# Usage (depuis backend/):
+#   python -m benchmarks.bench_threading --model-id model_1 --model-id model_2 \
+#       --config 0:0 --config 4:1 --config 4:2:0-3 --clients 8
+
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def run_config(model_ids, clients: int, requests_per_client: int, img_size: int,
+               intra_op: int, inter_op: int, cpus: str) -> dict:
+    """Charge les modèles avec le réglage donné et mesure latences et débit"""
+    from app.ml.model_manager import ModelManager
+
+    manager = ModelManager(intra_op_threads=intra_op, inter_op_threads=inter_op, cpu_affinity=cpus or None)
+    # Sous-processus dédié : les threads clients créés ensuite héritent de l'affinité
+    manager.pin_thread()
+    for model_id in model_ids:
+        manager.load_model(model_id)
+
+    image = np.random.randint(0, 256, (1, img_size, img_size, 3), dtype=np.uint8)
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def client(model_id):
+        local = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            manager._infer(model_id, image)
+            local.append((time.perf_counter() - start) * 1000)
+        with latencies_lock:
+            latencies.extend(local)
+
+    # Les clients sont répartis sur les modèles, qui s'exécutent donc en concurrence
+    threads = [
+        threading.Thread(target=client, args=(model_ids[i % len(model_ids)],)) for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    manager.shutdown()
+
+    return {
+        **manager.threading,
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des réglages de threads d'inférence")
+    parser.add_argument("--model-id", action="append", help="Modèle(s) exécutés en concurrence (défaut : model_2)")
+    parser.add_argument("--config", action="append",
+                        help="intra_op:inter_op[:cpus], 0 = automatique (défaut : 0:0 1:1 2:1 4:1 4:2)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="Requêtes par client")
+    parser.add_argument("--img-size", type=int, default=64)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    model_ids = args.model_id or ["model_2"]
+
+    if args.worker is not None:
+        # Sous-processus : une seule configuration, résultat en JSON sur stdout
+        intra_op, inter_op, cpus = (args.worker.split(":", 2) + [""])[:3]
+        result = run_config(model_ids, args.clients, args.requests, args.img_size,
+                            int(intra_op), int(inter_op), cpus)
+        print(json.dumps(result))
+        return
+
+    from app.ml.cpu_topology import describe
+
+    print(f"Modèles {', '.join(model_ids)} - {args.clients} clients x {args.requests} requêtes")
+    print(f"Topologie : {', '.join(describe())}\n")
+    print(f"{'config':>14} {'intra':>6} {'inter':>6} {'cpus':>8} {'img/s':>10} {'p50_ms':>9} {'p99_ms':>9}")
+
+    for config in args.config or ["0:0", "1:1", "2:1", "4:1", "4:2"]:
+        command = [sys.executable, "-m", "benchmarks.bench_threading", "--worker", config,
+                   "--clients", str(args.clients), "--requests", str(args.requests),
+                   "--img-size", str(args.img_size)]
+        for model_id in model_ids:
+            command += ["--model-id", model_id]
+
+        output = subprocess.run(command, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(f"{config:>14} échec : {output.stderr.strip().splitlines()[-1]}")
+            continue
+
+        res = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{config:>14} {res['intra_op']:>6} {res['inter_op']:>6} {res['cpus'] or 'tous':>8} "
+            f"{res['throughput']:>10.1f} {res['p50_ms']:>9.2f} {res['p99_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# ========================================
+# BENCHMARK - Décodage des uploads : disque vs mémoire
+# ========================================
+#
+# Compare, sur les crops PNG de cell_images/, les deux chemins d'une requête
+# /predict jusqu'au tenseur d'entrée du modèle :
+#   - disque : écriture du fichier dans le dossier d'upload puis cv2.imread
+#   - mémoire : cv2.imdecode des octets reçus dans un buffer préalloué
+#     (l'écriture de l'original se fait en parallèle, hors de la latence)
+# et vérifie que les deux produisent le même tenseur.
+#
+# Usage (depuis backend/):
+#   python -m benchmarks.bench_upload_decode --samples 2000
+#   python -m benchmarks.bench_upload_decode --upload-dir uploads/bench
+
+import argparse
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from app.ml import dataset
+from app.services.ml_service import MLService
+
+
+def summarize(latencies_us) -> dict:
+    return {
+        'img_s': len(latencies_us) / (sum(latencies_us) / 1e6),
+        'p50_us': float(np.percentile(latencies_us, 50)),
+        'p99_us': float(np.percentile(latencies_us, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage des uploads (disque vs mémoire)")
+    parser.add_argument("--samples", type=int, default=1000, help="Images de cell_images/ (0 = toutes)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--upload-dir", default=None, help="Dossier d'écriture (défaut : dossier temporaire)")
+    args = parser.parse_args()
+
+    items = dataset.sample(dataset.list_images(), args.samples)
+    # Les octets sont lus une fois : une requête les a déjà en mémoire
+    uploads = [Path(path).read_bytes() for path, _ in items]
+    print(f"📊 {len(uploads)} images, {sum(map(len, uploads)) / len(uploads) / 1024:.1f} KB en moyenne")
+
+    upload_dir = Path(args.upload_dir or tempfile.mkdtemp(prefix="bench_upload_"))
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    ml_service = MLService()
+    buffer = np.empty((1,) + ml_service.image_shape, dtype=np.uint8)
+
+    disk, memory = [], []
+    max_diff = 0.0
+    try:
+        for _ in range(args.repeats):
+            for contents in uploads:
+                start = time.perf_counter()
+                path = upload_dir / f"{uuid.uuid4()}.png"
+                with open(path, 'wb') as f:
+                    f.write(contents)
+                from_disk = ml_service.preprocess_image(str(path))
+                disk.append((time.perf_counter() - start) * 1e6)
+
+                start = time.perf_counter()
+                from_memory = ml_service.preprocess_bytes(contents, out=buffer)
+                memory.append((time.perf_counter() - start) * 1e6)
+
+                max_diff = max(max_diff, float(np.abs(from_disk.astype(np.int16) - from_memory).max()))
+                ml_service.release(from_disk)
+                path.unlink()
+    finally:
+        if args.upload_dir is None:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+
+    print(f"\n{'chemin':>10} {'img/s':>10} {'p50_us':>9} {'p99_us':>9}")
+    for name, latencies in (("disque", disk), ("mémoire", memory)):
+        res = summarize(latencies)
+        print(f"{name:>10} {res['img_s']:>10.0f} {res['p50_us']:>9.1f} {res['p99_us']:>9.1f}")
+    print(f"\nÉcart maximal entre les tenseurs : {max_diff:g} (pixels)")
+
+
+if __name__ == "__main__":
+    main()
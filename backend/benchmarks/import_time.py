@@ -0,0 +1,68 @@
+# ========================================
+# BENCHMARK - Temps d'import
+# ========================================
+#
+# Importe un module dans un interpréteur neuf avec `python -X importtime` et
+# affiche les imports les plus lents (temps cumulé, enfants compris), ainsi
+# que les dépendances ML lourdes chargées alors qu'elles ne devraient l'être
+# qu'au premier chargement d'un modèle.
+#
+# Usage (depuis backend/):
+#   python -m benchmarks.import_time
+#   python -m benchmarks.import_time --module app.api.v1.predictions --top 30
+
+import argparse
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Ne doivent pas être importés au démarrage des workers de l'API
+HEAVY_MODULES = ("tensorflow", "keras", "onnxruntime", "cv2", "PIL", "huggingface_hub", "h5py")
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Importe `module` dans un sous-processus et retourne [(nom, self µs, cumulé µs)]
+
+    L'ordre est celui de la sortie de -X importtime (un module après ses dépendances).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import de {module} impossible :\n{result.stderr.strip().splitlines()[-1]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        imports.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imports les plus lents au démarrage de l'API")
+    parser.add_argument("--module", default="main", help="Module à importer (défaut : l'application FastAPI)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    imports = profile_imports(args.module)
+    # Les modules de premier niveau (non indentés) couvrent tout l'import
+    total_ms = sum(cumulative for name, _, cumulative in imports if not name.startswith("  ")) / 1000
+
+    print(f"\nImport de {args.module} : {total_ms:.0f} ms, {len(imports)} modules\n")
+    print(f"{'cumulé (ms)':>12} {'propre (ms)':>12}  module")
+    for name, self_us, cumulative_us in sorted(imports, key=lambda i: i[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>12.1f} {self_us / 1000:>12.1f}  {name.strip()}")
+
+    heavy = sorted({name.strip() for name, _, _ in imports if name.strip() in HEAVY_MODULES})
+    if heavy:
+        print(f"\n⚠️ Dépendances lourdes importées au démarrage : {', '.join(heavy)}")
+    else:
+        print("\n✅ Aucune dépendance ML lourde importée")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,52 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+import asyncio
 import logging
 import time
 
 from app.core.config import settings
 from app.core.logger import setup_logger
 from app.api.v1 import auth, predictions, statistics, users, hospitals, models
-from app.ml.model_manager import ModelManager
+from app.ml.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.ml.prediction_cache import PredictionCache
 from app.db.session import engine, Base
 
+if TYPE_CHECKING:
+    # Imported in lifespan: numpy & co. stay out of the import path of the app
+    from app.ml.model_manager import ModelManager
+
 # Setup logging
 logger = setup_logger(__name__)
 
 # Global model manager instance
 model_manager = None
+inference_executor = None
+prediction_cache = None
+preload_task = None
+
+
+async def preload_models():
+    """Load and warm the models selected by MODEL_LOAD_POLICY, in parallel"""
+    model_ids = model_manager.models_for_policy(settings.MODEL_LOAD_POLICY)
+    
+    if inference_executor.remote:
+        # Models live in the worker processes or the inference server: warm them there
+        model_manager.set_readiness(model_ids, None)
+        # Sticky: a process worker restarted after a crash preloads them again
+        results = await inference_executor.broadcast_model(
+            "preload", model_ids, settings.MODEL_PRELOAD_WORKERS, sticky=True
+        )
+        errors = {}
+        for result in results:
+            if isinstance(result, Exception):
+                errors[inference_executor.kind] = str(result)
+            else:
+                errors.update(result)
+        model_manager.set_readiness(model_ids, errors)
+    else:
+        await asyncio.to_thread(model_manager.preload, model_ids, settings.MODEL_PRELOAD_WORKERS)
 
 
 @asynccontextmanager
@@ -40,20 +72,65 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Database error: {e}")
     
     # Load ML models
-    global model_manager
+    global model_manager, inference_executor, prediction_cache, preload_task
+    from app.ml.model_manager import ModelManager
+    from app.ml.inference_server import InferenceClient, derive_authkey
     try:
-        model_manager = ModelManager()
-        logger.info("✅ ML Models loaded successfully")
+        model_manager = ModelManager(
+            memory_budget_mb=settings.MODEL_MEMORY_BUDGET_MB,
+            default_model_id=settings.DEFAULT_MODEL_ID,
+            reload_interval=settings.MODEL_RELOAD_INTERVAL_SECONDS,
+            mirror=settings.MODEL_MIRROR,
+            intra_op_threads=settings.INFERENCE_INTRA_OP_THREADS,
+            inter_op_threads=settings.INFERENCE_INTER_OP_THREADS,
+            cpu_affinity=settings.INFERENCE_CPU_AFFINITY,
+            # Process / server modes: models live in the workers or the inference
+            # server, the API process only keeps the catalogue
+            serving=settings.INFERENCE_EXECUTOR == "thread"
+        )
+        logger.info("✅ ML Models registered successfully")
     except Exception as e:
         logger.error(f"❌ Error loading models: {e}")
         raise
     
-    logger.info("✅ API is ready!")
+    # Inference runs in a dedicated, bounded executor (off the event loop)
+    inference_executor = InferenceExecutor(
+        model_manager,
+        kind=settings.INFERENCE_EXECUTOR,
+        max_workers=settings.INFERENCE_WORKERS,
+        max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+        retry_after=settings.INFERENCE_RETRY_AFTER_SECONDS,
+        server_client=(
+            InferenceClient(settings.INFERENCE_SERVER_SOCKET, derive_authkey(settings.SECRET_KEY))
+            if settings.INFERENCE_EXECUTOR == "server" else None
+        )
+    )
+    
+    if settings.PREDICTION_CACHE_ENABLED:
+        prediction_cache = PredictionCache(
+            max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+            disk_path=settings.PREDICTION_CACHE_DISK_PATH,
+            disk_max_entries=settings.PREDICTION_CACHE_DISK_MAX_ENTRIES
+        )
+    
+    # Eager loading runs in the background; /ready reports 503 until it is done
+    preload_task = asyncio.create_task(preload_models())
+    
+    logger.info("✅ API is up! (see /ready for model readiness)")
     
     yield
     
     # Shutdown
     logger.info("👋 Shutting down API...")
+    if preload_task and not preload_task.done():
+        preload_task.cancel()
+    if inference_executor:
+        inference_executor.shutdown()
+    if model_manager:
+        model_manager.shutdown()
+    if prediction_cache:
+        prediction_cache.close()
 
 
 # Create FastAPI app
@@ -107,6 +184,20 @@ async def log_requests(request: Request, call_next):
 
 
 # Exception handlers
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFull):
+    """Backpressure: inference queue is full"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "success": False,
+            "error": "Service overloaded",
+            "message": str(exc)
+        }
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
@@ -156,9 +247,39 @@ async def health_check():
         health_status["models_loaded"] = len(model_manager.models)
         health_status["default_model"] = model_manager.current_model_id
     
+    if inference_executor:
+        health_status["inference_queue"] = {
+            "executor": inference_executor.kind,
+            "pending": inference_executor.pending,
+            "capacity": inference_executor.capacity
+        }
+    
+    if prediction_cache:
+        health_status["prediction_cache"] = prediction_cache.stats()
+    
     return health_status
 
 
+# Readiness endpoint (load balancer)
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Ready only once the models selected by MODEL_LOAD_POLICY are loaded and warmed"""
+    global model_manager
+    
+    if model_manager is None:
+        return JSONResponse(status_code=503, content={"success": False, "ready": False})
+    
+    readiness = model_manager.readiness()
+    return JSONResponse(
+        status_code=200 if readiness['ready'] else 503,
+        content={
+            "success": readiness['ready'],
+            "load_policy": settings.MODEL_LOAD_POLICY,
+            **readiness
+        }
+    )
+
+
 # Include API routers
 app.include_router(
     auth.router,
@@ -198,7 +319,7 @@ app.include_router(
 
 
 # Get model manager instance
-def get_model_manager() -> ModelManager:
+def get_model_manager() -> "ModelManager":
     """Dependency to get model manager instance"""
     global model_manager
     if model_manager is None:
@@ -206,8 +327,24 @@ def get_model_manager() -> ModelManager:
     return model_manager
 
 
+def get_inference_executor() -> InferenceExecutor:
+    """Dependency to get the inference executor instance"""
+    global inference_executor
+    if inference_executor is None:
+        raise RuntimeError("Inference executor not initialized")
+    return inference_executor
+
+
+def get_prediction_cache() -> PredictionCache | None:
+    """Dependency to get the prediction cache (None when disabled)"""
+    global prediction_cache
+    return prediction_cache
+
+
 # Make model_manager available to routes
 app.state.model_manager = get_model_manager
+app.state.inference_executor = get_inference_executor
+app.state.prediction_cache = get_prediction_cache
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import yaml
+
+from app.ml.model_manager import ModelManager
+
+
+class StubRunner:
+    """Runner sans TensorFlow : probabilité = valeur moyenne des pixels / 255"""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.calls = []
+        self.latency_ms = {1: 1.0}
+        self.memory_bytes = 1024
+
+    def predict(self, batch):
+        self.calls.append(len(batch))
+        batch = np.asarray(batch)
+        return np.clip(batch.reshape(len(batch), -1).mean(axis=1) / 255.0 + self.offset, 0.0, 1.0)
+
+
+def _model_entry(tmp_path, model_id, **extra):
+    return {
+        'id': model_id,
+        'name': model_id.upper(),
+        'format': 'keras',
+        'remote': 'local',
+        'local_path': str(tmp_path / f"{model_id}.keras"),
+        'accuracy': 0.95,
+        'inference_time_ms': 10,
+        **extra
+    }
+
+
+@pytest.fixture
+def model_entry(tmp_path):
+    """Entrée model_config.yaml minimale : model_entry("model_1", batching={...})"""
+    return lambda model_id, **extra: _model_entry(tmp_path, model_id, **extra)
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """ModelManager sur une configuration temporaire, modèles remplacés par des StubRunner"""
+    managers = []
+
+    def factory(entries, **options):
+        config_path = tmp_path / "model_config.yaml"
+        config_path.write_text(yaml.safe_dump({'models': entries}))
+        manager = ModelManager(str(config_path), default_model_id=entries[0]['id'], **options)
+        for entry in entries:
+            manager.models[entry['id']].update(model=StubRunner(), loaded=True)
+        managers.append(manager)
+        return manager
+
+    yield factory
+    for manager in managers:
+        manager.shutdown()
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.ml import benchmark
+from app.ml.benchmark import measure_thread_settings, recommend, summarize
+
+
+def measure(intra_op, inter_op, batches, accuracy=None, peak_memory_mb=100.0, load_s=1.0):
+    """Résultat de sous-processus : batches = {batch_size: (p50_ms, p99_ms, throughput)}"""
+    result = {
+        'intra_op': intra_op,
+        'inter_op': inter_op,
+        'load_s': load_s,
+        'peak_memory_mb': peak_memory_mb,
+        'batches': [
+            {'batch_size': size, 'p50_ms': p50, 'p90_ms': p50, 'p99_ms': p99, 'throughput': throughput}
+            for size, (p50, p99, throughput) in batches.items()
+        ],
+    }
+    if accuracy is not None:
+        result['accuracy'] = accuracy
+    return result
+
+
+def test_summarize_picks_best_latency_and_throughput_across_thread_settings():
+    run = {'models': {'m': [
+        measure(1, 1, {1: (4.0, 6.0, 250.0), 32: (40.0, 50.0, 800.0)}, accuracy=0.95,
+                peak_memory_mb=120.0, load_s=2.0),
+        measure(4, 1, {1: (2.0, 3.0, 500.0), 32: (50.0, 60.0, 640.0)}, peak_memory_mb=150.0, load_s=1.5),
+    ]}}
+
+    summary = summarize(run)['m']
+
+    assert summary['accuracy'] == 0.95
+    # Latence : meilleur p50 au batch 1, avec le p99 du même réglage
+    assert (summary['p50_ms'], summary['p99_ms'], summary['latency_threads']) == (2.0, 3.0, "4:1")
+    # Débit : meilleur tous batchs confondus
+    assert summary['throughput'] == 800.0
+    assert summary['throughput_batch_size'] == 32
+    assert summary['throughput_threads'] == "1:1"
+    assert summary['peak_memory_mb'] == 150.0
+    assert summary['load_s'] == 1.5
+
+
+def test_summarize_skips_errors_and_keeps_accuracy_from_a_later_setting():
+    run = {'models': {
+        'm': [
+            {'threads': "1:1", 'error': "OOM"},
+            measure(2, 1, {1: (3.0, 4.0, 330.0)}, accuracy=0.9),
+        ],
+        'broken': [{'threads': "0:0", 'error': "boom"}],
+    }}
+
+    summary = summarize(run)
+
+    assert set(summary) == {'m'}
+    assert summary['m']['accuracy'] == 0.9
+    assert summary['m']['latency_threads'] == "2:1"
+
+
+def test_summarize_falls_back_to_smallest_latency_without_batch_one():
+    run = {'models': {'m': [measure(0, 0, {8: (9.0, 12.0, 880.0), 32: (30.0, 35.0, 1060.0)})]}}
+
+    summary = summarize(run)['m']
+
+    assert summary['p50_ms'] == 9.0
+    assert summary['accuracy'] is None
+
+
+def test_recommend_trades_speed_for_accuracy_within_tolerance():
+    models = {
+        'fast': {'accuracy': 0.90, 'p50_ms': 1.0, 'throughput': 2000.0},
+        'close': {'accuracy': 0.947, 'p50_ms': 3.0, 'throughput': 900.0},
+        'best': {'accuracy': 0.95, 'p50_ms': 8.0, 'throughput': 1200.0},
+    }
+
+    recommendations = recommend(models, tolerance=0.005)
+
+    assert recommendations['speed'] == 'fast'
+    assert recommendations['accuracy'] == 'best'
+    # 'close' est à moins de 0.005 de la meilleure accuracy et plus rapide
+    assert recommendations['balanced'] == 'close'
+    assert recommendations['production'] == 'best'
+    assert recommendations['ensemble'] == 'ensemble'
+
+
+def test_recommend_ranks_missing_accuracy_last():
+    models = {
+        'unknown': {'accuracy': None, 'p50_ms': 0.5, 'throughput': 5000.0},
+        'known': {'accuracy': 0.9, 'p50_ms': 2.0, 'throughput': 800.0},
+    }
+
+    recommendations = recommend(models)
+
+    assert recommendations['speed'] == 'unknown'
+    assert recommendations['accuracy'] == 'known'
+    assert recommendations['balanced'] == 'known'
+    assert recommendations['production'] == 'known'
+
+
+def test_recommend_without_models():
+    assert recommend({}) == {}
+
+
+@pytest.mark.parametrize("outcomes, requested", [
+    (["ok", "ok", "ok"], [True, False, False]),
+    (["error", "ok", "ok"], [True, True, False]),
+    (["error", "error", "ok"], [True, True, True]),
+])
+def test_accuracy_is_measured_on_first_successful_setting(monkeypatch, outcomes, requested):
+    calls = []
+
+    def fake_worker(args, model_id, threads, data_path, with_accuracy):
+        calls.append(with_accuracy)
+        if outcomes[len(calls) - 1] == "error":
+            return {'threads': threads, 'error': "boom"}
+        return measure(1, 1, {1: (1.0, 1.0, 1000.0)}, accuracy=0.9 if with_accuracy else None)
+
+    monkeypatch.setattr(benchmark, "_run_worker", fake_worker)
+
+    results = measure_thread_settings(SimpleNamespace(), "m", ["1:1", "2:1", "4:1"], "sample.npz")
+
+    assert calls == requested
+    assert summarize({'models': {'m': results}})['m']['accuracy'] == 0.9
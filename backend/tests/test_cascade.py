@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from app.ml.calibrate_cascade import evaluate_band, select_band
+from app.ml.model_manager import run_cascade
+
+STAGES = ["fast", "medium", "slow"]
+WEIGHTS = {"fast": 1.0, "medium": 1.0, "slow": 2.0}
+COSTS = {"fast": 1.0, "medium": 5.0, "slow": 20.0}
+
+
+def fixed_infer(probas, calls=None):
+    """infer(model_id, indices) sur des probabilités précalculées, appels enregistrés"""
+    def infer(model_id, indices):
+        if calls is not None:
+            calls.append((model_id, list(indices)))
+        return probas[model_id][indices]
+    return infer
+
+
+def test_confident_images_stop_and_uncertain_ones_escalate():
+    probas = {
+        "fast": np.array([0.95, 0.5, 0.02, 0.6]),
+        "medium": np.array([0.0, 0.6, 0.0, 0.99]),
+        "slow": np.array([0.0, 0.8, 0.0, 0.0]),
+    }
+    calls = []
+
+    combined, stages_run = run_cascade(4, STAGES, WEIGHTS, (0.1, 0.9), fixed_infer(probas, calls))
+
+    # Chaque étage ne reçoit que les images encore dans la bande
+    assert calls == [("fast", [0, 1, 2, 3]), ("medium", [1, 3]), ("slow", [1, 3])]
+    assert stages_run == [["fast"], STAGES, ["fast"], STAGES]
+    assert combined == pytest.approx([0.95, (0.5 + 0.6 + 2 * 0.8) / 4, 0.02, (0.6 + 0.99) / 4])
+
+
+def test_band_edges_are_uncertain():
+    probas = {"fast": np.array([0.1, 0.9]), "medium": np.array([0.0, 1.0]), "slow": np.zeros(2)}
+    _, stages_run = run_cascade(2, STAGES, WEIGHTS, (0.1, 0.9), fixed_infer(probas))
+    assert stages_run == [["fast", "medium"], ["fast", "medium"]]
+
+
+def test_failing_refinement_stage_keeps_earlier_stages():
+    def infer(model_id, indices):
+        if model_id == "medium":
+            raise RuntimeError("modèle indisponible")
+        return np.full(len(indices), 0.5)
+
+    combined, stages_run = run_cascade(2, STAGES, WEIGHTS, (0.1, 0.9), infer)
+    assert stages_run == [["fast"], ["fast"]]
+    assert combined == pytest.approx([0.5, 0.5])
+
+    def failing_first(model_id, indices):
+        raise RuntimeError("modèle indisponible")
+
+    with pytest.raises(RuntimeError):
+        run_cascade(2, STAGES, WEIGHTS, (0.1, 0.9), failing_first)
+
+
+def test_manager_cascade_reports_the_stages_run(make_manager, model_entry):
+    manager = make_manager([model_entry("model_1"), model_entry("model_2"), model_entry("model_3")])
+    manager.config['cascade'] = {'stages': ["model_1", "model_2", "model_3"], 'uncertainty_band': [0.1, 0.9]}
+    # Pixels 250 : probabilité 0.98 dès le premier étage ; pixels 128 : 0.5 partout
+    images = np.stack([np.full((4, 4, 3), v, dtype=np.uint8) for v in (250, 128, 250)])
+
+    results = manager.predict_batch(images, "cascade")
+
+    assert [r['stages_run'] for r in results] == [
+        ["model_1"], ["model_1", "model_2", "model_3"], ["model_1"]
+    ]
+    assert [r['model_id'] for r in results] == ["cascade"] * 3
+    assert manager.models["model_2"]['model'].calls == [1]
+    assert results[1]['inference_time_ms'] == 30
+
+
+def synthetic_scores(n=400, seed=0):
+    """Étage rapide juste sauf quand il hésite ; étages suivants toujours justes"""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, n)
+    fast = np.where(labels == 1, rng.uniform(0.75, 1.0, n), rng.uniform(0.0, 0.25, n))
+    hard = rng.random(n) < 0.2
+    fast[hard] = np.where(labels[hard] == 1, rng.uniform(0.3, 0.5, hard.sum()), rng.uniform(0.5, 0.7, hard.sum()))
+    sure = np.where(labels == 1, 0.99, 0.01)
+    return {"fast": fast, "medium": sure, "slow": sure}, labels
+
+
+def test_cheapest_band_within_tolerance_is_chosen():
+    probas, labels = synthetic_scores()
+
+    ensemble, best = select_band(STAGES, WEIGHTS, COSTS, probas, labels, tolerance=0.0, step=0.05)
+
+    assert ensemble['accuracy'] == 1.0 and ensemble['avg_stages'] == 3
+    assert best['accuracy'] == 1.0
+    # Seules les images hésitantes (20 %) passent aux étages suivants
+    assert best['avg_cost_ms'] < 0.3 * ensemble['avg_cost_ms']
+    low, high = best['band']
+    assert 0.25 <= low <= 0.3 and 0.7 <= high <= 0.75
+
+    # Aucune bande moins chère n'atteint la même accuracy
+    grid = [evaluate_band((lo, hi), STAGES, WEIGHTS, COSTS, probas, labels)
+            for lo in np.arange(0.0, 0.5 + 1e-9, 0.05) for hi in np.arange(0.5, 1.0 + 1e-9, 0.05)]
+    assert all(c['avg_cost_ms'] >= best['avg_cost_ms'] for c in grid if c['accuracy'] == 1.0)
+
+
+def test_tolerance_allows_a_cheaper_band():
+    probas, labels = synthetic_scores()
+
+    _, exact = select_band(STAGES, WEIGHTS, COSTS, probas, labels, tolerance=0.0, step=0.05)
+    _, tolerant = select_band(STAGES, WEIGHTS, COSTS, probas, labels, tolerance=0.25, step=0.05)
+
+    assert tolerant['avg_cost_ms'] < exact['avg_cost_ms']
+    assert tolerant['accuracy'] >= 0.75
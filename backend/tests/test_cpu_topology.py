@@ -0,0 +1,88 @@
+import pytest
+
+from app.ml import cpu_topology
+from app.ml.cpu_topology import (
+    cgroup_cpu_quota, effective_cpu_count, format_cpu_list, parse_cpu_list, resolve_threads, split_cpus
+)
+
+
+@pytest.fixture
+def machine(monkeypatch):
+    """Machine simulée : machine(cpus=16, quota=None)"""
+    def configure(cpus=16, quota=None):
+        monkeypatch.setattr(cpu_topology, "available_cpus", lambda: set(range(cpus)))
+        monkeypatch.setattr(cpu_topology, "cgroup_cpu_quota", lambda root=None: quota)
+    return configure
+
+
+@pytest.mark.parametrize("spec, cpus", [
+    ("0-3,8", {0, 1, 2, 3, 8}),
+    ("5", {5}),
+    (" 0-1 , 4-5 ,", {0, 1, 4, 5}),
+    ("2,2,1-2", {1, 2}),
+    ("", set()),
+])
+def test_parse_cpu_list(spec, cpus):
+    assert parse_cpu_list(spec) == cpus
+
+
+def test_format_is_the_inverse_of_parse():
+    assert format_cpu_list({0, 1, 2, 3, 8}) == "0-3,8"
+    assert format_cpu_list({7, 1, 3, 2}) == "1-3,7"
+    assert parse_cpu_list(format_cpu_list({0, 2, 4, 5, 6, 9})) == {0, 2, 4, 5, 6, 9}
+
+
+def test_split_cpus_gives_contiguous_disjoint_slices():
+    cpus = parse_cpu_list("0-9")
+    slices = [split_cpus(cpus, 3, index) for index in range(3)]
+
+    assert slices == [{0, 1, 2, 3}, {4, 5, 6}, {7, 8, 9}]
+    # Index au-delà du nombre de tranches : on reboucle
+    assert split_cpus(cpus, 3, 4) == slices[1]
+
+
+def test_split_cpus_never_returns_an_empty_slice():
+    assert [split_cpus({4, 6}, 4, index) for index in range(4)] == [{4}, {6}, {4}, {6}]
+
+
+def test_cgroup_v2_quota(tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert cgroup_cpu_quota(tmp_path) == 1.5
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_quota(tmp_path) == 2.0
+
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_no_cgroup_files_means_no_quota(tmp_path):
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_quota_below_the_cpu_count_bounds_the_threads(machine):
+    machine(cpus=16, quota=2.5)
+
+    assert effective_cpu_count() == 3
+    assert resolve_threads() == (3, 1)
+
+
+def test_threads_are_shared_between_processes_and_pinned_cpus(machine):
+    machine(cpus=16)
+
+    assert resolve_threads() == (16, 2)
+    assert resolve_threads(processes=4) == (4, 1)
+    assert resolve_threads(cpus=parse_cpu_list("0-3,8")) == (5, 1)
+    assert resolve_threads(processes=32) == (1, 1)
+
+
+def test_explicit_thread_counts_win(machine):
+    machine(cpus=16, quota=1)
+    assert resolve_threads(intra_op=6, inter_op=3) == (6, 3)
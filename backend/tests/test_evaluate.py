@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.ml.evaluate import binary_metrics, calibration, ensemble_probas, roc
+
+
+def test_binary_metrics_from_the_confusion_matrix():
+    probas = np.array([0.9, 0.8, 0.3, 0.6, 0.2, 0.1])
+    labels = np.array([1, 1, 1, 0, 0, 0])
+
+    metrics = binary_metrics(probas, labels)
+
+    assert metrics['confusion_matrix'] == {'tp': 2, 'fp': 1, 'fn': 1, 'tn': 2}
+    assert metrics['accuracy'] == round(4 / 6, 4)
+    assert metrics['sensitivity'] == metrics['specificity'] == metrics['precision'] == round(2 / 3, 4)
+    assert metrics['f1'] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_binary_metrics_without_positives_has_no_sensitivity():
+    metrics = binary_metrics(np.array([0.1, 0.2]), np.array([0, 0]))
+    assert metrics['sensitivity'] is None and metrics['precision'] is None and metrics['f1'] is None
+    assert metrics['specificity'] == 1.0
+
+
+def test_auc_matches_the_pairwise_definition():
+    # 3 paires positif/négatif bien ordonnées sur 4
+    assert roc(np.array([0.1, 0.4, 0.35, 0.8]), np.array([0, 0, 1, 1]))['auc'] == 0.75
+    assert roc(np.array([0.2, 0.9]), np.array([0, 1]))['auc'] == 1.0
+    # Ex aequo comptés pour moitié
+    assert roc(np.array([0.5, 0.5, 0.5]), np.array([0, 1, 1]))['auc'] == 0.5
+
+
+def test_roc_curve_spans_both_corners():
+    curve = roc(np.array([0.1, 0.4, 0.35, 0.8]), np.array([0, 0, 1, 1]), points=11)['curve']
+
+    assert len(curve) == 11
+    assert (curve[0]['tpr'], curve[0]['fpr']) == (1.0, 1.0)
+    assert (curve[-1]['tpr'], curve[-1]['fpr']) == (0.0, 0.0)
+
+
+def test_roc_needs_both_classes():
+    assert roc(np.array([0.3, 0.7]), np.array([1, 1])) == {'auc': None, 'curve': []}
+
+
+def test_calibration_error_and_brier_score():
+    report = calibration(np.array([0.1, 0.1, 0.9, 0.9]), np.array([0, 0, 1, 1]))
+
+    assert report['ece'] == 0.1
+    assert report['brier'] == 0.01
+    assert [r['bin'] for r in report['reliability']] == [[0.1, 0.2], [0.9, 1.0]]
+
+
+def test_calibrated_probabilities_have_no_calibration_error():
+    report = calibration(np.full(4, 0.25), np.array([1, 0, 0, 0]))
+
+    assert report['ece'] == 0.0
+    assert report['brier'] == 0.1875
+    assert report['reliability'] == [
+        {'bin': [0.2, 0.3], 'count': 4, 'mean_probability': 0.25, 'positive_rate': 0.25}
+    ]
+
+
+def test_ensemble_weights_are_normalized():
+    probas = {'a': np.array([1.0, 0.0]), 'b': np.array([0.0, 0.0])}
+    assert ensemble_probas(probas, {'a': 3.0, 'b': 1.0}) == pytest.approx([0.75, 0.0])
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.services.image_store import ImageStore
+from app.utils import image_processing
+from app.utils.image_processing import UploadTooLarge, read_upload_file, save_upload_file
+
+LIMIT = 64
+
+
+class CountingIO(io.BytesIO):
+    """BytesIO qui enregistre la taille de chaque lecture"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", LIMIT)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 16)
+    monkeypatch.setattr(image_processing, "image_store", ImageStore(str(tmp_path / "uploads")))
+
+
+def upload(data, size=None):
+    return UploadFile(CountingIO(data), size=size, filename="image.jpg")
+
+
+def test_upload_at_the_limit_is_read_and_hashed():
+    data = b"\xff\xd8\xff" + bytes(LIMIT - 3)
+    contents, image_hash = asyncio.run(read_upload_file(upload(data)))
+
+    assert bytes(contents) == data
+    assert image_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_reading_stops_one_byte_past_the_limit():
+    file = upload(bytes(LIMIT * 10))
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload_file(file))
+
+    assert sum(file.file.reads) == LIMIT + 1
+
+
+def test_declared_size_is_rejected_before_reading():
+    file = upload(bytes(LIMIT * 10), size=LIMIT * 10)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload_file(file))
+
+    assert file.file.reads == []
+
+
+def test_empty_upload_is_rejected():
+    with pytest.raises(ValueError, match="empty") as error:
+        asyncio.run(read_upload_file(upload(b"")))
+    assert not isinstance(error.value, UploadTooLarge)
+
+
+def test_streamed_upload_over_the_limit_leaves_nothing_behind(tmp_path):
+    file = upload(bytes(LIMIT * 10))
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload_file(file))
+
+    assert sum(file.file.reads) == LIMIT + 1
+    incoming = tmp_path / "uploads" / ".incoming"
+    assert not incoming.exists() or os.listdir(incoming) == []
+
+
+def test_streamed_upload_is_stored_by_hash():
+    data = b"\x89PNG\r\n\x1a\n" + bytes(LIMIT - 8)
+    file_path, filename, image_hash, size, copy_path = asyncio.run(save_upload_file(upload(data)))
+
+    assert image_hash == hashlib.sha256(data).hexdigest()
+    assert filename == f"{image_hash}.png" and size == LIMIT
+    for path in (file_path, copy_path):
+        with open(path, 'rb') as f:
+            assert f.read() == data
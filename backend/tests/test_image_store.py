@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import image_store as store_module
+from app.services.image_store import (
+    ImageStore, add_references, ensure_blob, lock_key, release_reference
+)
+from app.utils.migrate_uploads import relative_path, stored_blobs
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"pixels"
+PNG_SHA = hashlib.sha256(PNG).hexdigest()
+
+
+class RecordingSession:
+    """AsyncSession minimale : enregistre les requêtes, `blob` pour les SELECT"""
+
+    def __init__(self, blob=None):
+        self.blob = blob
+        self.statements = []
+        self.deleted = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(scalar_one_or_none=lambda: self.blob)
+
+    async def delete(self, instance):
+        self.deleted.append(instance)
+
+    def sql(self):
+        return [str(s.compile(dialect=postgresql.dialect())) for s in self.statements]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / "uploads"))
+    monkeypatch.setattr(store_module, "image_store", store)
+    return store
+
+
+def written(store, contents):
+    part_path = store.incoming_path()
+    with open(part_path, 'wb') as f:
+        f.write(contents)
+    return part_path
+
+
+def test_identical_bytes_share_one_sharded_blob(store):
+    path = store.put_bytes(PNG, PNG_SHA)
+
+    assert path == str(store.root / PNG_SHA[:2] / PNG_SHA[2:4] / f"{PNG_SHA}.png")
+    assert store.is_blob_path(path)
+    assert store.put_file(written(store, PNG), PNG_SHA) == path
+    assert os.listdir(store.root / ".incoming") == []
+
+
+def test_kept_part_file_survives_removal_of_the_blob(store):
+    part_path = written(store, PNG)
+    path = store.put_file(part_path, PNG_SHA, keep=True)
+    store.remove(path)
+
+    # Copie privée : le blob supprimé est réécrit à l'identique
+    ensure_blob(path, sha256=PNG_SHA, copy_path=part_path)
+    with open(path, 'rb') as f:
+        assert f.read() == PNG
+    assert os.path.exists(part_path)
+
+
+def test_missing_blob_is_rewritten_from_contents(store):
+    path = store.path_for(PNG_SHA, "png")
+    ensure_blob(path, PNG, PNG_SHA)
+    assert os.path.exists(path)
+
+    store.remove(path)
+    with pytest.raises(FileNotFoundError):
+        ensure_blob(path)
+
+
+def test_references_are_incremented_by_their_count(store):
+    db = RecordingSession()
+    asyncio.run(add_references(db, {PNG_SHA: ("uploads/a/b/x.png", 14, 3)}))
+
+    lock, upsert = db.sql()
+    assert "pg_advisory_xact_lock" in lock
+    assert "ON CONFLICT (sha256) DO UPDATE SET ref_count = (image_blobs.ref_count + %(ref_count_1)s)" in upsert
+    assert db.statements[1].compile().params['ref_count_1'] == 3
+
+
+def test_last_reference_leaves_the_file_until_commit(store):
+    path = store.put_bytes(PNG, PNG_SHA)
+    blob = SimpleNamespace(sha256=PNG_SHA, path=path, size=len(PNG), ref_count=2)
+    db = RecordingSession(blob)
+
+    assert asyncio.run(release_reference(db, path)) is None
+    assert blob.ref_count == 1 and db.deleted == []
+
+    assert asyncio.run(release_reference(db, path)) == path
+    assert db.deleted == [blob]
+    assert os.path.exists(path)
+
+
+def test_legacy_upload_is_released_by_path(store):
+    assert asyncio.run(release_reference(RecordingSession(), "uploads/legacy.jpg")) == "uploads/legacy.jpg"
+
+
+def test_lock_key_is_a_stable_signed_bigint():
+    key = lock_key("uploads/ab/cd/abcd.png")
+    assert key == lock_key("uploads/ab/cd/abcd.png") != lock_key("uploads/ab/cd/abce.png")
+    assert -2 ** 63 <= key < 2 ** 63
+
+
+def test_database_paths_are_compared_relative_to_the_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "uploads"
+
+    assert relative_path(root, "uploads/ab/cd/x.png") == "ab/cd/x.png"
+    assert relative_path(root, str(root / "ab/cd/x.png")) == "ab/cd/x.png"
+    assert relative_path(root, "./uploads/../uploads/old.jpg") == "old.jpg"
+    assert relative_path(root, "/elsewhere/uploads/old.jpg") is None
+
+
+def test_stored_blobs_are_listed_relative_to_the_root(store):
+    store.put_bytes(PNG, PNG_SHA)
+    written(store, b"partial upload")
+    (store.root / "legacy.jpg").write_bytes(b"flat")
+
+    assert stored_blobs(store) == [f"{PNG_SHA[:2]}/{PNG_SHA[2:4]}/{PNG_SHA}.png"]
@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+
+import pytest
+import yaml
+
+from app.ml.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.ml.model_manager import ModelManager
+
+
+@pytest.fixture
+def make_executor(make_manager, model_entry):
+    executors = []
+
+    def factory(**options):
+        manager = make_manager([model_entry("model_1"), model_entry("model_2")])
+        executor = InferenceExecutor(manager, **options)
+        executors.append(executor)
+        return executor
+
+    yield factory
+    for executor in executors:
+        executor.shutdown()
+
+
+def test_queue_full_is_raised_beyond_capacity(make_executor):
+    executor = make_executor(kind="thread", max_workers=1, max_queue_size=1, retry_after=3)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert executor.pending == 2
+
+        with pytest.raises(InferenceQueueFull) as error:
+            await executor.run(release.wait)
+        assert error.value.retry_after == 3
+
+        release.set()
+        await asyncio.gather(*running)
+        assert executor.pending == 0
+        # Un slot libéré est réutilisable
+        assert await executor.run(lambda: 42) == 42
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_request_keeps_its_slot_until_the_job_ends(make_executor):
+    executor = make_executor(kind="thread", max_workers=1, max_queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceQueueFull):
+            await executor.run(release.wait)
+        release.set()
+
+    asyncio.run(scenario())
+
+
+def test_submitted_job_outlives_a_cancelled_caller(make_executor):
+    executor = make_executor(kind="thread", max_workers=1)
+    release = threading.Event()
+    events = []
+
+    async def scenario():
+        future = executor.submit(lambda: release.wait() and events.append("job done"))
+        task = asyncio.ensure_future(asyncio.wrap_future(future))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Rappel posé après l'annulation (comme la libération du tenseur) : il
+        # attend la fin réelle de la tâche
+        future.add_done_callback(lambda _: events.append("released"))
+        assert events == []
+        release.set()
+        await asyncio.sleep(0.05)
+        assert events == ["job done", "released"]
+
+    asyncio.run(scenario())
+
+
+def test_thread_mode_broadcast_reaches_the_shared_manager(make_executor):
+    executor = make_executor(kind="thread", max_workers=2)
+    results = asyncio.run(executor.broadcast_model("set_default_model", "model_2", warm=False))
+
+    assert results == [None]
+    assert executor.model_manager.current_model_id == "model_2"
+
+
+def test_process_broadcast_runs_once_per_worker_and_survives_restarts(make_executor):
+    executor = make_executor(kind="process", max_workers=2, max_queue_size=4)
+    workers = executor._pool.workers
+
+    async def scenario():
+        results = await executor.broadcast_model(
+            "set_readiness", ["model_2"], {}, sticky=True
+        )
+        assert results == [None, None]
+
+        pids = await asyncio.gather(*[
+            asyncio.wrap_future(executor._pool._submit_to(worker, os.getpid, (), {}))
+            for worker in workers
+        ])
+        assert len(set(pids)) == 2
+
+        # Un worker qui meurt fait échouer l'appel en cours seulement
+        with pytest.raises(RuntimeError, match="arrêté"):
+            await asyncio.wrap_future(
+                executor._pool._submit_to(workers[0], functools.partial(os._exit, 3), (), {})
+            )
+
+        # Relancé au prochain appel, avec les commandes persistantes rejouées
+        readiness = await asyncio.wrap_future(executor._pool._submit_to(workers[0], "readiness", (), {}))
+        new_pid = await asyncio.wrap_future(executor._pool._submit_to(workers[0], os.getpid, (), {}))
+        assert new_pid != pids[0]
+        assert readiness['required'] == ["model_2"]
+
+        reports = await executor.broadcast_model("readiness")
+        assert [r['required'] for r in reports] == [["model_2"], ["model_2"]]
+        assert executor.pending == 0
+
+    asyncio.run(scenario())
+
+
+def test_remote_artifact_versions_come_from_the_workers(tmp_path, model_entry):
+    entry = model_entry("model_1")
+    (tmp_path / "model_1.keras").write_bytes(b"weights")
+    config_path = tmp_path / "catalogue.yaml"
+    config_path.write_text(yaml.safe_dump({'models': [entry]}))
+
+    catalogue = ModelManager(str(config_path), default_model_id="model_1", serving=False)
+    executor = InferenceExecutor(catalogue, kind="process", max_workers=1)
+    try:
+        with pytest.raises(RuntimeError):
+            catalogue.artifact_version("model_1")
+
+        version = asyncio.run(executor.artifact_version("model_1"))
+        assert version == hashlib.sha256(b"weights").hexdigest()
+        assert executor._versions["model_1"][0] == version
+        assert catalogue.models["model_1"]['model'] is None
+    finally:
+        executor.shutdown()
+        catalogue.shutdown()
+
+
+def test_worker_reload_invalidates_remote_artifact_versions(tmp_path, model_entry):
+    entry = model_entry("model_1")
+    (tmp_path / "model_1.keras").write_bytes(b"weights")
+    config_path = tmp_path / "catalogue.yaml"
+    config_path.write_text(yaml.safe_dump({'models': [entry]}))
+
+    catalogue = ModelManager(str(config_path), default_model_id="model_1", serving=False)
+    executor = InferenceExecutor(catalogue, kind="process", max_workers=1)
+    try:
+        before = asyncio.run(executor.artifact_version("model_1"))
+
+        # Rechargement du worker seul (comme par sa surveillance des fichiers),
+        # sans diffusion "reload" depuis l'API
+        (tmp_path / "model_1.keras").write_bytes(b"new weights")
+        config_path.write_text(yaml.safe_dump({'models': [{**entry, 'description': "v2"}]}))
+        report = asyncio.run(executor.run_model("reload"))
+        assert report['updated'] == ["model_1"]
+
+        after = asyncio.run(executor.artifact_version("model_1"))
+        assert before != after == hashlib.sha256(b"new weights").hexdigest()
+        assert executor._pool.reloads == 1
+    finally:
+        executor.shutdown()
+        catalogue.shutdown()
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.ml import inference_server as server_module
+from app.ml.inference_server import InferenceClient, InferenceServer, derive_authkey
+
+AUTHKEY = derive_authkey("test-secret")
+
+
+class StubManager:
+    """ModelManager minimal : garde les tableaux reçus"""
+
+    def __init__(self):
+        self.received = []
+        self.reload_generation = 0
+
+    def reload(self):
+        self.reload_generation += 1
+
+    def scale(self, images, factor=1):
+        self.received.append(images)
+        return images.astype(np.float32) * factor
+
+    def first_received(self):
+        images = self.received[0]
+        return images, images.flags.owndata
+
+    def describe(self, label, images, extra):
+        return label, images.shape, extra.dtype.str, extra.sum()
+
+    def fail(self):
+        raise ValueError("échec côté serveur")
+
+    def _private(self):
+        return "secret"
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    """Serveur dans un processus à part, comme en production (segments et resource tracker séparés)"""
+    socket_path = str(tmp_path / "inference.sock")
+    server = InferenceServer(StubManager(), socket_path, AUTHKEY)
+    process = multiprocessing.get_context("spawn").Process(target=server.serve_forever, daemon=True)
+    process.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(socket_path):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    yield socket_path
+    process.terminate()
+    process.join(timeout=5)
+
+
+@pytest.fixture
+def client(socket_path):
+    client = InferenceClient(socket_path, AUTHKEY)
+    yield client
+    client.close()
+
+
+def test_arrays_round_trip_through_shared_memory(client):
+    images = np.arange(2 * 4 * 4 * 3, dtype=np.uint8).reshape(2, 4, 4, 3)
+
+    result = client.call("scale", images, factor=2)
+
+    assert np.array_equal(result, images * 2.0)
+    # Le serveur garde une copie détachée du segment, réutilisé à l'appel suivant
+    client.call("scale", np.zeros_like(images))
+    received, owndata = client.call("first_received")
+    assert owndata and np.array_equal(received, images)
+
+
+def test_mixed_arguments_keep_their_positions(client):
+    images = np.ones((3, 4, 4, 3), dtype=np.uint8)
+    extra = np.array([1.5, 2.5], dtype=np.float64)
+
+    assert client.call("describe", "lot", images, extra) == ("lot", (3, 4, 4, 3), "<f8", 4.0)
+
+
+def test_segment_grows_for_larger_arrays(client, monkeypatch):
+    monkeypatch.setattr(server_module, "MIN_BUFFER_BYTES", 1024)
+    small = np.ones((1, 16, 16, 3), dtype=np.uint8)  # 768 octets
+    large = np.full((4, 32, 32, 3), 7, dtype=np.uint8)  # 12 Ko
+
+    client.call("scale", small)
+    first = client._local.shm
+    result = client.call("scale", large)
+    second = client._local.shm
+
+    assert second.name != first.name and second.size >= large.nbytes
+    assert client._segments == [second]
+    assert np.array_equal(result, large.astype(np.float32))
+    # Un lot plus petit réutilise le segment agrandi
+    client.call("scale", small)
+    assert client._local.shm is second
+
+
+def test_errors_and_private_methods_are_raised_on_the_client(client):
+    with pytest.raises(ValueError, match="côté serveur"):
+        client.call("fail")
+    with pytest.raises(AttributeError, match="non exposée"):
+        client.call("_private")
+    # La connexion reste utilisable
+    assert client.call("describe", "x", np.zeros(1), np.zeros(2))[0] == "x"
+
+
+def test_wrong_authkey_is_rejected_and_the_server_keeps_serving(socket_path, client):
+    intruder = InferenceClient(socket_path, derive_authkey("autre secret"))
+    with pytest.raises(multiprocessing.AuthenticationError):
+        intruder.call("describe", "x", np.zeros(1), np.zeros(2))
+
+    assert client.call("describe", "x", np.zeros(1), np.zeros(2))[0] == "x"
+
+
+def test_client_counts_server_reloads(client):
+    client.call("describe", "x", np.zeros(1), np.zeros(2))
+    assert client.reloads == 0
+
+    client.call("reload")
+    client.call("describe", "x", np.zeros(1), np.zeros(2))
+
+    assert client.reloads == 1
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.ml.model_manager import MicroBatcher
+
+
+class RecordingForward:
+    """Forward pass factice : probabilité = premier pixel / 255, lots enregistrés"""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        if self.error:
+            raise self.error
+        return batch[:, 0, 0, 0] / 255.0
+
+
+def image(value):
+    return np.full((1, 4, 4, 3), value, dtype=np.uint8)
+
+
+def submit_concurrently(batcher, values):
+    results = {}
+
+    def client(value):
+        results[value] = batcher.predict(image(value))
+
+    threads = [threading.Thread(target=client, args=(v,)) for v in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+
+def test_flushes_when_batch_is_full():
+    forward = RecordingForward()
+    batcher = MicroBatcher("m", forward, max_batch_size=4, max_wait_ms=10_000)
+    try:
+        start = time.perf_counter()
+        results = submit_concurrently(batcher, [10, 20, 30, 40])
+        assert time.perf_counter() - start < 5
+    finally:
+        batcher.close()
+
+    assert forward.batches == [4]
+    for value, proba in results.items():
+        assert proba == pytest.approx([value / 255.0])
+
+
+def test_flushes_after_max_wait():
+    forward = RecordingForward()
+    batcher = MicroBatcher("m", forward, max_batch_size=64, max_wait_ms=50)
+    try:
+        start = time.perf_counter()
+        batcher.predict(image(1))
+        elapsed = time.perf_counter() - start
+    finally:
+        batcher.close()
+
+    assert forward.batches == [1]
+    assert 0.04 <= elapsed < 2
+
+
+def test_flushes_once_every_caller_is_queued():
+    forward = RecordingForward()
+    callers = {'count': 2}
+    batcher = MicroBatcher("m", forward, max_batch_size=64, max_wait_ms=10_000,
+                           callers=lambda: callers['count'])
+    try:
+        start = time.perf_counter()
+        submit_concurrently(batcher, [1, 2])
+        assert time.perf_counter() - start < 5
+    finally:
+        batcher.close()
+
+    assert sum(forward.batches) == 2
+
+
+def test_wake_rechecks_callers():
+    forward = RecordingForward()
+    callers = {'count': 2}
+    batcher = MicroBatcher("m", forward, max_batch_size=64, max_wait_ms=10_000,
+                           callers=lambda: callers['count'])
+    try:
+        future = batcher.submit(image(1))
+        time.sleep(0.05)
+        assert not future.done()
+
+        # Le second appelant termine sans passer par ce batcher
+        callers['count'] = 1
+        batcher.wake()
+        assert future.result(timeout=5) == pytest.approx([1 / 255.0])
+    finally:
+        batcher.close()
+
+
+def test_forward_error_reaches_every_caller():
+    forward = RecordingForward(error=RuntimeError("boom"))
+    batcher = MicroBatcher("m", forward, max_batch_size=2, max_wait_ms=10_000)
+    try:
+        futures = [batcher.submit(image(1)), batcher.submit(image(2))]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="boom"):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_close_processes_queued_requests_then_rejects():
+    forward = RecordingForward()
+    batcher = MicroBatcher("m", forward, max_batch_size=64, max_wait_ms=10_000)
+    future = batcher.submit(image(3))
+    batcher.close()
+
+    assert future.result(timeout=5) == pytest.approx([3 / 255.0])
+    with pytest.raises(RuntimeError):
+        batcher.submit(image(4))
+
+
+def test_lone_request_is_not_held_for_max_wait(make_manager, model_entry):
+    manager = make_manager([
+        model_entry("m", batching={'max_batch_size': 64, 'max_wait_ms': 10_000})
+    ])
+    start = time.perf_counter()
+    result = manager.predict(image(255))
+    assert time.perf_counter() - start < 5
+    assert result['is_parasitized']
+    assert manager.active_callers() == 0
@@ -0,0 +1,73 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.ml_service import MLService, TensorPool, jpeg_size
+
+
+def jpeg(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    image = cv2.GaussianBlur((rng.random((height, width, 3)) * 255).astype(np.uint8), (9, 9), 3)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+@pytest.mark.parametrize("width, height", [(1001, 777), (513, 300), (255, 600), (130, 129), (127, 64)])
+def test_pil_and_opencv_decode_at_the_same_scale(width, height):
+    service = MLService()
+    data = jpeg(width, height)
+    factor = service.reduction_factor(width, height)
+
+    pil_image = Image.open(io.BytesIO(data))
+    pil_tensor = service.preprocess_pil_image(pil_image).copy()
+    cv_tensor = service.preprocess_bytes(data)
+
+    expected = ((width + factor - 1) // factor, (height + factor - 1) // factor)
+    assert pil_image.size == expected
+    assert np.array_equal(pil_tensor, cv_tensor)
+
+
+def test_reduction_keeps_at_least_image_size_pixels():
+    service = MLService()
+    assert service.reduction_factor(4000, 3000) == 8
+    assert service.reduction_factor(255, 600) == 4  # ceil(255 / 4) = 64
+    assert service.reduction_factor(64, 64) == 1
+
+
+def test_jpeg_size_reads_the_frame_header():
+    assert jpeg_size(io.BytesIO(jpeg(321, 123))) == (321, 123)
+    assert jpeg_size(io.BytesIO(b"\x89PNG\r\n\x1a\n")) is None
+
+
+def test_batch_reports_undecodable_files(tmp_path):
+    good = tmp_path / "good.jpg"
+    good.write_bytes(jpeg(100, 80))
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not an image")
+
+    batch, errors = MLService().preprocess_batch([str(bad), str(good), str(good)])
+
+    assert batch.shape == (2, 64, 64, 3) and batch.dtype == np.uint8
+    assert list(errors) == [0]
+
+
+def test_tensor_pool_reuses_released_blocks():
+    pool = TensorPool(max_free=1)
+    tensor = pool.acquire(3, (2, 2, 3))
+    assert tensor.shape == (3, 2, 2, 3)
+
+    pool.release(tensor)
+    again = pool.acquire(4, (2, 2, 3))
+    assert again.base is tensor.base
+
+    # Bloc déjà sorti : un second acquire en alloue un nouveau
+    assert pool.acquire(4, (2, 2, 3)).base is not again.base
+
+
+def test_tensor_pool_ignores_foreign_arrays():
+    pool = TensorPool()
+    pool.release(np.zeros((3, 2, 2, 3), dtype=np.uint8))
+    pool.release(np.zeros((4, 2, 2, 3), dtype=np.float32))
+    assert pool._free == {}
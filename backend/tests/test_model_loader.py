@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.ml import model_loader
+
+DATA = bytes(range(256)) * 64
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class ArtifactHandler(BaseHTTPRequestHandler):
+    """Sert DATA avec les Range ; /redirect-same et /redirect-other redirigent vers /artifact"""
+
+    seen = []
+
+    def do_GET(self):
+        type(self).seen.append((self.path, self.headers.get("Authorization"), self.headers.get("Range")))
+        port = self.server.server_address[1]
+        if self.path.startswith("/redirect-"):
+            host = "127.0.0.1" if self.path == "/redirect-same" else "localhost"
+            self.send_response(302)
+            self.send_header("Location", f"http://{host}:{port}/artifact")
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].removeprefix("bytes=").rstrip("-"))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        body = DATA[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    ArtifactHandler.seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArtifactHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def entry(tmp_path, **extra):
+    return {'id': "m", 'name': "M", 'remote': "local", 'local_path': str(tmp_path / "model.keras"), **extra}
+
+
+def test_mirror_download_resumes_partial_file(tmp_path):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    (mirror / "model.keras").write_bytes(DATA)
+    (tmp_path / "model.keras.part").write_bytes(DATA[:1000])
+
+    path = model_loader.download_model_if_needed(entry(tmp_path, sha256=SHA256), mirror=str(mirror))
+
+    assert (tmp_path / "model.keras").read_bytes() == DATA
+    assert not (tmp_path / "model.keras.part").exists()
+    assert path == str(tmp_path / "model.keras")
+
+
+def test_corrupt_resume_restarts_then_rejects_bad_checksum(tmp_path):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    (mirror / "model.keras").write_bytes(DATA)
+    (tmp_path / "model.keras.part").write_bytes(b"x" * 1000)
+
+    # Reprise invalide : téléchargement complet, qui lui est valide
+    model_loader.download_model_if_needed(entry(tmp_path, sha256=SHA256), mirror=str(mirror))
+    assert (tmp_path / "model.keras").read_bytes() == DATA
+
+    target = tmp_path / "target"
+    target.mkdir()
+    with pytest.raises(ValueError, match="SHA-256 invalide"):
+        model_loader.download_model_if_needed(
+            entry(target, sha256="0" * 64), mirror=str(mirror)
+        )
+    assert list(target.iterdir()) == []
+
+
+def test_mirrored_saved_model_is_verified_before_use(tmp_path, caplog):
+    mirror = tmp_path / "mirror" / "model"
+    (mirror / "variables").mkdir(parents=True)
+    (mirror / "saved_model.pb").write_bytes(DATA)
+    (mirror / "variables" / "variables.index").write_bytes(b"index")
+    expected = model_loader.artifact_hash(mirror)
+
+    target = tmp_path / "target"
+    target.mkdir()
+    saved_model = {**entry(target), 'local_path': str(target / "model")}
+    with pytest.raises(ValueError, match="SHA-256 invalide"):
+        model_loader.download_model_if_needed({**saved_model, 'sha256': "0" * 64}, mirror=str(mirror.parent))
+    # Ni dossier incomplet ni copie invalide laissés en place
+    assert list(target.iterdir()) == []
+
+    path = model_loader.download_model_if_needed({**saved_model, 'sha256': expected}, mirror=str(mirror.parent))
+    assert (target / "model" / "variables" / "variables.index").read_bytes() == b"index"
+    assert path == str(target / "model")
+
+    # Sans sha256, la copie est servie mais signalée comme non vérifiée
+    unchecked = {**saved_model, 'id': "unchecked-dir", 'local_path': str(tmp_path / "other" / "model")}
+    with caplog.at_level(logging.WARNING, logger=model_loader.__name__):
+        model_loader.download_model_if_needed(unchecked, mirror=str(mirror.parent))
+    assert any("non vérifié" in r.getMessage() for r in caplog.records)
+
+
+def test_missing_checksum_is_a_warning(tmp_path, caplog):
+    (tmp_path / "model.keras").write_bytes(DATA)
+    with caplog.at_level(logging.WARNING, logger=model_loader.__name__):
+        model_loader.download_model_if_needed(entry(tmp_path, id="unchecked"))
+        model_loader.download_model_if_needed(entry(tmp_path, id="unchecked"))
+
+    assert len([r for r in caplog.records if "sha256" in r.getMessage()]) == 1
+
+
+def test_http_download_resumes_with_range(tmp_path, http_server):
+    part_path = tmp_path / "model.keras.part"
+    part_path.write_bytes(DATA[:4096])
+
+    model_loader._fetch_http(f"{http_server}/artifact", part_path)
+
+    assert part_path.read_bytes() == DATA
+    assert ArtifactHandler.seen[-1][2] == "bytes=4096-"
+
+
+@pytest.mark.parametrize("path, forwarded", [("/redirect-same", True), ("/redirect-other", False)])
+def test_authorization_is_not_forwarded_to_another_host(http_server, path, forwarded):
+    request = model_loader.urllib.request.Request(
+        f"{http_server}{path}", headers={"Authorization": "Bearer secret", "Range": "bytes=10-"}
+    )
+    with model_loader._http_opener.open(request, timeout=5) as response:
+        assert response.read() == DATA[10:]
+
+    _, authorization, range_header = ArtifactHandler.seen[-1]
+    assert (authorization == "Bearer secret") is forwarded
+    assert range_header == "bytes=10-"
+
+
+def test_token_is_only_sent_to_huggingface():
+    assert model_loader._is_huggingface("https://huggingface.co/org/repo/resolve/main/m.keras")
+    assert not model_loader._is_huggingface("https://example.com/huggingface.co/m.keras")
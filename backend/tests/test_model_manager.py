@@ -0,0 +1,223 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import yaml
+
+from app.ml import model_manager as manager_module
+from app.ml.shadow import ShadowSkipped
+from conftest import StubRunner
+
+
+def test_ensemble_version_follows_accuracy_weights(make_manager, model_entry):
+    manager = make_manager([model_entry("model_1"), model_entry("model_2")])
+    for info in manager.models.values():
+        info['artifact_hash'] = "abc"
+
+    before = manager.artifact_version("ensemble")
+    manager.models["model_2"]['config']['accuracy'] = 0.5
+
+    assert manager.artifact_version("ensemble") != before
+
+
+def test_converted_variants_do_not_vote(make_manager, model_entry):
+    manager = make_manager([
+        model_entry("model_1"),
+        model_entry("model_2"),
+        model_entry("model_2_int8", format="tflite", source_model="model_2"),
+    ])
+
+    assert manager.ensemble_model_ids() == ["model_1", "model_2"]
+
+    comparison = manager.predict(np.full((1, 4, 4, 3), 200, dtype=np.uint8), return_all=True)
+    assert comparison['ensemble_result']['models'] == ["model_1", "model_2"]
+    assert manager.models["model_2_int8"]['model'].calls == []
+
+
+def test_default_cascade_stages_skip_variants(make_manager, model_entry):
+    manager = make_manager([
+        model_entry("model_1", inference_time_ms=50),
+        model_entry("model_1_tflite", inference_time_ms=5, source_model="model_1"),
+        model_entry("model_2", inference_time_ms=80),
+    ])
+    manager.config['cascade'] = {'uncertainty_band': [0.1, 0.9]}
+
+    assert manager.get_cascade_config()['stages'] == ["model_1", "model_2"]
+
+
+def test_status_reports_this_managers_residency(make_manager, model_entry):
+    manager = make_manager([model_entry("model_1"), model_entry("model_2")])
+    manager.models["model_2"].update(loaded=False, model=None)
+    manager.models["model_1"]['memory_bytes'] = 3 * 1024 * 1024
+    manager.set_default_model("model_2", warm=False)
+
+    status = manager.status()
+
+    assert status['default_model'] == "model_2"
+    assert status['resident_mb'] == 3.0
+    assert [(m['id'], m['loaded'], m['is_default']) for m in status['models']] == [
+        ("model_1", True, False), ("model_2", False, True)
+    ]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="affinité CPU non supportée")
+def test_affinity_only_pins_inference_threads(make_manager, model_entry):
+    before = os.sched_getaffinity(0)
+    cpu = min(before)
+    manager = make_manager([model_entry("model_1")], cpu_affinity=str(cpu))
+
+    # Le thread qui construit le gestionnaire (boucle asyncio en mode thread) reste libre
+    assert os.sched_getaffinity(0) == before
+
+    seen = []
+    pool = ThreadPoolExecutor(max_workers=1, initializer=manager.pin_thread)
+    pool.submit(lambda: seen.append(os.sched_getaffinity(0))).result()
+    pool.shutdown()
+    assert seen == [{cpu}]
+
+
+def shadowed_manager(make_manager, model_entry, **options):
+    return make_manager([
+        model_entry("model_1"),
+        model_entry("model_2", shadow={'model_id': "model_3", 'sample_rate': 1.0}),
+        model_entry("model_3"),
+    ], **options)
+
+
+def test_shadow_candidates_are_not_served(make_manager, model_entry):
+    manager = shadowed_manager(make_manager, model_entry)
+    manager.config['cascade'] = {'uncertainty_band': [0.1, 0.9]}
+
+    assert manager.candidate_model_ids() == {"model_3"}
+    assert manager.ensemble_model_ids() == ["model_1", "model_2"]
+    assert manager.available_model_ids() == ["model_1", "model_2", "cascade"]
+    assert [m['id'] for m in manager.get_models_info()] == ["model_1", "model_2"]
+    assert manager.get_cascade_config()['stages'] == ["model_1", "model_2"]
+    with pytest.raises(ValueError, match="shadow"):
+        manager.set_default_model("model_3")
+
+
+def test_shadow_forward_yields_to_primary_inference(make_manager, model_entry):
+    manager = shadowed_manager(make_manager, model_entry)
+    images = np.zeros((2, 4, 4, 3), dtype=np.uint8)
+
+    with manager._caller():
+        with pytest.raises(ShadowSkipped):
+            manager._forward_shadow("model_3", images)
+    assert manager.models["model_3"]['model'].calls == []
+
+    assert len(manager._forward_shadow("model_3", images)) == 2
+
+
+def test_shadow_load_never_evicts(make_manager, model_entry):
+    manager = shadowed_manager(make_manager, model_entry, memory_budget_mb=1)
+    manager.set_default_model("model_2", warm=False)
+    for model_id in ("model_1", "model_2"):
+        manager.models[model_id]['memory_bytes'] = 400 * 1024
+    # Candidat déchargé, taille connue d'un chargement précédent
+    manager.models["model_3"].update(model=None, loaded=False, memory_bytes=400 * 1024)
+
+    with pytest.raises(ShadowSkipped):
+        manager._forward_shadow("model_3", np.zeros((1, 4, 4, 3), dtype=np.uint8))
+
+    assert manager.models["model_1"]['loaded'] and manager.models["model_2"]['loaded']
+    assert not manager.models["model_3"]['loaded']
+
+
+class BlockingRunner(StubRunner):
+    """StubRunner dont le forward attend `release` (requête en cours pendant un rechargement)"""
+
+    def __init__(self, offset=0.0):
+        super().__init__(offset)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def predict(self, batch):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return super().predict(batch)
+
+
+@pytest.fixture
+def new_versions(monkeypatch):
+    """Remplace le chargement des artefacts : chaque chargement sert le prochain runner de la liste"""
+    runners = []
+
+    def load(model_config, **options):
+        runner = runners.pop(0)
+        if isinstance(runner, Exception):
+            raise runner
+        return runner
+
+    monkeypatch.setattr(manager_module, "download_model_if_needed", lambda config, mirror=None: config['local_path'])
+    monkeypatch.setattr(manager_module, "remote_load_model", load)
+    return runners
+
+
+def rewrite_config(manager, **changes):
+    """Réécrit model_config.yaml avec des entrées modifiées : rewrite_config(m, model_1={...})"""
+    entries = [{**info['config'], **changes.get(model_id, {})} for model_id, info in manager.models.items()]
+    with open(manager.config_path, 'w') as f:
+        yaml.safe_dump({**manager.config, 'models': entries}, f)
+
+
+def test_hot_swap_lets_in_flight_requests_finish_on_the_old_version(make_manager, model_entry, new_versions):
+    manager = make_manager([model_entry("model_1", batching={'max_batch_size': 1})])
+    old = BlockingRunner()
+    manager.models["model_1"]['model'] = old
+    new_versions.append(StubRunner(offset=0.5))
+    image = np.zeros((1, 4, 4, 3), dtype=np.uint8)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        in_flight = pool.submit(manager.predict, image, "model_1")
+        assert old.started.wait(timeout=5)
+
+        rewrite_config(manager, model_1={'accuracy': 0.9})
+        report = manager.reload()
+        assert report['reloaded'] == ["model_1"]
+
+        # Les nouvelles requêtes passent déjà par la nouvelle version...
+        assert manager.predict(image, "model_1")['probability_parasitized'] == 50.0
+        # ... la requête en cours termine sur l'ancienne
+        old.release.set()
+        assert in_flight.result(timeout=5)['probability_parasitized'] == 0.0
+
+    assert manager.models["model_1"]['config']['accuracy'] == 0.9
+
+
+def test_failed_reload_keeps_the_old_version(make_manager, model_entry, new_versions):
+    manager = make_manager([model_entry("model_1")])
+    old = manager.models["model_1"]['model']
+    new_versions.append(RuntimeError("artefact corrompu"))
+
+    rewrite_config(manager, model_1={'accuracy': 0.9})
+    report = manager.reload()
+
+    assert report['reloaded'] == [] and "corrompu" in report['errors']["model_1"]
+    assert manager.models["model_1"]['model'] is old
+    assert manager.models["model_1"]['config']['accuracy'] == 0.95
+    # Rien n'a changé : les versions mémorisées côté API restent valides
+    assert manager.reload_generation == 0
+    manager.predict(np.zeros((1, 4, 4, 3), dtype=np.uint8), "model_1")
+    assert old.calls == [1]
+
+
+def test_reload_replaces_the_batcher_only_when_its_settings_change(make_manager, model_entry, new_versions):
+    manager = make_manager([model_entry("model_1", batching={'max_batch_size': 8, 'max_wait_ms': 1})])
+    batcher = manager._get_batcher("model_1")
+    new_versions.extend([StubRunner(), StubRunner()])
+
+    rewrite_config(manager, model_1={'accuracy': 0.9})
+    manager.reload()
+    assert manager._get_batcher("model_1") is batcher
+    assert manager.reload_generation == 1
+
+    rewrite_config(manager, model_1={'batching': {'max_batch_size': 4, 'max_wait_ms': 1}})
+    manager.reload()
+    replaced = manager._get_batcher("model_1")
+    assert replaced is not batcher and replaced.max_batch_size == 4
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.zeros((1, 4, 4, 3), dtype=np.uint8))
+    assert manager.predict(np.zeros((1, 4, 4, 3), dtype=np.uint8), "model_1")["model_id"] == "model_1"
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from app.ml import prediction_cache as cache_module
+from app.ml.prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    caches = []
+
+    def factory(**options):
+        cache = PredictionCache(disk_path=str(tmp_path / "predictions.sqlite3"), **options)
+        caches.append(cache)
+        return cache
+
+    yield factory
+    for cache in caches:
+        cache.close()
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2)
+    cache.set("a", "m", "v1", {'p': 1})
+    cache.set("b", "m", "v1", {'p': 2})
+    assert cache.get("a", "m", "v1") == {'p': 1}
+
+    cache.set("c", "m", "v1", {'p': 3})
+
+    assert cache.get("b", "m", "v1") is None
+    assert cache.get("a", "m", "v1") == {'p': 1}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_new_artifact_version_misses():
+    cache = PredictionCache()
+    cache.set("a", "m", "v1", {'p': 1})
+    assert cache.get("a", "m", "v2") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = PredictionCache(ttl_seconds=10)
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now)
+    cache.set("a", "m", "v1", {'p': 1})
+
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 11)
+    assert cache.get("a", "m", "v1") is None
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_disk_tier_survives_restart(disk_cache):
+    disk_cache().set("a", "m", "v1", {'p': 1})
+
+    cache = disk_cache()
+    assert asyncio.run(cache.aget("a", "m", "v1")) == {'p': 1}
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_async_set_writes_both_tiers(disk_cache):
+    cache = disk_cache()
+    asyncio.run(cache.aset("a", "m", "v1", {'p': 1}))
+
+    assert cache.stats()['disk_entries'] == 1
+    assert asyncio.run(cache.aget("a", "m", "v1")) == {'p': 1}
+    assert cache.stats()['memory_hits'] == 1
+
+
+def test_disk_tier_is_capped_to_the_newest_entries(disk_cache, monkeypatch):
+    monkeypatch.setattr(cache_module, "PURGE_INTERVAL", 5)
+    cache = disk_cache(max_entries=1, disk_max_entries=3)
+    for index in range(5):
+        cache.set(f"img{index}", "m", "v1", {'p': index})
+
+    assert cache.stats()['disk_entries'] == 3
+    assert cache.get("img0", "m", "v1") is None
+    assert cache.get("img4", "m", "v1") == {'p': 4}
+
+
+def test_expired_disk_entries_are_purged_at_startup(disk_cache, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now - 100)
+    disk_cache(ttl_seconds=10).set("old", "m", "v1", {'p': 0})
+
+    monkeypatch.setattr(cache_module.time, "time", lambda: now)
+    assert disk_cache(ttl_seconds=10).stats()['disk_entries'] == 0
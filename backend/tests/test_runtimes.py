@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.ml.runtimes import BucketedRunner, as_pixels, dequantize, pixel_table
+
+
+class RecordingRunner(BucketedRunner):
+    """Runner factice : probabilité = premier pixel / 255, formes exécutées enregistrées"""
+
+    def __init__(self, batch_buckets=(1, 2, 4, 8)):
+        super().__init__((4, 4, 3), batch_buckets)
+        self.runs = []
+
+    def _run(self, bucket, batch):
+        assert batch.shape == (bucket, 4, 4, 3)
+        assert batch.dtype == np.uint8
+        self.runs.append((bucket, batch.copy()))
+        return batch[:, 0, 0, 0].astype(np.float32)[:, None] / 255.0
+
+
+def pixels(*values):
+    return np.stack([np.full((4, 4, 3), v, dtype=np.uint8) for v in values])
+
+
+@pytest.mark.parametrize("n, bucket", [(1, 1), (2, 2), (3, 4), (5, 8), (8, 8)])
+def test_batch_is_padded_to_the_next_bucket(n, bucket):
+    runner = RecordingRunner()
+    values = list(range(10, 10 + n))
+    output = runner.predict(pixels(*values))
+
+    assert [b for b, _ in runner.runs] == [bucket]
+    # Rangées de remplissage à zéro, retirées de la sortie
+    assert not runner.runs[0][1][n:].any()
+    assert output == pytest.approx(np.array(values) / 255.0)
+
+
+def test_large_batch_is_split_by_the_largest_bucket():
+    runner = RecordingRunner()
+    values = list(range(1, 20))
+    output = runner.predict(pixels(*values))
+
+    assert [b for b, _ in runner.runs] == [8, 8, 4]
+    assert output == pytest.approx(np.array(values) / 255.0)
+
+
+def test_warmup_measures_every_bucket():
+    runner = RecordingRunner(batch_buckets=(4, 1, 2, 2))
+    latency = runner.warmup(runs=2)
+
+    assert runner.batch_buckets == [1, 2, 4]
+    assert sorted(latency) == [1, 2, 4]
+
+
+def test_normalized_input_is_converted_back_to_pixels():
+    batch = pixels(0, 7, 128, 255)
+    assert np.array_equal(as_pixels(batch.astype(np.float32) / 255.0), batch)
+    assert as_pixels(batch) is batch
+
+
+def test_float_input_table_is_plain_normalization():
+    table = pixel_table(np.float32)
+    assert np.array_equal(table[np.arange(256)], np.arange(256, dtype=np.float32) / np.float32(255.0))
+
+
+def test_int8_input_table_matches_tflite_quantization():
+    # Paramètres typiques d'une entrée calibrée sur [0, 1]
+    scale, zero_point = 1 / 255.0, -128
+    table = pixel_table(np.int8, (scale, zero_point))
+
+    assert table.dtype == np.int8
+    assert table[0] == -128 and table[255] == 127
+    assert np.array_equal(table, np.arange(256) - 128)
+
+
+def test_int8_table_saturates_out_of_range_values():
+    table = pixel_table(np.int8, (1 / 510.0, 0))
+    assert table[0] == 0 and table.max() == 127
+
+
+def test_int8_output_is_dequantized():
+    output = np.array([[-128], [0], [127]], dtype=np.int8)
+    probas = dequantize(output, (1 / 256.0, -128))
+
+    assert probas.dtype == np.float32
+    assert probas.reshape(-1) == pytest.approx([0.0, 0.5, 255 / 256.0])
+    float_output = np.array([0.25], dtype=np.float32)
+    assert dequantize(float_output) is float_output
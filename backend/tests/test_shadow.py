@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.ml import shadow as shadow_module
+from app.ml.shadow import ShadowScorer, ShadowSkipped
+
+SHADOW = {'model_id': "candidate", 'sample_rate': 1.0}
+
+
+@pytest.fixture
+def make_scorer():
+    scorers = []
+
+    def factory(forward_fn, **options):
+        scorer = ShadowScorer(forward_fn, **options)
+        scorers.append(scorer)
+        return scorer
+
+    yield factory
+    for scorer in scorers:
+        scorer.close()
+
+
+def images(n):
+    return np.zeros((n, 4, 4, 3), dtype=np.uint8)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "délai dépassé"
+        time.sleep(0.01)
+
+
+def pair(scorer):
+    return scorer.stats()['pairs']["primary->candidate"]
+
+
+def test_full_queue_drops_instead_of_blocking(make_scorer):
+    started, release = threading.Event(), threading.Event()
+
+    def forward(model_id, batch):
+        started.set()
+        release.wait()
+        return np.full(len(batch), 0.9)
+
+    scorer = make_scorer(forward, queue_size=1)
+    assert scorer.maybe_submit("primary", SHADOW, images(1), [0.9], 1.0)
+    started.wait(timeout=5)
+
+    # Un lot en file (taille 1), le suivant est abandonné sans attendre
+    assert scorer.maybe_submit("primary", SHADOW, images(1), [0.9], 1.0)
+    assert not scorer.maybe_submit("primary", SHADOW, images(1), [0.9], 1.0)
+
+    stats = pair(scorer)
+    assert (stats['queued'], stats['dropped']) == (2, 1)
+    release.set()
+    wait_for(lambda: pair(scorer)['requests_scored'] == 2)
+
+
+def test_skipped_batches_are_counted_as_dropped(make_scorer):
+    def forward(model_id, batch):
+        raise ShadowSkipped("occupé")
+
+    scorer = make_scorer(forward)
+    scorer.maybe_submit("primary", SHADOW, images(1), [0.9], 1.0)
+
+    wait_for(lambda: pair(scorer)['dropped'] == 1)
+    assert pair(scorer)['errors'] == 0 and pair(scorer)['requests_scored'] == 0
+
+
+def test_sample_rate_selects_a_fraction_of_requests(make_scorer, monkeypatch):
+    draws = iter([0.05, 0.5, 0.19, 0.2])
+    monkeypatch.setattr(shadow_module.random, "random", lambda: next(draws))
+    scorer = make_scorer(lambda model_id, batch: np.zeros(len(batch)))
+    config = {'model_id': "candidate", 'sample_rate': 0.2}
+
+    submitted = [scorer.maybe_submit("primary", config, images(1), [0.1], 1.0) for _ in range(4)]
+
+    assert submitted == [True, False, True, False]
+    assert not scorer.maybe_submit("primary", {'model_id': "primary", 'sample_rate': 1.0}, images(1), [0.1], 1.0)
+    assert not scorer.maybe_submit("primary", None, images(1), [0.1], 1.0)
+
+
+def test_agreement_and_latency_stats(make_scorer):
+    scorer = make_scorer(lambda model_id, batch: np.array([0.8, 0.4, 0.3, 0.6])[:len(batch)])
+
+    scorer.maybe_submit("primary", SHADOW, images(4), [0.9, 0.2, 0.6, 0.7], 10.0)
+    scorer.maybe_submit("primary", SHADOW, images(2), [0.9, 0.2], 30.0)
+    wait_for(lambda: pair(scorer)['requests_scored'] == 2)
+
+    stats = pair(scorer)
+    # Désaccord sur la 3e image du premier lot seulement (0.6 contre 0.3)
+    assert stats['images_scored'] == 6
+    assert stats['agreement_rate'] == round(5 / 6, 4)
+    assert stats['mean_abs_probability_diff'] == round((0.1 + 0.2 + 0.3 + 0.1 + 0.1 + 0.2) / 6, 4)
+    assert stats['primary_latency_ms']['p50'] == 20.0
+    assert stats['shadow_latency_ms']['p50'] is not None
+    assert [d['shadow_probability'] for d in stats['recent_disagreements']] == [0.3]